@@ -0,0 +1,200 @@
+# adaptive_detection.py
+# Detection-resolution control for the recognition engine:
+#
+#   AdaptiveScale  - picks the detection scale from measured per-frame latency vs a target FPS
+#   RoiMask        - per-camera polygons; everything outside them is never analysed
+#   refine_regions - where to re-run detection at a higher resolution (prior tracks, motion)
+#
+# All boxes are (top, right, bottom, left) like face_recognition's.
+
+import math
+
+import cv2
+import numpy as np
+
+# ===================================================
+# Configuration
+# ===================================================
+DETECTION_SCALES = (0.2, 0.25, 0.33, 0.5)   # ladder AdaptiveScale moves along
+LATENCY_SMOOTHING = 0.8      # EMA weight of the previous latency estimate
+HEADROOM = 0.6               # step up only while latency < HEADROOM * budget
+PATIENCE = 3                 # consecutive over/under-budget decisions before a step
+
+REFINE_SCALE = 1.0           # resolution for re-detection inside regions of interest
+REFINE_MARGIN = 0.5          # grow each region by this fraction of its size
+REFINE_MIN_SIZE = 24         # regions are at least this big (tracking-scale pixels)
+REFINE_MAX_PIXELS = 320 * 320   # per crop; the crop scale is lowered to stay under it
+MAX_REFINE_REGIONS = 4
+
+MOTION_THRESHOLD = 25        # grey-level difference that counts as motion
+MOTION_MIN_AREA = 16         # ignore motion blobs smaller than this (tracking-scale pixels)
+
+class AdaptiveScale:
+    """
+    Moves the detection scale along `scales` so the smoothed per-frame latency stays within
+    1 / target_fps: one step down as soon as the budget is exceeded `patience` times in a
+    row, one step up after `patience` frames comfortably under it. Latency is observed on
+    every frame, decisions are taken on detection frames only (the scale only matters there).
+    """
+
+    def __init__(self, target_fps, scales=DETECTION_SCALES, initial=None,
+                 smoothing=LATENCY_SMOOTHING, headroom=HEADROOM, patience=PATIENCE):
+        self.target_fps = target_fps
+        self.budget = 1.0 / target_fps
+        self.scales = sorted(scales)
+        initial = self.scales[len(self.scales) // 2] if initial is None else initial
+        self.level = min(range(len(self.scales)), key=lambda i: abs(self.scales[i] - initial))
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.patience = patience
+        self.latency = None
+        self._over = self._under = 0
+        self.changes = 0
+
+    @property
+    def scale(self):
+        return self.scales[self.level]
+
+    def observe(self, latency_s, decide=True):
+        """Record one frame's processing time. Returns the new scale if it changed, else None."""
+        if self.latency is None:
+            self.latency = latency_s
+        else:
+            self.latency = self.smoothing * self.latency + (1 - self.smoothing) * latency_s
+        if not decide:
+            return None
+
+        if self.latency > self.budget:
+            self._over, self._under = self._over + 1, 0
+        elif self.latency < self.headroom * self.budget:
+            self._over, self._under = 0, self._under + 1
+        else:
+            self._over = self._under = 0
+
+        step = 0
+        if self._over >= self.patience and self.level > 0:
+            step = -1
+        elif self._under >= self.patience and self.level < len(self.scales) - 1:
+            step = 1
+        if not step:
+            return None
+        self.level += step
+        self._over = self._under = 0
+        self.changes += 1
+        return self.scale
+
+    def stats(self):
+        return {"scale": self.scale, "target_fps": self.target_fps, "changes": self.changes,
+                "latency_ms": round(1000.0 * self.latency, 1) if self.latency is not None else None}
+
+class RoiMask:
+    """
+    Union of polygons in normalized (x, y) image coordinates, so one mask fits the camera at
+    any resolution / detection scale. `apply` crops to the polygons' bounding rectangle and
+    blanks the rest: HOG cost scales with the pixels left, not just the faces kept.
+    """
+
+    def __init__(self, polygons):
+        self.polygons = [np.asarray(p, dtype=np.float32).reshape(-1, 2) for p in polygons]
+        if not self.polygons or any(len(p) < 3 for p in self.polygons):
+            raise ValueError("ROI needs at least one polygon of 3+ points")
+        self._cache = {}
+
+    def mask(self, shape):
+        """uint8 mask (255 inside) and its bounding rect (y0, x0, y1, x1) for an HxW image."""
+        h, w = shape[:2]
+        cached = self._cache.get((h, w))
+        if cached is None:
+            mask = np.zeros((h, w), np.uint8)
+            pts = [np.round(p * (w - 1, h - 1)).astype(np.int32) for p in self.polygons]
+            cv2.fillPoly(mask, pts, 255)
+            ys, xs = np.nonzero(mask)
+            rect = (ys.min(), xs.min(), ys.max() + 1, xs.max() + 1) if len(ys) else (0, 0, 0, 0)
+            cached = self._cache[(h, w)] = (mask, rect)
+        return cached
+
+    def apply(self, image):
+        """Returns (masked crop, (y0, x0)) - add the offset to boxes found in the crop."""
+        mask, (y0, x0, y1, x1) = self.mask(image.shape)
+        crop = image[y0:y1, x0:x1]
+        crop = cv2.bitwise_and(crop, crop, mask=mask[y0:y1, x0:x1])
+        return crop, (y0, x0)
+
+    def contains(self, box, shape):
+        """Whether the centre of `box` (in an image of `shape`) lies inside the ROI."""
+        mask, _ = self.mask(shape)
+        top, right, bottom, left = box
+        cy = min(max((top + bottom) // 2, 0), shape[0] - 1)
+        cx = min(max((left + right) // 2, 0), shape[1] - 1)
+        return bool(mask[cy, cx])
+
+# ===================================================
+# Region refinement
+# ===================================================
+def scale_box(box, factor):
+    return tuple(int(round(v * factor)) for v in box)
+
+def offset_box(box, dy, dx):
+    top, right, bottom, left = box
+    return (top + dy, right + dx, bottom + dy, left + dx)
+
+def overlaps(a, b):
+    return min(a[2], b[2]) > max(a[0], b[0]) and min(a[1], b[1]) > max(a[3], b[3])
+
+def motion_regions(prev_gray, gray, threshold=MOTION_THRESHOLD, min_area=MOTION_MIN_AREA):
+    """Bounding boxes of areas that changed between two same-sized grayscale frames."""
+    if prev_gray is None or prev_gray.shape != gray.shape:
+        return []
+    diff = cv2.absdiff(prev_gray, gray)
+    _, moving = cv2.threshold(diff, threshold, 255, cv2.THRESH_BINARY)
+    moving = cv2.dilate(moving, None, iterations=2)
+    contours, _ = cv2.findContours(moving, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
+    for c in contours:
+        x, y, w, h = cv2.boundingRect(c)
+        if w * h >= min_area:
+            boxes.append((y, x + w, y + h, x))
+    return boxes
+
+def refine_regions(candidates, detected, shape, margin=REFINE_MARGIN, min_size=REFINE_MIN_SIZE,
+                   limit=MAX_REFINE_REGIONS):
+    """
+    Grow and clip candidate boxes (prior tracks, motion) and drop those a detection already
+    covers. Overlapping regions are merged; the largest `limit` are returned.
+    """
+    h, w = shape[:2]
+    regions = []
+    for top, right, bottom, left in candidates:
+        bh, bw = max(bottom - top, min_size), max(right - left, min_size)
+        cy, cx = (top + bottom) / 2.0, (left + right) / 2.0
+        bh, bw = bh * (1 + 2 * margin), bw * (1 + 2 * margin)
+        box = (max(0, int(cy - bh / 2)), min(w, int(math.ceil(cx + bw / 2))),
+               min(h, int(math.ceil(cy + bh / 2))), max(0, int(cx - bw / 2)))
+        if box[2] <= box[0] or box[1] <= box[3]:
+            continue
+        if any(overlaps(box, d) for d in detected):
+            continue
+        regions.append(box)
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if overlaps(a, b):
+                    regions[i] = (min(a[0], b[0]), max(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3]))
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    regions.sort(key=lambda r: (r[2] - r[0]) * (r[1] - r[3]), reverse=True)
+    return regions[:limit]
+
+def crop_scale(region_full, refine_scale=REFINE_SCALE, max_pixels=REFINE_MAX_PIXELS):
+    """Scale for one full-resolution crop: `refine_scale`, lowered to keep it under max_pixels."""
+    top, right, bottom, left = region_full
+    area = max(1, (bottom - top) * (right - left))
+    return min(refine_scale, math.sqrt(max_pixels / float(area)))
@@ -1,12 +1,14 @@
 import sys
 import os
-import shutil
-import csv
+from datetime import datetime
+from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit,
-    QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QInputDialog
+    QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QInputDialog, QProgressBar
 )
 
+from employee_registry import EmployeeRegistry
+
 # ========= Path Compatibility for PyInstaller ========= #
 if getattr(sys, 'frozen', False):
     base_path = sys._MEIPASS  # Temporary folder created by PyInstaller
@@ -15,6 +17,60 @@ else:
 
 KNOWN_FACES_DIR = os.path.join(base_path, "known_faces")
 PLATE_CSV = os.path.join(base_path, "plate_owner_mapping.csv")
+REGISTRY_DB = os.path.join(base_path, "registry.db")   # employees + plates (see employee_registry.py)
+GALLERY_DIR = os.path.join(base_path, "gallery")         # face gallery, updated on enrollment
+
+REJECT_REASONS = {"no_face": "no face found", "multiple_faces": "more than one face"}
+
+def open_registry():
+    """
+    The registry; the first time it is opened it imports PLATE_CSV and the existing
+    known_faces folders. That is recorded in the registry, so an emptied registry stays
+    empty (the CSV is no longer kept up to date and would bring deleted plates back).
+    """
+    registry = EmployeeRegistry(REGISTRY_DB, KNOWN_FACES_DIR, GALLERY_DIR)
+    if registry.get_meta("legacy_import") is None:
+        if os.path.exists(PLATE_CSV):
+            print(f"[INFO] Imported {registry.import_csv(PLATE_CSV)} plates from {PLATE_CSV}")
+        print(f"[INFO] Registered {registry.scan_faces_dir()} employees from {KNOWN_FACES_DIR}")
+        registry.set_meta("legacy_import", datetime.now().isoformat(timespec="seconds"))
+    return registry
+
+# ========= Enrollment Worker ========= #
+class EnrollWorker(QThread):
+    """
+    Gallery work off the Qt UI thread: encode a person's new photos, copy the accepted ones
+    and append their rows (or, with remove=True, drop all of the person's rows). Emits
+    progress(done, total) per photo and finished_with(result) at the end.
+    """
+    progress = pyqtSignal(int, int)
+    finished_with = pyqtSignal(dict)
+
+    def __init__(self, person, paths=(), remove=False):
+        super().__init__()
+        self.person = person
+        self.paths = list(paths)
+        self.remove = remove
+
+    def run(self):
+        # dlib is loaded here, on the worker, the first time anyone enrolls
+        from generate_encodings import enroll_images, update_gallery
+        try:
+            if self.remove:
+                version = update_gallery(remove_names=[self.person], known_dir=KNOWN_FACES_DIR,
+                                         gallery_dir=GALLERY_DIR)
+                self.finished_with.emit({"version": version})
+                return
+            accepted, rejected, version = enroll_images(
+                self.person, self.paths, KNOWN_FACES_DIR, GALLERY_DIR,
+                progress=lambda done, total, _: self.progress.emit(done, total))
+            self.finished_with.emit({"accepted": accepted, "rejected": rejected, "version": version})
+        except Exception as e:
+            self.finished_with.emit({"error": f"{e.__class__.__name__}: {e}"})
+
+def rejection_summary(rejected):
+    lines = [f"  {os.path.basename(path)}: {REJECT_REASONS.get(status, 'unreadable')}" for path, status in rejected]
+    return "\nRejected:\n" + "\n".join(lines) if lines else ""
 
 # ========= GUI CLASS ========= #
 class AdminGUI(QWidget):
@@ -73,10 +129,24 @@ class AdminGUI(QWidget):
         self.save_btn.clicked.connect(self.save_employee)
         self.layout.addWidget(self.save_btn)
 
+        self.export_btn = QPushButton("📄 Export Plate CSV")
+        self.export_btn.clicked.connect(self.export_plate_csv)
+        self.layout.addWidget(self.export_btn)
+
+        # ---- Enrollment progress ---- #
+        self.progress_label = QLabel("")
+        self.progress_bar = QProgressBar()
+        self.progress_label.hide()
+        self.progress_bar.hide()
+        self.layout.addWidget(self.progress_label)
+        self.layout.addWidget(self.progress_bar)
+
         self.setLayout(self.layout)
 
+        self.registry = open_registry()
         self.selected_images = []
         self.current_search_name = None
+        self.worker = None
 
     def select_images(self):
         dialog = QFileDialog(self)
@@ -90,8 +160,40 @@ class AdminGUI(QWidget):
                 self.selected_images = files
                 QMessageBox.information(self, "Images Selected", f"{len(files)} images selected.")
 
+    # ---------------- Background enrollment ---------------- #
+    def start_worker(self, worker, label, on_done):
+        """Run one EnrollWorker at a time; the edit buttons are disabled meanwhile."""
+        self.worker = worker
+        for btn in (self.save_btn, self.add_photos_btn, self.update_plate_btn, self.delete_btn):
+            btn.setEnabled(False)
+        self.progress_label.setText(label)
+        self.progress_bar.setRange(0, len(worker.paths))   # 0..0 = busy indicator
+        self.progress_bar.setValue(0)
+        self.progress_label.show()
+        self.progress_bar.show()
+        worker.progress.connect(lambda done, total: self.progress_bar.setValue(done))
+        worker.finished_with.connect(lambda result: self.worker_done(result, on_done))
+        worker.start()
+
+    def worker_done(self, result, on_done):
+        """Back on the UI thread; on_done reports the outcome (see gallery_failed)."""
+        self.worker = None
+        for btn in (self.save_btn, self.add_photos_btn, self.update_plate_btn, self.delete_btn):
+            btn.setEnabled(True)
+        self.progress_label.hide()
+        self.progress_bar.hide()
+        on_done(result)
+
+    def gallery_failed(self, result, consequence=""):
+        """Show a failed worker's error (plus what it leaves behind). Returns True if it failed."""
+        if "error" not in result:
+            return False
+        QMessageBox.critical(self, "Gallery Error",
+                             f"Could not update the face gallery:\n{result['error']}" + consequence)
+        return True
+
     def save_employee(self):
-        emp_name = self.name_input.text().strip()
+        emp_name = " ".join(self.name_input.text().split())
         plate_number = self.plate_input.text().strip().upper()
 
         if not emp_name:
@@ -102,27 +204,45 @@ class AdminGUI(QWidget):
             QMessageBox.critical(self, "Error", "Select face images or enter a plate number!")
             return
 
-        os.makedirs(KNOWN_FACES_DIR, exist_ok=True)
-        emp_folder = os.path.join(KNOWN_FACES_DIR, emp_name)
-        os.makedirs(emp_folder, exist_ok=True)
+        existing = self.registry.get(emp_name)
+        if existing is not None:
+            QMessageBox.critical(self, "Error", f"Employee {existing['name']} already exists.\n"
+                                                "Use Search to add photos or change the plate.")
+            return
+        owner = self.registry.owner_of(plate_number) if plate_number else None
+        if owner is not None:
+            QMessageBox.critical(self, "Error", f"Plate {owner[0]} is already registered to {owner[1]}.")
+            return
 
-        saved_images_count = 0
-        for img_path in self.selected_images:
-            shutil.copy(img_path, emp_folder)
-            saved_images_count += 1
+        # Registry row first, so the gallery never holds rows for someone the registry
+        # rejected (e.g. a plate registered meanwhile); finish_save undoes it on failure.
+        try:
+            self.registry.add_employee(emp_name, plate_number or None)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        if not self.selected_images:
+            self.finish_save(emp_name, plate_number, {"accepted": [], "rejected": []})
+            return
+        self.start_worker(EnrollWorker(emp_name, self.selected_images),
+                          f"Enrolling {emp_name}...", lambda result: self.finish_save(emp_name, plate_number, result))
 
-        if plate_number:
-            csv_exists = os.path.exists(PLATE_CSV)
-            with open(PLATE_CSV, mode="a", newline="") as file:
-                writer = csv.writer(file)
-                if not csv_exists:
-                    writer.writerow(["PlateNumber", "OwnerName"])
-                writer.writerow([plate_number, emp_name])
-
-        msg = f"Employee {emp_name} added successfully.\nImages: {saved_images_count}"
+    def finish_save(self, emp_name, plate_number, result):
+        accepted, rejected = result.get("accepted", []), result.get("rejected", [])
+        if self.gallery_failed(result, f"\n\n{emp_name} was not saved."):
+            self.registry.delete_employee(emp_name)   # and any photos copied before the failure
+            return
+        if not accepted and not plate_number:
+            self.registry.delete_employee(emp_name)
+            QMessageBox.critical(self, "Not Saved", f"No usable face photo for {emp_name}."
+                                 + rejection_summary(rejected))
+            return
+        self.registry.refresh_photos(emp_name)
+
+        msg = f"Employee {emp_name} added successfully.\nImages: {len(accepted)}"
         if plate_number:
             msg += f"\nPlate Number: {plate_number}"
-        QMessageBox.information(self, "Saved", msg)
+        QMessageBox.information(self, "Saved", msg + rejection_summary(rejected))
 
         self.name_input.clear()
         self.plate_input.clear()
@@ -134,30 +254,20 @@ class AdminGUI(QWidget):
             QMessageBox.warning(self, "Error", "Please enter a name.")
             return
 
-        emp_folder = os.path.join(KNOWN_FACES_DIR, name)
-        if not os.path.exists(emp_folder):
+        employee = self.registry.get(name)
+        if employee is None:
             self.search_result_label.setText(f"❌ No record found for {name}")
             self.add_photos_btn.hide()
             self.update_plate_btn.hide()
             self.delete_btn.hide()
             return
 
-        photo_count = len([f for f in os.listdir(emp_folder) if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-
-        plate_number = "Not Assigned"
-        if os.path.exists(PLATE_CSV):
-            with open(PLATE_CSV, "r") as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row["OwnerName"].strip().lower() == name.lower():
-                        plate_number = row["PlateNumber"]
-                        break
-
+        plate_number = ", ".join(employee["plates"]) or "Not Assigned"
         self.search_result_label.setText(
-            f"✅ Name: {name}\n✅ Photos: {photo_count}\n✅ Plate: {plate_number}"
+            f"✅ Name: {employee['name']}\n✅ Photos: {employee['photos']}\n✅ Plate: {plate_number}"
         )
 
-        self.current_search_name = name
+        self.current_search_name = employee["name"]
         self.add_photos_btn.show()
         self.update_plate_btn.show()
         self.delete_btn.show()
@@ -171,10 +281,21 @@ class AdminGUI(QWidget):
 
         if dialog.exec_():
             files = dialog.selectedFiles()
-            emp_folder = os.path.join(KNOWN_FACES_DIR, self.current_search_name)
-            for img_path in files:
-                shutil.copy(img_path, emp_folder)
-            QMessageBox.information(self, "Photos Added", f"Added {len(files)} photos.")
+            if files:
+                name = self.current_search_name
+                self.start_worker(EnrollWorker(name, files), f"Adding photos for {name}...",
+                                  lambda result: self.finish_add_photos(name, result))
+
+    def finish_add_photos(self, name, result):
+        accepted = result.get("accepted", [])
+        self.registry.refresh_photos(name)
+        if self.gallery_failed(result):
+            return
+        QMessageBox.information(self, "Photos Added", f"Added {len(accepted)} photos."
+                                + rejection_summary(result.get("rejected", [])))
+        if name == self.current_search_name:
+            self.search_input.setText(name)
+            self.search_employee()
 
     def update_plate_number(self):
         if not self.current_search_name:
@@ -184,20 +305,11 @@ class AdminGUI(QWidget):
             return
 
         new_plate = new_plate.strip().upper()
-        rows = []
-        if os.path.exists(PLATE_CSV):
-            with open(PLATE_CSV, "r") as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row["OwnerName"].strip().lower() == self.current_search_name.lower():
-                        row["PlateNumber"] = new_plate
-                    rows.append(row)
-
-        with open(PLATE_CSV, "w", newline="") as file:
-            writer = csv.DictWriter(file, fieldnames=["PlateNumber", "OwnerName"])
-            writer.writeheader()
-            for row in rows:
-                writer.writerow(row)
+        try:
+            self.registry.set_plate(self.current_search_name, new_plate)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
 
         QMessageBox.information(self, "Updated", f"Plate updated to {new_plate}")
 
@@ -211,29 +323,33 @@ class AdminGUI(QWidget):
         if confirm != QMessageBox.Yes:
             return
 
-        emp_folder = os.path.join(KNOWN_FACES_DIR, self.current_search_name)
-        if os.path.exists(emp_folder):
-            shutil.rmtree(emp_folder)
+        # Registry row and photos go first, so even a full gallery rebuild can't bring the
+        # person back; the outcome is reported once their gallery rows are gone too.
+        name = self.current_search_name
+        self.registry.delete_employee(name)
+        self.start_worker(EnrollWorker(name, remove=True), f"Removing {name} from the face gallery...",
+                          lambda result: self.finish_delete(name, result))
+
+    def finish_delete(self, name, result):
+        if not self.gallery_failed(result, f"\n\n{name} was removed from the registry but is still "
+                                           "recognized. Run generate_encodings.py to rebuild the gallery."):
+            QMessageBox.information(self, "Deleted", f"Employee {name} deleted.")
+        if name == self.current_search_name:
+            self.search_result_label.setText("")
+            self.add_photos_btn.hide()
+            self.update_plate_btn.hide()
+            self.delete_btn.hide()
+            self.current_search_name = None
 
-        if os.path.exists(PLATE_CSV):
-            rows = []
-            with open(PLATE_CSV, "r") as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row["OwnerName"].strip().lower() != self.current_search_name.lower():
-                        rows.append(row)
-            with open(PLATE_CSV, "w", newline="") as file:
-                writer = csv.DictWriter(file, fieldnames=["PlateNumber", "OwnerName"])
-                writer.writeheader()
-                for row in rows:
-                    writer.writerow(row)
-
-        QMessageBox.information(self, "Deleted", f"Employee {self.current_search_name} deleted.")
-        self.search_result_label.setText("")
-        self.add_photos_btn.hide()
-        self.update_plate_btn.hide()
-        self.delete_btn.hide()
-        self.current_search_name = None
+    def export_plate_csv(self):
+        count = self.registry.export_csv(PLATE_CSV)
+        QMessageBox.information(self, "Exported", f"{count} plates written to {PLATE_CSV}")
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.wait()
+        self.registry.close()
+        super().closeEvent(event)
 
 # ========= Launch App ========= #
 def run_admin_gui():
@@ -1,4 +1,7 @@
 # augment_known_faces.py
+# Writes rotated / flipped / brightened copies of every photo into known_faces/.
+# Prefer `python generate_encodings.py --augment`: the same variants, made in memory while
+# encoding, without extra files (which also inflate the admin panel's photo counts).
 import os
 from PIL import Image, ImageEnhance, ImageOps
 
@@ -64,5 +67,5 @@ for person in os.listdir(INPUT_ROOT):
         except Exception as e:
             print(f"⚠️ Skipped {src_path}: {e}")
 
-print("✅ Augmentation complete. Now re-run generate_encodings.py to update encodings.pkl")
+print("✅ Augmentation complete. Now re-run generate_encodings.py to update the face gallery")
 
@@ -0,0 +1,305 @@
+# dual_auth.py
+# Dual authentication: joins the face and plate event streams of each lane (gate) into one
+# access decision per vehicle.
+#
+#   authorized       - registered plate, and its owner's face seen in the lane
+#   mismatch         - registered plate, but only someone else's known face
+#   unknown_vehicle  - plate not in the registry
+#   unknown_driver   - registered plate, but only unknown faces (or none) within the wait
+#
+# Cameras are grouped into lanes with "lane" in cameras.json (default: each camera is its own
+# lane, i.e. one camera sees both the plate and the driver). Per lane, short sliding windows:
+#   faces    - normalized name -> last sighting, oldest first, evicted after FACE_WINDOW
+#   pending  - registered plates waiting up to FACE_WAIT for their owner, indexed by owner
+# so every event is O(1): a plate looks up its owner among the lane's faces, a known face
+# looks up the plates waiting for it, and expiry pops from the front of the windows.
+#
+# Grant latency = car arrival (first sighting of the plate) -> decision.
+#
+#   python dual_auth.py --db events.db --days 1      # replay stored events, decision/latency report
+
+import re
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict, deque, defaultdict
+
+from recognition_engine import RecognitionEvent
+
+# ===================================================
+# Configuration
+# ===================================================
+FACE_WINDOW = 15.0           # seconds a face sighting can still vouch for a later plate
+FACE_WAIT = 6.0              # seconds a registered plate waits for its owner's face
+PLATE_REPEAT_SECONDS = 30.0  # the same plate in the same lane within this is the same visit
+LATENCY_SAMPLES = 1000       # recent decisions kept for the latency percentiles
+DECISIONS = ("authorized", "mismatch", "unknown_vehicle", "unknown_driver")
+
+def normalize_name(name):
+    """'Taylor Swift', 'taylor_swift' and 'taylor-swift' are the same person."""
+    return re.sub(r"[^a-z0-9]+", "_", (name or "").lower()).strip("_")
+
+class _Lane:
+    """Sliding windows of one lane."""
+
+    def __init__(self):
+        self.faces = OrderedDict()      # name -> (timestamp, event), most recent last
+        self.unknown_face = None        # timestamp of the last unknown face
+        self.pending = {}               # owner name -> [visit], waiting for that face
+        self.deadlines = deque()        # visits in arrival order (= deadline order)
+        self.plates = OrderedDict()     # plate -> arrival, for repeat suppression
+
+    def evict(self, face_horizon, plate_horizon):
+        while self.faces and next(iter(self.faces.values()))[0] < face_horizon:
+            self.faces.popitem(last=False)
+        while self.plates and next(iter(self.plates.values())) < plate_horizon:
+            self.plates.popitem(last=False)
+
+    def face_since(self, name, since):
+        seen = self.faces.get(name)
+        return seen[1] if seen is not None and seen[0] >= since else None
+
+    def last_known_face(self, since):
+        if not self.faces:
+            return None
+        ts, event = next(reversed(self.faces.values()))
+        return event if ts >= since else None
+
+class DualAuth:
+    """
+    Thread-safe fusion of RecognitionEvents ("known" / "unknown" faces and "plate" reads from
+    PlateReader) into "access" RecognitionEvents, passed to on_decision:
+      name      - the decision (see DECISIONS)
+      camera    - the lane
+      track_id  - the plate track, timestamp - car arrival, distance - the plate's
+      detail    - {"plate", "read", "owner", "driver", "plate_camera", "face_camera",
+                   "face_distance", "latency_s"}
+
+    lanes maps camera id -> lane id. Registered plates whose owner hasn't been seen are
+    decided by `poll` once FACE_WAIT has passed; `start` runs it on a background thread.
+    `clock` is the time source for waits and latency (time.time; replay passes event time).
+    """
+
+    def __init__(self, lanes=None, on_decision=None, face_window=FACE_WINDOW, face_wait=FACE_WAIT,
+                 clock=time.time):
+        self.lanes = dict(lanes or {})
+        self.on_decision = on_decision
+        self.face_window = face_window
+        self.face_wait = face_wait
+        self.clock = clock
+        self._lanes = defaultdict(_Lane)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.running = False
+        self.counts = dict.fromkeys(DECISIONS, 0)
+        self.repeats = 0
+        self._latency = {d: deque(maxlen=LATENCY_SAMPLES) for d in DECISIONS}
+
+    def lane_of(self, camera):
+        return self.lanes.get(camera, camera)
+
+    # ---------------- Event intake ---------------- #
+    def submit(self, event, now=None):
+        """Feed one recognition event (any kind; others are ignored). Never blocks for long."""
+        now = self.clock() if now is None else now
+        decisions = []
+        with self._lock:
+            lane = self._lanes[self.lane_of(event.camera)]
+            # Faces stay until no pending or late-read plate can still use them
+            lane.evict(now - self.face_window - self.face_wait, now - PLATE_REPEAT_SECONDS)
+            if event.kind == "known":
+                decisions = self._on_face(lane, event, now)
+            elif event.kind == "unknown":
+                lane.unknown_face = event.timestamp
+            elif event.kind == "plate":
+                decisions = self._on_plate(lane, event, now)
+            decisions.extend(self._expire(lane, now))
+        self._emit(decisions)
+
+    def _on_face(self, lane, event, now):
+        name = normalize_name(event.name)
+        lane.faces[name] = (event.timestamp, event)
+        lane.faces.move_to_end(name)
+        waiting = lane.pending.pop(name, None)
+        if not waiting:
+            return []
+        decisions = []
+        for visit in waiting:
+            visit["done"] = True
+            decisions.append(self._decide(visit, "authorized", event, now))
+        return decisions
+
+    def _on_plate(self, lane, event, now):
+        detail = event.detail or {}
+        arrival = event.timestamp
+        key = detail.get("plate") or event.name
+        if key in lane.plates:
+            self.repeats += 1
+            return []
+        lane.plates[key] = arrival
+        visit = {"plate": event, "lane": self.lane_of(event.camera), "arrival": arrival,
+                 "owner": normalize_name(detail.get("owner")), "deadline": arrival + self.face_wait,
+                 "done": False}
+        since = arrival - self.face_window
+        if detail.get("plate") is None:
+            return [self._decide(visit, "unknown_vehicle", lane.last_known_face(since), now)]
+        face = lane.face_since(visit["owner"], since) if visit["owner"] else None
+        if face is not None:
+            return [self._decide(visit, "authorized", face, now)]
+        if visit["owner"]:
+            lane.pending.setdefault(visit["owner"], []).append(visit)
+        lane.deadlines.append(visit)
+        return []
+
+    # ---------------- Deadlines ---------------- #
+    def _expire(self, lane, now, force=False):
+        """Decide the lane's visits whose owner didn't show up within the wait (lock held)."""
+        decisions = []
+        while lane.deadlines and (force or lane.deadlines[0]["deadline"] <= now):
+            visit = lane.deadlines.popleft()
+            if visit["done"]:
+                continue
+            waiting = lane.pending.get(visit["owner"])
+            if waiting:
+                waiting.remove(visit)
+                if not waiting:
+                    del lane.pending[visit["owner"]]
+            since = visit["arrival"] - self.face_window
+            other = lane.last_known_face(since)
+            if other is not None:
+                decisions.append(self._decide(visit, "mismatch", other, now))
+            else:
+                unknown = lane.unknown_face is not None and lane.unknown_face >= since
+                decisions.append(self._decide(visit, "unknown_driver", None, now, unknown_face=unknown))
+        return decisions
+
+    def poll(self, now=None, force=False):
+        """Decide every visit whose wait is over (all of them with force)."""
+        now = self.clock() if now is None else now
+        decisions = []
+        with self._lock:
+            for lane in self._lanes.values():
+                decisions.extend(self._expire(lane, now, force))
+        self._emit(decisions)
+
+    def start(self, interval=0.2):
+        if self._thread is not None:
+            return
+        self.running = True
+
+        def run():
+            while self.running:
+                time.sleep(interval)
+                self.poll()
+
+        self._thread = threading.Thread(target=run, name="dual-auth", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self.poll(force=True)
+
+    # ---------------- Decisions ---------------- #
+    def _decide(self, visit, decision, face, now, unknown_face=False):
+        plate = visit["plate"]
+        detail = plate.detail or {}
+        latency = max(0.0, now - visit["arrival"])
+        self.counts[decision] += 1
+        self._latency[decision].append(latency)
+        driver = face.name if face is not None else ("Unknown" if unknown_face else None)
+        return RecognitionEvent(visit["lane"], "access", decision, plate.distance, plate.track_id, visit["arrival"],
+                                detail={"plate": plate.name, "read": detail.get("read"),
+                                        "owner": detail.get("owner"), "driver": driver,
+                                        "plate_camera": plate.camera,
+                                        "face_camera": face.camera if face is not None else None,
+                                        "face_distance": face.distance if face is not None else None,
+                                        "latency_s": round(latency, 3)})
+
+    def _emit(self, decisions):
+        if self.on_decision is not None:
+            for decision in decisions:
+                self.on_decision(decision)
+
+    @staticmethod
+    def _percentile(values, q):
+        if not values:
+            return None
+        values = sorted(values)
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    def stats(self):
+        """Decision counts and grant latency (arrival -> decision, seconds) percentiles."""
+        with self._lock:
+            granted = list(self._latency["authorized"])
+            every = [v for d in DECISIONS for v in self._latency[d]]
+            counts = dict(self.counts)
+            pending = sum(not v["done"] for lane in self._lanes.values() for v in lane.deadlines)
+        return {**counts, "repeats": self.repeats, "pending": pending,
+                "grant_p50_s": self._percentile(granted, 0.5), "grant_p95_s": self._percentile(granted, 0.95),
+                "grant_max_s": round(max(granted), 3) if granted else None,
+                "decision_p95_s": self._percentile(every, 0.95)}
+
+# ===================================================
+# Replay
+# ===================================================
+class _Stored(RecognitionEvent):
+    """RecognitionEvent rebuilt from an event store row."""
+
+    def __init__(self, row):
+        super().__init__(row["camera"], row["kind"], row["name"], row["distance"], row["track_id"], row["ts"],
+                         detail=json.loads(row["detail"]) if row["detail"] else None)
+
+    @property
+    def available(self):
+        """When the event was known live: plate events are stamped with the car's arrival."""
+        if self.kind != "plate":
+            return self.timestamp
+        return self.timestamp + ((self.detail or {}).get("latency_s") or 0.0)
+
+if __name__ == "__main__":
+    from datetime import datetime, timedelta
+    from event_store import EventStore, EVENT_DB, parse_time
+    from recognition_engine import load_camera_config, CAMERA_CONFIG_FILE
+
+    ap = argparse.ArgumentParser(description="Replay stored face/plate events through the dual-auth fusion.")
+    ap.add_argument("--db", default=EVENT_DB)
+    ap.add_argument("--config", default=CAMERA_CONFIG_FILE, help="cameras.json with \"lane\" per camera")
+    ap.add_argument("--since", help="ISO date/time")
+    ap.add_argument("--until", help="ISO date/time")
+    ap.add_argument("--days", type=float, help="shorthand for --since <now - N days>")
+    ap.add_argument("--face-window", type=float, default=FACE_WINDOW)
+    ap.add_argument("--face-wait", type=float, default=FACE_WAIT)
+    ap.add_argument("--quiet", action="store_true", help="only the summary")
+    args = ap.parse_args()
+
+    since = parse_time(args.since)
+    if args.days is not None:
+        since = (datetime.now() - timedelta(days=args.days)).timestamp()
+    store = EventStore(args.db)
+    events = [_Stored(r) for r in store.query(since=since, until=parse_time(args.until), newest_first=False)
+              if r["kind"] in ("known", "unknown", "plate")]
+    store.close()
+    events.sort(key=lambda e: e.available)
+
+    lanes = {cam: options["lane"] for cam, options in load_camera_config(args.config).items() if options.get("lane")}
+
+    def show(decision):
+        if not args.quiet:
+            d = decision.detail
+            print(f"[EVENT] {decision.datetime:%Y-%m-%d %H:%M:%S} {decision.camera} {decision.name:<15} "
+                  f"plate {d['plate']} owner {d['owner']} driver {d['driver']} ({d['latency_s']:.2f}s)")
+
+    fusion = DualAuth(lanes, on_decision=show, face_window=args.face_window, face_wait=args.face_wait)
+    t0 = time.perf_counter()
+    for event in events:
+        fusion.poll(event.available)
+        fusion.submit(event, now=event.available)
+    fusion.poll(force=True, now=events[-1].available + args.face_wait if events else 0.0)
+    elapsed = time.perf_counter() - t0
+    print(f"\n[STATS] {len(events)} events replayed in {1000 * elapsed:.1f} ms "
+          f"({1e6 * elapsed / max(1, len(events)):.1f} us/event)")
+    print(f"[STATS] dual auth: {fusion.stats()}")
@@ -0,0 +1,362 @@
+# employee_registry.py
+# Employee / plate registry: SQLite in WAL mode with primary keys on the normalized employee
+# name and the normalized plate. Replaces scanning and rewriting plate_owner_mapping.csv from
+# the admin panel; the CSV stays available as import/export (same PlateNumber,OwnerName format).
+#
+# Photo counts of each known_faces/<name> folder are cached with the folder's mtime, so a
+# lookup costs one stat() and the folder is only listed again after it changed. Variant
+# files left by augment_known_faces.py only count while the gallery encodes them (built
+# without --augment).
+#
+#   python employee_registry.py --import-csv plate_owner_mapping.csv --scan    # + known_faces/ folders
+#   python employee_registry.py --find "Taylor Swift"
+#   python employee_registry.py --plate "MH 20 EE 7598"
+#   python employee_registry.py --export plate_owner_mapping.csv
+
+import os
+import re
+import csv
+import time
+import shutil
+import sqlite3
+import argparse
+import threading
+
+from plate_ocr import normalize_plate_text, PLATE_COLUMNS, OWNER_COLUMNS
+from gallery_store import is_augmented_file, gallery_augment, GALLERY_DIR, MANIFEST_FILE
+
+# ===================================================
+# Configuration
+# ===================================================
+REGISTRY_DB = "registry.db"
+SCHEMA_VERSION = 1
+PHOTO_EXTS = (".jpg", ".jpeg", ".png")
+EXPORT_HEADER = ["PlateNumber", "OwnerName"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    key          TEXT PRIMARY KEY,      -- normalized name (see name_key)
+    name         TEXT NOT NULL,         -- as entered; also the known_faces folder name
+    photos       INTEGER NOT NULL DEFAULT 0,
+    photos_mtime REAL,                  -- folder mtime the cached photo count was taken at
+    created      REAL NOT NULL,
+    updated      REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plates (
+    plate     TEXT PRIMARY KEY,         -- normalize_plate_text(display)
+    display   TEXT NOT NULL,            -- as registered, e.g. "MH 20 EE 7598"
+    owner_key TEXT NOT NULL REFERENCES employees (key) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS plates_owner ON plates (owner_key);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,             -- "legacy_import": when the CSV / folders were imported,
+                                        -- "count_variants": whether cached photo counts include variant files
+    value TEXT
+);
+"""
+
+def name_key(name):
+    """Case-, whitespace- and underscore-insensitive key ('Taylor  Swift' == 'taylor_swift')."""
+    return " ".join(re.split(r"[\s_]+", (name or "").strip())).lower()
+
+def count_photos(folder, variants=True):
+    """Photos in an employee folder; variants=False leaves out augment_known_faces.py's files."""
+    try:
+        return sum(1 for f in os.listdir(folder)
+                   if f.lower().endswith(PHOTO_EXTS) and (variants or not is_augmented_file(f)))
+    except OSError:
+        return 0
+
+def folder_mtime(folder):
+    try:
+        return os.stat(folder).st_mtime
+    except OSError:
+        return None
+
+class EmployeeRegistry:
+    """
+    Thread-safe wrapper over one SQLite connection; every update is one transaction.
+    Several processes (admin panel, surveillance GUI) may open the same file.
+
+    faces_dir is the known_faces folder whose per-employee photo counts are cached;
+    gallery_dir tells whether variant files are encoded (and so counted) or skipped.
+    Errors the admin should see (duplicate employee, plate owned by someone else, unknown
+    employee) are raised as ValueError with a readable message.
+    """
+
+    def __init__(self, path=REGISTRY_DB, faces_dir="known_faces", gallery_dir=GALLERY_DIR):
+        self.path = path
+        self.faces_dir = faces_dir
+        self.gallery_dir = gallery_dir
+        self._manifest_mtime = None
+        self._variants = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM employees").fetchone()[0]
+
+    def folder(self, name):
+        return os.path.join(self.faces_dir, name)
+
+    def count_variants(self):
+        """
+        True while the gallery is built without augmentation, so augment_known_faces.py's
+        variant files are encoded like any photo. Cached counts taken under the other mode
+        are invalidated (recounted on their next lookup).
+        """
+        mtime = folder_mtime(os.path.join(self.gallery_dir, MANIFEST_FILE))
+        if self._variants is None or mtime != self._manifest_mtime:
+            variants = gallery_augment(self.gallery_dir) == "off"
+            with self._lock, self._conn:
+                row = self._conn.execute("SELECT value FROM meta WHERE key = 'count_variants'").fetchone()
+                if row is None or row[0] != str(int(variants)):
+                    self._conn.execute("UPDATE employees SET photos_mtime = NULL")
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('count_variants', ?)",
+                                       (str(int(variants)),))
+            self._manifest_mtime, self._variants = mtime, variants
+        return self._variants
+
+    # ---------------- Lookups ---------------- #
+    def get(self, name):
+        """
+        {"name", "photos", "plates": [display, ...]} for one employee, or None. The photo
+        count is refreshed only if the employee's folder changed since it was cached.
+        """
+        key = name_key(name)
+        variants = self.count_variants()
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM employees WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            plates = [r[0] for r in self._conn.execute(
+                "SELECT display FROM plates WHERE owner_key = ? ORDER BY display", (key,))]
+        photos = row["photos"]
+        folder = self.folder(row["name"])
+        mtime = folder_mtime(folder)
+        if mtime != row["photos_mtime"]:
+            photos = count_photos(folder, variants)
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE employees SET photos = ?, photos_mtime = ? WHERE key = ?",
+                                   (photos, mtime, key))
+        return {"name": row["name"], "photos": photos, "plates": plates}
+
+    def owner_of(self, plate):
+        """(plate as registered, owner name) for a plate in any spelling, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT p.display, e.name FROM plates p JOIN employees e ON e.key = p.owner_key WHERE p.plate = ?",
+                (normalize_plate_text(plate),)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def plate_registry(self):
+        """Normalized plate -> (plate as registered, owner), like plate_ocr.load_plate_registry."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.plate, p.display, e.name FROM plates p JOIN employees e ON e.key = p.owner_key").fetchall()
+        return {plate: (display, owner) for plate, display, owner in rows}
+
+    # ---------------- Updates ---------------- #
+    def _check_plate(self, plate, key):
+        norm = normalize_plate_text(plate)
+        if not norm:
+            raise ValueError(f"'{plate}' is not a valid plate number.")
+        row = self._conn.execute(
+            "SELECT e.name FROM plates p JOIN employees e ON e.key = p.owner_key "
+            "WHERE p.plate = ? AND p.owner_key != ?", (norm, key)).fetchone()
+        if row is not None:
+            raise ValueError(f"Plate {plate} is already registered to {row[0]}.")
+        return norm
+
+    def add_employee(self, name, plate=None, photos=()):
+        """
+        New employee with an optional plate; `photos` are copied into its folder. Raises
+        ValueError if the employee (any spelling) or the plate is already registered.
+        """
+        name = " ".join(name.split())
+        key = name_key(name)
+        if not key:
+            raise ValueError("Please enter the employee name!")
+        now = time.time()
+        with self._lock, self._conn:
+            existing = self._conn.execute("SELECT name FROM employees WHERE key = ?", (key,)).fetchone()
+            if existing is not None:
+                raise ValueError(f"Employee {existing[0]} already exists.")
+            norm = self._check_plate(plate, key) if plate else None
+            self._conn.execute("INSERT INTO employees (key, name, created, updated) VALUES (?, ?, ?, ?)",
+                               (key, name, now, now))
+            if norm:
+                self._conn.execute("INSERT INTO plates (plate, display, owner_key) VALUES (?, ?, ?)",
+                                   (norm, plate.strip().upper(), key))
+        return self.add_photos(name, photos) if photos else 0
+
+    def add_photos(self, name, paths):
+        """Copy image files into the employee's folder and update the cached count. Returns the count copied."""
+        employee = self.get(name)
+        if employee is None:
+            raise ValueError(f"No record found for {name}")
+        folder = self.folder(employee["name"])
+        os.makedirs(folder, exist_ok=True)
+        for path in paths:
+            shutil.copy(path, folder)
+        self.refresh_photos(employee["name"])
+        return len(paths)
+
+    def refresh_photos(self, name):
+        folder = self.folder(name)
+        photos = count_photos(folder, self.count_variants())
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE employees SET photos = ?, photos_mtime = ?, updated = ? WHERE key = ?",
+                               (photos, folder_mtime(folder), time.time(), name_key(name)))
+
+    def set_plate(self, name, plate):
+        """Replace the employee's plate(s) with `plate` (one transaction)."""
+        key = name_key(name)
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM employees WHERE key = ?", (key,)).fetchone() is None:
+                raise ValueError(f"No record found for {name}")
+            norm = self._check_plate(plate, key)
+            self._conn.execute("DELETE FROM plates WHERE owner_key = ?", (key,))
+            self._conn.execute("INSERT INTO plates (plate, display, owner_key) VALUES (?, ?, ?)",
+                               (norm, plate.strip().upper(), key))
+            self._conn.execute("UPDATE employees SET updated = ? WHERE key = ?", (time.time(), key))
+
+    def delete_employee(self, name, delete_photos=True):
+        """Remove the employee and their plates; with delete_photos also their folder. Returns False if unknown."""
+        key = name_key(name)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT name FROM employees WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False
+            self._conn.execute("DELETE FROM employees WHERE key = ?", (key,))   # plates cascade
+        if delete_photos and os.path.isdir(self.folder(row[0])):
+            shutil.rmtree(self.folder(row[0]))
+        return True
+
+    # ---------------- Bulk import / export ---------------- #
+    def import_csv(self, path):
+        """
+        Load a plate_owner_mapping.csv (same column names as load_plate_registry) in one
+        transaction. Owners are created as needed; a plate listed twice keeps its last owner.
+        Returns the number of plates imported.
+        """
+        now = time.time()
+        employees, plates = {}, {}
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            keys = reader.fieldnames or []
+            col = next((k for k in PLATE_COLUMNS if k in keys), None)
+            owner_col = next((k for k in OWNER_COLUMNS if k in keys), None)
+            if col is None or owner_col is None:
+                raise ValueError(f"{path}: needs a plate and an owner column, found {keys}")
+            for row in reader:
+                plate = (row.get(col) or "").strip().upper()
+                owner = " ".join((row.get(owner_col) or "").split())
+                norm = normalize_plate_text(plate)
+                if norm and owner:
+                    employees.setdefault(name_key(owner), owner)
+                    plates[norm] = (plate, name_key(owner))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO employees (key, name, created, updated) VALUES (?, ?, ?, ?)",
+                [(key, name, now, now) for key, name in employees.items()])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO plates (plate, display, owner_key) VALUES (?, ?, ?)",
+                [(norm, display, key) for norm, (display, key) in plates.items()])
+        return len(plates)
+
+    def scan_faces_dir(self):
+        """Register every known_faces/<name> folder not registered yet, with its photo count. Returns how many."""
+        if not os.path.isdir(self.faces_dir):
+            return 0
+        now = time.time()
+        variants = self.count_variants()
+        rows = []
+        for entry in os.scandir(self.faces_dir):
+            if entry.is_dir():
+                rows.append((name_key(entry.name), entry.name, count_photos(entry.path, variants),
+                             folder_mtime(entry.path), now, now))
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO employees (key, name, photos, photos_mtime, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            return self._conn.total_changes - before
+
+    def export_csv(self, path):
+        """Write the plate -> owner mapping in the plate_owner_mapping.csv format (atomic replace)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.display, e.name FROM plates p JOIN employees e ON e.key = p.owner_key "
+                "ORDER BY e.key, p.display").fetchall()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_HEADER)
+            writer.writerows(tuple(r) for r in rows)
+        os.replace(tmp, path)
+        return len(rows)
+
+    # ---------------- Metadata ---------------- #
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def stats(self):
+        with self._lock:
+            employees, photos = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(photos), 0) FROM employees").fetchone()
+            plates = self._conn.execute("SELECT COUNT(*) FROM plates").fetchone()[0]
+        return {"employees": employees, "plates": plates, "photos": photos}
+
+# ===================================================
+# CLI
+# ===================================================
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Query, import and export the employee / plate registry.")
+    ap.add_argument("--db", default=REGISTRY_DB)
+    ap.add_argument("--faces-dir", default="known_faces")
+    ap.add_argument("--gallery-dir", default=GALLERY_DIR)
+    ap.add_argument("--import-csv", metavar="CSV", help="load a plate_owner_mapping.csv")
+    ap.add_argument("--scan", action="store_true", help="register every known_faces/<name> folder")
+    ap.add_argument("--export", metavar="CSV", help="write the plate -> owner mapping CSV")
+    ap.add_argument("--find", metavar="NAME")
+    ap.add_argument("--plate", metavar="PLATE", help="owner of a plate (any spelling)")
+    ap.add_argument("--stats", action="store_true")
+    args = ap.parse_args()
+
+    registry = EmployeeRegistry(args.db, args.faces_dir, args.gallery_dir)
+    if args.import_csv:
+        t0 = time.perf_counter()
+        n = registry.import_csv(args.import_csv)
+        print(f"[INFO] Imported {n} plates from {args.import_csv} ({time.perf_counter() - t0:.2f}s).")
+    if args.scan:
+        print(f"[INFO] Registered {registry.scan_faces_dir()} new employees from {args.faces_dir}.")
+    if args.find:
+        t0 = time.perf_counter()
+        employee = registry.get(args.find)
+        print(employee if employee else f"[INFO] No record found for {args.find}",
+              f"({1000 * (time.perf_counter() - t0):.2f} ms)")
+    if args.plate:
+        print(registry.owner_of(args.plate) or f"[INFO] Plate {args.plate} is not registered")
+    if args.export:
+        print(f"[INFO] Exported {registry.export_csv(args.export)} plates to {args.export}")
+    if args.stats or not (args.import_csv or args.scan or args.find or args.plate or args.export):
+        print(registry.stats())
+    registry.close()
@@ -1,231 +1,391 @@
-import cv2
-import face_recognition
-import numpy as np
 import os
+import cv2
+import sys
+import time
 import subprocess
-from datetime import datetime
-import csv
 import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk
-import threading
-import pickle
-import time
-
-# ===================================================
-# Configuration and Setup
-# ===================================================
-KNOWN_FACES_DIR = "known_faces"
-UNKNOWN_DIR = "Unknown_faces"
-LOG_FILE = "unknown_faces_log.csv"
-ENCODING_FILE = "encodings.pkl"
-
-# Load encodings
-if not os.path.exists(ENCODING_FILE):
-    raise FileNotFoundError("encodings.pkl not found! Please generate it first.")
-
-with open(ENCODING_FILE, "rb") as f:
-    known_encodings, known_names = pickle.load(f)
-
-print(f"[INFO] Loaded {len(known_encodings)} known encodings from file.")
-
-# Cooldown tracking
-saved_faces = []
-last_unknown_time = 0
-cooldown_seconds = 5
-known_count = 0
-unknown_count = 0
-
-os.makedirs(UNKNOWN_DIR, exist_ok=True)
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Date", "Time", "Saved Image Name"])
-
-video_capture = None
-running = False
-
-# ===================================================
-# GUI Setup
-# ===================================================
-window = tk.Tk()
-window.title("Smart Surveillance System")
-window.geometry("1000x800")
-window.configure(bg="#1e1e1e")
-
-video_label = tk.Label(window, bg="#1e1e1e")
-video_label.pack(pady=10)
-
-status_label = tk.Label(window, text="Status: Idle", font=("Helvetica", 12), fg="white", bg="#1e1e1e")
-status_label.pack(pady=5)
-
-counter_label = tk.Label(window, text="Known: 0  |  Unknown: 0", font=("Helvetica", 12), fg="white", bg="#1e1e1e")
-counter_label.pack(pady=5)
-
-snapshot_preview = tk.Label(window, bg="#1e1e1e")
-snapshot_preview.pack(pady=10)
-
-update_thread = None
-
-# ===================================================
-# Utility Functions
-# ===================================================
-def open_unknown_folder():
-    subprocess.Popen(["open", UNKNOWN_DIR])
-
-def open_log_file():
-    subprocess.Popen(["open", LOG_FILE])
-
-def update_counters():
-    counter_label.config(text=f"Known: {known_count}  |  Unknown: {unknown_count}")
-
-# ===================================================
-# Surveillance Loop
-# ===================================================
-def surveillance_loop():
-    global running, video_capture, last_unknown_time, known_count, unknown_count
-    while running:
-        ret, frame = video_capture.read()
-        if not ret:
-            time.sleep(0.05)
-            continue
-
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            matches = face_recognition.compare_faces(known_encodings, face_encoding)
-            name = "Unknown"
-
-            face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-            best_match_index = np.argmin(face_distances)
-
-            if matches[best_match_index]:
-                name = known_names[best_match_index]
-                known_count += 1
-
-            if name == "Unknown":
-                is_new = True
-                for saved in saved_faces:
-                    similarity = np.dot(face_encoding, saved) / (np.linalg.norm(face_encoding) * np.linalg.norm(saved))
-                    if similarity > 0.97:
-                        is_new = False
-                        break
-
-                current_time = time.time()
-                if is_new and current_time - last_unknown_time > cooldown_seconds:
-                    saved_faces.append(face_encoding)
-                    last_unknown_time = current_time
-                    unknown_count += 1
-
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"unknown_{timestamp}.jpg"
-                    path = os.path.join(UNKNOWN_DIR, filename)
-                    cv2.imwrite(path, frame)
-
-                    with open(LOG_FILE, mode='a', newline='') as file:
-                        writer = csv.writer(file)
-                        writer.writerow([
-                            datetime.now().strftime("%Y-%m-%d"),
-                            datetime.now().strftime("%H:%M:%S"),
-                            filename
-                        ])
-
-                    img_preview = Image.open(path).resize((150, 100))
-                    preview_img = ImageTk.PhotoImage(img_preview)
-                    snapshot_preview.configure(image=preview_img)
-                    snapshot_preview.image = preview_img
-
-            top *= 4
-            right *= 4
-            bottom *= 4
-            left *= 4
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-            cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.75, (0, 255, 0), 2)
-
-        update_counters()
-        img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(img)
-        imgtk = ImageTk.PhotoImage(image=img)
-        video_label.imgtk = imgtk
-        video_label.configure(image=imgtk)
-
-        window.update_idletasks()
-        window.update()
-        time.sleep(0.05)
+import numpy as np
 
-# ===================================================
-# Button Callbacks
-# ===================================================
-def start_surveillance():
-    global video_capture, running, update_thread
-    if not running:
-        video_capture = cv2.VideoCapture(0)
-        running = True
-        status_label.config(text="Status: Monitoring", fg="lightgreen")
-        start_button.config(state="disabled")
-        update_thread = threading.Thread(target=surveillance_loop)
-        update_thread.start()
-
-def stop_surveillance():
-    global video_capture, running, update_thread, known_count, unknown_count, saved_faces
-    if running:
-        running = False
-        update_thread.join(timeout=1)
-        if video_capture:
-            video_capture.release()
-        video_label.config(image='')
-        snapshot_preview.config(image='')
-        status_label.config(text="Status: Idle", fg="white")
-        start_button.config(state="normal")
-        known_count = 0
-        unknown_count = 0
-        saved_faces = []
-        update_counters()
+from pipeline import StageStats
+from multi_camera import MultiCameraEngine
+from event_writer import EventWriter
+from event_store import EventStore, EVENT_DB
+from plate_ocr import load_plate_registry
+from plate_stage import PlateReader, PLATE_MAP_CSV
+from employee_registry import REGISTRY_DB
+from dual_auth import DualAuth
+from gallery_watcher import GalleryWatcher
+from recognition_engine import (
+    EventSink, load_matcher, load_camera_config, draw_faces, UNKNOWN_DIR, UNKNOWN_LOG_FILE, KNOWN_LOG_FILE, CAMERA_CONFIG_FILE,
+    MATCH_INDEX, DETECT_EVERY_N, TRACK_MIN_CONFIDENCE, REVERIFY_SECONDS,
+)
 
 # ===================================================
-# GUI Buttons
+# Configuration
 # ===================================================
-button_frame = tk.Frame(window, bg="#1e1e1e")
-button_frame.pack(pady=15)
-
-button_font = ("Helvetica", 14, "bold")
-
-start_button = tk.Button(
-    button_frame, text="▶ Start Surveillance", command=start_surveillance,
-    bg="green", fg="white", font=button_font, width=20, height=2, relief="raised", bd=3
-)
-start_button.pack(side="left", padx=10)
-
-stop_button = tk.Button(
-    button_frame, text="⛔ Stop Surveillance", command=stop_surveillance,
-    bg="red", fg="white", font=button_font, width=20, height=2, relief="raised", bd=3
-)
-stop_button.pack(side="left", padx=10)
-
-view_unknowns_btn = tk.Button(
-    button_frame, text="📁 Open Snapshots Folder", command=open_unknown_folder,
-    bg="#333", fg="white", font=button_font, width=25, height=2, relief="raised", bd=3
-)
-view_unknowns_btn.pack(side="left", padx=10)
-
-view_log_btn = tk.Button(
-    button_frame, text="📄 Open Log File", command=open_log_file,
-    bg="#555", fg="white", font=button_font, width=20, height=2, relief="raised", bd=3
-)
-view_log_btn.pack(side="left", padx=10)
+KNOWN_FACES_DIR = "known_faces"
+LOG_FILE = UNKNOWN_LOG_FILE
+LOG_EXPORT_FILE = "unknown_faces_export.csv"   # "Open Log File" exports the event store here
+CSV_LOGS = False          # also append the legacy CSV logs (the event store is always written)
+INFERENCE_WORKERS = None  # default: one per camera (capped at CPU count)
+TARGET_FPS = None         # e.g. 15: adapt detection resolution to hold this inference rate
+REFINE_SCALE = None       # e.g. 1.0: re-detect around tracks/motion at full resolution
+PLATES = False            # also read number plates and decide access from face + plate
+                          # (per-camera "plates" / "plate_roi" / "lane" in cameras.json)
+DISPLAY_FPS = 30          # preview refresh rate; inference runs independently of it
+HIDDEN_POLL_MS = 250      # how often a minimised window checks whether it's visible again
+CONTROLS_HEIGHT = 350     # window pixels taken by status, snapshot preview and buttons
+WATCH_GALLERY = True      # hot-swap new gallery versions / plate registry edits (gallery_watcher.py)
+GALLERY_LABEL_POLL_MS = 500   # how often the Tk thread picks up a swapped gallery for its label
+PREVIEW_INTERPOLATION = cv2.INTER_LINEAR   # ~15x cheaper than INTER_AREA from 1080p; fine for a preview
 
 # ===================================================
-# Run Application
+# GUI CLASS
 # ===================================================
-window.mainloop()
-if video_capture:
-    video_capture.release()
-cv2.destroyAllWindows()
-
-
-
-
+class SurveillanceGUI:
+    """
+    Tk front-end over the headless recognition engine. Camera decoding and inference
+    run on engine threads, snapshot/log writing on the EventWriter thread; this class
+    only renders (via window.after).
+    """
+
+    def __init__(self, sources, matcher, sink, store, camera_config=None, plate_registry=None,
+                 gallery=None, plate_map=None):
+        self.sources = sources
+        self.matcher = matcher        # replaced whole by the gallery watcher, never mutated
+        self.sink = sink
+        self.store = store
+        self.camera_config = camera_config
+        self.plate_registry = plate_registry   # enables the plate stage when set
+        self.writer = EventWriter(sink, store, on_saved=self.on_snapshot_saved)
+        self.engine = None
+        self.fusion = None            # DualAuth, with the plate stage
+        self.watcher = None
+        if gallery is not None and WATCH_GALLERY:
+            self.watcher = GalleryWatcher(on_swap=self.on_gallery_swap, version=gallery.version,
+                                          index=MATCH_INDEX, on_plates=self.on_plates_reloaded,
+                                          plate_map=plate_map if plate_registry is not None else None)
+        # (version, identities, loaded_at); written by the watcher thread, shown by the Tk thread
+        self.gallery_info = (gallery.version, len(gallery.names), time.time()) if gallery is not None else None
+        self._gallery_shown = None    # (gallery_info, watcher error) currently on the label
+        self.running = False
+        self.render_stats = StageStats("Render")
+        self.pending_preview = None   # RGB thumbnail of the last saved unknown, handed to the Tk thread
+        self.render_interval_ms = int(1000 / DISPLAY_FPS)
+        self._rendered = None         # (camera, frame_no) pairs currently on screen
+        self._tiles = {}              # camera id -> reusable downscaled BGR buffer
+        self._canvas = None           # reusable BGR / RGB display buffers
+        self._canvas_rgb = None
+        self._photo = None
+
+        self.window = tk.Tk()
+        self.window.title("Smart Surveillance System")
+        self.window.geometry("1000x800")
+        self.window.configure(bg="#1e1e1e")
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.video_label = tk.Label(self.window, bg="#1e1e1e")
+        self.video_label.pack(pady=10)
+
+        self.status_label = tk.Label(self.window, text="Status: Idle", font=("Helvetica", 12), fg="white", bg="#1e1e1e")
+        self.status_label.pack(pady=5)
+
+        self.counter_label = tk.Label(self.window, text="Known: 0  |  Unknown: 0", font=("Helvetica", 12), fg="white", bg="#1e1e1e")
+        self.counter_label.pack(pady=5)
+
+        self.gallery_label = tk.Label(self.window, text="", font=("Helvetica", 10), fg="#aaaaaa", bg="#1e1e1e")
+        self.gallery_label.pack(pady=2)
+        self.poll_gallery_label()
+
+        self.snapshot_preview = tk.Label(self.window, bg="#1e1e1e")
+        self.snapshot_preview.pack(pady=10)
+
+        self.pipeline_label = tk.Label(self.window, text="", font=("Helvetica", 10), fg="#aaaaaa", bg="#1e1e1e", justify="left")
+        self.pipeline_label.pack(pady=2)
+
+        self._build_buttons()
+        if self.watcher is not None:
+            self.watcher.start()
+
+    def _build_buttons(self):
+        button_frame = tk.Frame(self.window, bg="#1e1e1e")
+        button_frame.pack(pady=15)
+
+        button_font = ("Helvetica", 14, "bold")
+
+        self.start_button = tk.Button(
+            button_frame, text="▶ Start Surveillance", command=self.start_surveillance,
+            bg="green", fg="white", font=button_font, width=20, height=2, relief="raised", bd=3
+        )
+        self.start_button.pack(side="left", padx=10)
+
+        self.stop_button = tk.Button(
+            button_frame, text="⛔ Stop Surveillance", command=self.stop_surveillance,
+            bg="red", fg="white", font=button_font, width=20, height=2, relief="raised", bd=3
+        )
+        self.stop_button.pack(side="left", padx=10)
+
+        view_unknowns_btn = tk.Button(
+            button_frame, text="📁 Open Snapshots Folder", command=self.open_unknown_folder,
+            bg="#333", fg="white", font=button_font, width=25, height=2, relief="raised", bd=3
+        )
+        view_unknowns_btn.pack(side="left", padx=10)
+
+        view_log_btn = tk.Button(
+            button_frame, text="📄 Open Log File", command=self.open_log_file,
+            bg="#555", fg="white", font=button_font, width=20, height=2, relief="raised", bd=3
+        )
+        view_log_btn.pack(side="left", padx=10)
+
+    # ---------------- Utility ---------------- #
+    def open_unknown_folder(self):
+        subprocess.Popen(["open", self.sink.unknown_dir])
+
+    def open_log_file(self):
+        if self.sink.unknown_log:
+            subprocess.Popen(["open", self.sink.unknown_log])
+            return
+        count = self.store.export_csv(LOG_EXPORT_FILE, kind="unknown")
+        print(f"[INFO] Exported {count} unknown-face events to {LOG_EXPORT_FILE}")
+        subprocess.Popen(["open", LOG_EXPORT_FILE])
+
+    def update_counters(self):
+        cams = self.engine.cameras if self.engine else []
+        known = sum(cam.processor.known_count for cam in cams)
+        unknown = sum(cam.processor.unknown_count for cam in cams)
+        text = f"Known: {known}  |  Unknown: {unknown}"
+        if self.engine and self.engine.plate_reader is not None:
+            plates = self.engine.plate_reader
+            text += f"  |  Plates: {plates.matched} registered / {plates.events - plates.matched} unregistered"
+        if self.fusion is not None:
+            counts = self.fusion.counts
+            text += (f"  |  Access: {counts['authorized']} granted / {counts['mismatch']} mismatch / "
+                     f"{counts['unknown_vehicle'] + counts['unknown_driver']} unknown")
+        self.counter_label.config(text=text)
+
+    def poll_gallery_label(self):
+        """Tk thread: refresh the gallery indicator when the watcher swapped or failed a reload."""
+        info = self.gallery_info
+        error = self.watcher.last_error if self.watcher is not None else None
+        if info is not None and (info, error) != self._gallery_shown:
+            version, identities, loaded_at = info
+            text = (f"Gallery v{version}  |  {identities} identities  |  "
+                    f"loaded {time.strftime('%H:%M:%S', time.localtime(loaded_at))}")
+            if error:
+                text += f"  |  reload failed: {error}"
+            self.gallery_label.config(text=text, fg="#ffb347" if error else "#aaaaaa")
+            self._gallery_shown = (info, error)
+        if self.watcher is not None:
+            self.window.after(GALLERY_LABEL_POLL_MS, self.poll_gallery_label)
+
+    def update_pipeline_stats(self):
+        lines = [
+            f"{cam.id}: {cam.capture_stats.summary(cam.queue)}   |   "
+            f"Inference {cam.inference_stats.fps:4.1f} fps ({cam.inference_stats.latency_ms:.0f} ms latency)"
+            + (f"   |   Gate skip {100 * cam.processor.motion_gate.skip_rate:.0f}%" if cam.processor.motion_gate else "")
+            for cam in self.engine.cameras
+        ]
+        lines.append(self.render_stats.summary())
+        if self.engine.plate_reader is not None:
+            p = self.engine.plate_reader.stats()
+            lines.append(f"Plate OCR: queue {p['queue']} (skipped {p['skipped']})  calls {p['ocr_calls']}  "
+                         f"tracks {p['tracks']} ({p['calls_per_track']} calls/track)  {p['ocr_ms']:.0f} ms/crop")
+        if self.fusion is not None:
+            f = self.fusion.stats()
+            lines.append(f"Dual auth: pending {f['pending']}  grant latency p50 {f['grant_p50_s']} s  "
+                         f"p95 {f['grant_p95_s']} s")
+        w = self.writer.stats()
+        lines.append(f"Event writer: queue {w['queue']} (max {w['max_queue']})  written {w['written']}  "
+                     f"dropped {w['dropped']}  failed {w['failed']}  snapshot {w['snapshot_ms']:.0f} ms  log latency {w['latency_ms']:.0f} ms")
+        self.pipeline_label.config(text="\n".join(lines))
+
+    # ---------------- Events (engine / writer threads - never touch Tk) ---------------- #
+    def on_event(self, event):
+        self.writer.submit(event)
+        if self.fusion is not None:
+            self.fusion.submit(event)
+
+    def on_snapshot_saved(self, event, filename, thumbnail):
+        self.pending_preview = thumbnail
+
+    # ---------------- Render stage (Tk main loop via after) ---------------- #
+    def compose(self, latest):
+        """
+        Downscale each camera's frame straight to its share of the display area, draw the
+        face overlays at that size and place it on the canvas. All buffers are reused
+        while the window and camera sizes stay the same.
+        """
+        max_w = max(320, self.window.winfo_width() - 20)
+        max_h = max(180, self.window.winfo_height() - CONTROLS_HEIGHT)
+        tile_w = max_w // len(latest)
+
+        tiles = []
+        for cam_id, (frame_no, timestamp, frame, faces) in latest:
+            h, w = frame.shape[:2]
+            s = min(tile_w / w, max_h / h, 1.0)
+            size = (max(1, int(w * s)), max(1, int(h * s)))
+            buf = self._tiles.get(cam_id)
+            if buf is None or buf.shape[1::-1] != size:
+                buf = self._tiles[cam_id] = np.empty((size[1], size[0], 3), np.uint8)
+            cv2.resize(frame, size, dst=buf, interpolation=PREVIEW_INTERPOLATION)
+            draw_faces(buf, faces, s)
+            tiles.append(buf)
+
+        shape = (max(t.shape[0] for t in tiles), sum(t.shape[1] for t in tiles), 3)
+        if self._canvas is None or self._canvas.shape != shape:
+            self._canvas = np.zeros(shape, np.uint8)
+            self._canvas_rgb = np.empty(shape, np.uint8)
+        x = 0
+        for t in tiles:
+            self._canvas[:t.shape[0], x:x + t.shape[1]] = t
+            x += t.shape[1]
+        return cv2.cvtColor(self._canvas, cv2.COLOR_BGR2RGB, dst=self._canvas_rgb)
+
+    def render_frame(self):
+        if not self.running:
+            return
+
+        if self.window.state() == "iconic":
+            # Minimised: skip all conversion work; inference keeps running on engine threads
+            self.window.after(HIDDEN_POLL_MS, self.render_frame)
+            return
+
+        latest = [(cam.id, cam.latest) for cam in self.engine.cameras if cam.latest is not None]
+        shown = tuple((cam_id, item[0]) for cam_id, item in latest)
+        if latest and shown != self._rendered:
+            img = Image.fromarray(self.compose(latest))
+            if self._photo is not None and (self._photo.width(), self._photo.height()) == img.size:
+                self._photo.paste(img)
+            else:
+                self._photo = ImageTk.PhotoImage(image=img)
+                self.video_label.configure(image=self._photo)
+            self._rendered = shown
+            self.render_stats.tick()
+
+        preview, self.pending_preview = self.pending_preview, None
+        if preview is not None:
+            preview_img = ImageTk.PhotoImage(Image.fromarray(preview))
+            self.snapshot_preview.configure(image=preview_img)
+            self.snapshot_preview.image = preview_img
+
+        self.update_counters()
+        self.update_pipeline_stats()
+        self.window.after(self.render_interval_ms, self.render_frame)
+
+    # ---------------- Hot reload (watcher thread - never touch Tk) ---------------- #
+    def on_gallery_swap(self, matcher, gallery):
+        # Publish first, then hand to the engine: a session starting concurrently either
+        # gets the new matcher at construction or through set_matcher
+        self.matcher = matcher
+        self.gallery_info = (gallery.version, len(gallery.names), time.time())
+        engine = self.engine
+        if engine is not None:
+            engine.set_matcher(matcher)
+
+    def on_plates_reloaded(self, registry):
+        self.plate_registry = registry
+        engine = self.engine
+        if engine is not None and engine.plate_reader is not None:
+            engine.plate_reader.set_registry(registry)
+
+    # ---------------- Button callbacks ---------------- #
+    def start_surveillance(self):
+        if self.running:
+            return
+        plate_reader = (PlateReader(self.plate_registry, on_event=self.on_event)
+                        if self.plate_registry is not None else None)
+        self.engine = MultiCameraEngine(self.sources, self.matcher, workers=INFERENCE_WORKERS,
+                                        on_event=self.on_event, camera_config=self.camera_config,
+                                        plate_reader=plate_reader,
+                                        detect_every=DETECT_EVERY_N,
+                                        track_min_confidence=TRACK_MIN_CONFIDENCE,
+                                        reverify_seconds=REVERIFY_SECONDS,
+                                        annotate=False, target_fps=TARGET_FPS, refine_scale=REFINE_SCALE)
+        # Catch a gallery / registry swapped while the engine was being built
+        self.engine.set_matcher(self.matcher)
+        if plate_reader is not None and plate_reader.registry is not self.plate_registry:
+            plate_reader.set_registry(self.plate_registry)
+        if plate_reader is not None:
+            self.fusion = DualAuth(self.engine.lanes, on_decision=self.writer.submit)
+            self.fusion.start()
+        try:
+            self.engine.start()
+        except RuntimeError as e:
+            self.engine.stop()
+            self.engine = None
+            if self.fusion is not None:
+                self.fusion.stop()
+                self.fusion = None
+            messagebox.showerror("Camera Error", str(e))
+            return
+        self.running = True
+        self.status_label.config(text=f"Status: Monitoring ({len(self.engine.cameras)} camera(s))", fg="lightgreen")
+        self.start_button.config(state="disabled")
+        self.render_stats.reset()
+        self.window.after(self.render_interval_ms, self.render_frame)
+
+    def stop_surveillance(self):
+        if not self.running:
+            return
+        self.running = False
+        self.engine.stop()
+        for cam in self.engine.cameras:
+            print(f"[INFO] {cam.id}: {cam.stats()} {cam.processor.stats()}")
+        if self.engine.plate_reader is not None:
+            print(f"[INFO] Plate OCR: {self.engine.plate_reader.stats()}")
+        if self.fusion is not None:
+            self.fusion.stop()
+            print(f"[INFO] Dual auth: {self.fusion.stats()}")
+            self.fusion = None
+        self.pending_preview = None
+        self._rendered = self._photo = None
+        self.video_label.config(image='')
+        self.snapshot_preview.config(image='')
+        self.pipeline_label.config(text="")
+        self.status_label.config(text="Status: Idle", fg="white")
+        self.start_button.config(state="normal")
+        self.engine = None
+        self.update_counters()
+
+    def on_close(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            print(f"[INFO] Gallery watcher: {self.watcher.stats()}")
+        self.stop_surveillance()
+        self.writer.close()
+        self.store.close()
+        print(f"[INFO] Event writer: {self.writer.stats()}")
+        self.window.destroy()
+
+    def run(self):
+        self.window.mainloop()
+
+# ========= Launch App ========= #
+def run_surveillance_gui(sources=None):
+    # Camera sources: device indices, video files or rtsp:// URLs, e.g.
+    #   python enhanced_gui.py 0 rtsp://127.0.0.1:8554/gate3
+    sources = sources or sys.argv[1:] or [0]
+
+    # Memory-mapped gallery store (converts a legacy encodings.pkl once); one matcher
+    # is shared by every camera and swapped whole when a new gallery version is saved.
+    gallery, matcher = load_matcher(index=MATCH_INDEX)
+    print(f"[INFO] Loaded {len(gallery)} known encodings (gallery v{gallery.version}).")
+
+    # Optional per-camera ROI masks / resolution settings (see load_camera_config)
+    camera_config = load_camera_config(CAMERA_CONFIG_FILE)
+
+    # Registered plates for the live plate stage (normalized plate -> (plate, owner)); the
+    # admin panel's registry when there is one, else the CSV
+    plate_map = REGISTRY_DB if os.path.exists(REGISTRY_DB) else PLATE_MAP_CSV
+    plate_registry = load_plate_registry(plate_map) if PLATES else None
+
+    sink = EventSink(UNKNOWN_DIR, LOG_FILE, KNOWN_LOG_FILE) if CSV_LOGS else EventSink(UNKNOWN_DIR, None, None, None, None)
+    app = SurveillanceGUI(sources, matcher, sink, EventStore(EVENT_DB), camera_config, plate_registry,
+                          gallery=gallery, plate_map=plate_map)
+    app.run()
+    cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    run_surveillance_gui()
@@ -0,0 +1,265 @@
+# event_store.py
+# Embedded event store: SQLite in WAL mode, indexed on time, identity, camera and kind.
+# Replaces scanning the append-only CSV logs; CSV is still available as an export.
+#
+#   python event_store.py --name alice --last                      # when did alice last enter
+#   python event_store.py --kind unknown --camera cam2 --days 7     # unknowns at cam2 last week
+#   python event_store.py --since 2026-10-01 --export audit.csv     # CSV for auditors
+#   python event_store.py --prune-days 365 --snapshots Unknown_faces
+#   python event_store.py --import-csv                              # load the old CSV logs once
+
+import os
+import csv
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+# ===================================================
+# Configuration
+# ===================================================
+EVENT_DB = "events.db"
+SCHEMA_VERSION = 1
+UNKNOWN_LOG_FILE = "unknown_faces_log.csv"   # legacy CSV logs (still written with --csv), see --import-csv
+KNOWN_LOG_FILE = "known_faces_log.csv"
+EXPORT_HEADER = ["Date", "Time", "Kind", "Name", "Camera", "Track", "Distance", "Snapshot", "Detail"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id       INTEGER PRIMARY KEY,
+    ts       REAL NOT NULL,          -- unix time of the event
+    kind     TEXT NOT NULL,          -- known | unknown | plate | access | ...
+    name     TEXT,                   -- identity / plate text
+    camera   TEXT,
+    track_id INTEGER,
+    distance REAL,
+    snapshot TEXT,                   -- file name in the snapshot folder
+    detail   TEXT                    -- JSON for anything kind-specific
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_name_ts ON events (name, ts);
+CREATE INDEX IF NOT EXISTS events_camera_ts ON events (camera, ts);
+CREATE INDEX IF NOT EXISTS events_kind_ts ON events (kind, ts);
+"""
+
+class EventStore:
+    """
+    Thread-safe wrapper over one SQLite connection. WAL mode lets the query CLI (or an
+    export from the GUI) read while the engine keeps inserting.
+    """
+
+    def __init__(self, path=EVENT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------------- Writing ---------------- #
+    @staticmethod
+    def _row(event, snapshot=None):
+        detail = getattr(event, "detail", None)
+        return (event.timestamp, event.kind, event.name, event.camera, event.track_id,
+                event.distance, snapshot, json.dumps(detail) if detail else None)
+
+    def insert_many(self, events):
+        """Insert (event, snapshot filename) pairs in one transaction. Returns the count."""
+        rows = [self._row(event, snapshot) for event, snapshot in events]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO events (ts, kind, name, camera, track_id, distance, snapshot, detail) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def insert(self, event, snapshot=None):
+        return self.insert_many([(event, snapshot)])
+
+    # ---------------- Reading ---------------- #
+    @staticmethod
+    def _where(name=None, camera=None, kind=None, since=None, until=None):
+        clauses, params = [], []
+        for column, value in (("name", name), ("camera", camera), ("kind", kind)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, name=None, camera=None, kind=None, since=None, until=None, limit=None, newest_first=True):
+        """Events matching every given filter (times are unix timestamps)."""
+        where, params = self._where(name, camera, kind, since, until)
+        sql = f"SELECT * FROM events{where} ORDER BY ts {'DESC' if newest_first else 'ASC'}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def last_seen(self, name, camera=None):
+        rows = self.query(name=name, camera=camera, limit=1)
+        return rows[0] if rows else None
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM events{where}", params).fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            by_kind = dict(self._conn.execute("SELECT kind, COUNT(*) FROM events GROUP BY kind").fetchall())
+            first, last = self._conn.execute("SELECT MIN(ts), MAX(ts) FROM events").fetchone()
+        return {"events": sum(by_kind.values()), "by_kind": by_kind,
+                "first": datetime.fromtimestamp(first).isoformat(" ", "seconds") if first else None,
+                "last": datetime.fromtimestamp(last).isoformat(" ", "seconds") if last else None}
+
+    # ---------------- Maintenance ---------------- #
+    def prune(self, before, snapshot_dir=None):
+        """
+        Delete events older than `before` (unix time). With `snapshot_dir`, their snapshot
+        images are deleted too. Returns the number of events removed.
+        """
+        with self._lock, self._conn:
+            snapshots = [r[0] for r in self._conn.execute(
+                "SELECT snapshot FROM events WHERE ts < ? AND snapshot IS NOT NULL", (before,))]
+            deleted = self._conn.execute("DELETE FROM events WHERE ts < ?", (before,)).rowcount
+        if snapshot_dir:
+            for filename in snapshots:
+                try:
+                    os.remove(os.path.join(snapshot_dir, filename))
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    def export_csv(self, path, **filters):
+        """Write matching events, oldest first, to a CSV file. Returns the row count."""
+        rows = self.query(newest_first=False, **filters)
+        with open(path, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(EXPORT_HEADER)
+            for r in rows:
+                dt = datetime.fromtimestamp(r["ts"])
+                writer.writerow([dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S"), r["kind"], r["name"],
+                                 r["camera"], r["track_id"], r["distance"], r["snapshot"], r["detail"]])
+        return len(rows)
+
+    def import_csv_logs(self, unknown_log=None, known_log=None):
+        """
+        Migrate the legacy unknown/known CSV logs. Rows already in the store (same time,
+        kind, name and camera) are skipped, so a second run only adds what is new.
+        Returns the rows imported.
+        """
+        events = []
+        for path, kind in ((unknown_log, "unknown"), (known_log, "known")):
+            if not path or not os.path.exists(path):
+                continue
+            with open(path, newline='') as file:
+                for row in csv.DictReader(file):
+                    try:
+                        ts = datetime.strptime(f"{row['Date']} {row['Time']}", "%Y-%m-%d %H:%M:%S").timestamp()
+                    except (KeyError, ValueError):
+                        continue
+                    name = row.get("Name") or ("Unknown" if kind == "unknown" else None)
+                    events.append((_Imported(ts, kind, name, row.get("Camera")), row.get("Saved Image Name")))
+        if not events:
+            return 0
+        with self._lock:
+            existing = Counter(tuple(r) for r in self._conn.execute(
+                "SELECT ts, kind, name, camera FROM events WHERE ts BETWEEN ? AND ? AND kind IN ('known', 'unknown')",
+                (min(e.timestamp for e, _ in events), max(e.timestamp for e, _ in events))))
+        fresh = []
+        for event, snapshot in events:
+            key = (event.timestamp, event.kind, event.name, event.camera)
+            if existing[key]:
+                existing[key] -= 1             # skip it as many times as it is already stored
+            else:
+                fresh.append((event, snapshot))
+        return self.insert_many(fresh)
+
+class _Imported:
+    """Minimal event for rows read back from the legacy CSV logs."""
+
+    def __init__(self, timestamp, kind, name, camera):
+        self.timestamp = timestamp
+        self.kind = kind
+        self.name = name
+        self.camera = camera
+        self.track_id = None
+        self.distance = None
+
+# ===================================================
+# CLI
+# ===================================================
+def parse_time(value):
+    """ISO date / datetime -> unix time."""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+def format_row(r):
+    text = f"{datetime.fromtimestamp(r['ts']):%Y-%m-%d %H:%M:%S}  {r['kind']:<8} {r['name'] or '-':<20} {r['camera'] or '-'}"
+    if r["distance"] is not None:
+        text += f"  d={r['distance']:.3f}"
+    if r["snapshot"]:
+        text += f"  {r['snapshot']}"
+    return text
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Query, export and prune the event store.")
+    ap.add_argument("--db", default=EVENT_DB)
+    ap.add_argument("--name")
+    ap.add_argument("--camera")
+    ap.add_argument("--kind", help="known | unknown | plate ...")
+    ap.add_argument("--since", help="ISO date/time")
+    ap.add_argument("--until", help="ISO date/time")
+    ap.add_argument("--days", type=float, help="shorthand for --since <now - N days>")
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--last", action="store_true", help="only the most recent matching event")
+    ap.add_argument("--export", metavar="CSV", help="write all matching events to a CSV file")
+    ap.add_argument("--prune-days", type=float, help="delete events older than N days")
+    ap.add_argument("--snapshots", help="with --prune-days: also delete their snapshot images here")
+    ap.add_argument("--import-csv", action="store_true", help="import the legacy CSV logs")
+    ap.add_argument("--stats", action="store_true")
+    args = ap.parse_args()
+
+    store = EventStore(args.db)
+    since = parse_time(args.since)
+    if args.days is not None:
+        since = (datetime.now() - timedelta(days=args.days)).timestamp()
+    filters = {"name": args.name, "camera": args.camera, "kind": args.kind,
+               "since": since, "until": parse_time(args.until)}
+
+    if args.import_csv:
+        print(f"[INFO] Imported {store.import_csv_logs(UNKNOWN_LOG_FILE, KNOWN_LOG_FILE)} rows.")
+    if args.prune_days is not None:
+        t0 = time.perf_counter()
+        n = store.prune(time.time() - args.prune_days * 86400, args.snapshots)
+        print(f"[INFO] Pruned {n} events older than {args.prune_days:g} days ({time.perf_counter() - t0:.1f}s).")
+    if args.export:
+        print(f"[INFO] Exported {store.export_csv(args.export, **filters)} events to {args.export}")
+    if args.stats:
+        print(store.stats())
+    if not (args.import_csv or args.prune_days is not None or args.export or args.stats):
+        rows = store.query(limit=1 if args.last else args.limit, **filters)
+        for r in rows:
+            print(format_row(r))
+        if not rows:
+            print("[INFO] No matching events.")
+    store.close()
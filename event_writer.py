@@ -0,0 +1,195 @@
+# event_writer.py
+# Background writer for recognition events, so inference never waits on the disk.
+#
+# Inference threads `submit` events into a bounded queue. One writer thread encodes the
+# unknown-face JPEGs, builds the preview thumbnail from the frame already in memory, and
+# writes events in batches - one transaction into the EventStore and/or one append per CSV
+# log - every FLUSH_INTERVAL seconds (CSV logs fsync'd every FSYNC_INTERVAL seconds).
+# A batch that can't be written (e.g. a CSV log held open in Excel on Windows) is kept and
+# retried on the next flush, up to MAX_RETRY_EVENTS events.
+
+import time
+import queue
+import itertools
+import threading
+from collections import defaultdict
+
+import cv2
+
+from pipeline import StageStats
+
+# ===================================================
+# Configuration
+# ===================================================
+QUEUE_SIZE = 256             # events waiting to be written
+PUT_TIMEOUT = 0.5            # a full queue blocks the submitter this long, then drops the event
+FLUSH_INTERVAL = 1.0         # seconds between batched CSV appends
+BATCH_SIZE = 64              # ...or sooner, once this many rows are waiting
+FSYNC_INTERVAL = 5.0         # seconds between fsyncs of the logs
+MAX_RETRY_EVENTS = 10000     # unwritten events kept for retry before they are given up on
+THUMBNAIL_SIZE = (150, 100)
+
+class EventWriter:
+    """
+    Asynchronous front of an EventSink (same snapshot names, same CSV formats) and,
+    optionally, an EventStore.
+
+    on_saved(event, filename, thumbnail) is called on the writer thread after an unknown
+    face's snapshot is on disk; `thumbnail` is a THUMBNAIL_SIZE RGB array, ready for the
+    GUI without re-reading the JPEG.
+    """
+
+    def __init__(self, sink, store=None, on_saved=None, maxsize=QUEUE_SIZE, put_timeout=PUT_TIMEOUT,
+                 flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE, fsync_interval=FSYNC_INTERVAL,
+                 max_retry=MAX_RETRY_EVENTS):
+        self.sink = sink
+        self.store = store
+        self.on_saved = on_saved
+        self.put_timeout = put_timeout
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.max_retry = max_retry
+        self._queue = queue.Queue(maxsize)
+        self._seq = itertools.count()
+        self._pending = defaultdict(list)     # log path -> [(seq, row)] not yet appended
+        self._pending_events = []             # [(seq, event, snapshot)] not yet in the store
+        self._pending_count = 0               # events with a row still to write
+        self._outstanding = {}                # seq -> [rows still to land, submit time]
+        self._retrying = False
+        self._last_flush = self._last_fsync = time.monotonic()
+        self.write_stats = StageStats("Event writer")   # latency = submit -> row on disk
+        self.snapshot_ms = 0.0
+        self.max_queue = 0
+        self.written = 0              # events whose rows all landed
+        self.dropped = 0              # events never queued (writer couldn't keep up)
+        self.failed = 0               # events given up on after failed writes
+        self.batches = 0
+        self.fsyncs = 0
+        self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, event):
+        """Queue one event. Returns False if it had to be dropped (writer can't keep up)."""
+        try:
+            self._queue.put((time.monotonic(), event), timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+            print(f"[WARN] Event writer queue full, dropped {event!r}")
+            return False
+        self.max_queue = max(self.max_queue, self._queue.qsize())
+        return True
+
+    __call__ = submit
+
+    def close(self, timeout=5.0):
+        """Write everything still queued, then stop the thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # ---------------- Writer thread ---------------- #
+    def _run(self):
+        while True:
+            wait = max(0.0, self.flush_interval - (time.monotonic() - self._last_flush))
+            try:
+                item = self._queue.get(timeout=wait if self._pending_count else None)
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+            if item:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    print(f"[ERROR] Event writer: {e.__class__.__name__}: {e}")
+            # While a batch is being retried, only flush on the interval (not on every event)
+            full = self._pending_count >= self.batch_size and not self._retrying
+            if self._pending_count and (full or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+        self._flush(fsync=True, final=True)
+
+    def _write(self, submitted, event):
+        filename = None
+        if event.kind == "unknown":
+            t0 = time.perf_counter()
+            filename = self.sink.save_snapshot(event)
+            ms = 1000.0 * (time.perf_counter() - t0)
+            self.snapshot_ms = ms if not self.snapshot_ms else 0.9 * self.snapshot_ms + 0.1 * ms
+            if self.on_saved is not None:
+                thumbnail = cv2.cvtColor(cv2.resize(event.frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA),
+                                         cv2.COLOR_BGR2RGB)
+                self.on_saved(event, filename, thumbnail)
+            event.frame = None                # the full frame isn't needed any more
+        seq = next(self._seq)
+        parts = 0
+        path, row = self.sink.row(event, filename)
+        if path:
+            self._pending[path].append((seq, row))
+            parts += 1
+        if self.store is not None:
+            self._pending_events.append((seq, event, filename))
+            parts += 1
+        if parts:
+            self._outstanding[seq] = [parts, submitted]
+        else:
+            self.written += 1
+        self._pending_count = len(self._outstanding)
+
+    def _flush(self, fsync=False, final=False):
+        """Write the pending batch; what fails stays pending for the next flush."""
+        now = time.monotonic()
+        fsync = fsync or now - self._last_fsync >= self.fsync_interval
+        landed, retry, retry_events = [], defaultdict(list), []
+        for path, items in self._pending.items():
+            try:
+                self.sink.append_rows(path, [row for _, row in items], fsync=fsync)
+            except OSError as e:
+                print(f"[ERROR] Could not append {len(items)} row(s) to {path}, will retry: {e}")
+                retry[path] = items
+                continue
+            landed.extend(seq for seq, _ in items)
+        if self._pending_events:
+            try:
+                self.store.insert_many([(event, filename) for _, event, filename in self._pending_events])
+            except Exception as e:
+                print(f"[ERROR] Could not insert {len(self._pending_events)} event(s) into "
+                      f"{self.store.path}, will retry: {e}")
+                retry_events = self._pending_events
+            else:
+                landed.extend(seq for seq, _, _ in self._pending_events)
+
+        done = time.monotonic()
+        for seq in landed:
+            entry = self._outstanding[seq]
+            entry[0] -= 1
+            if not entry[0]:
+                del self._outstanding[seq]
+                self.written += 1
+                self.write_stats.tick(done - entry[1])
+        if landed:
+            self.batches += 1
+        if fsync:
+            self.fsyncs += 1
+            self._last_fsync = now
+        self._pending, self._pending_events = retry, retry_events
+        self._retrying = bool(retry or retry_events)
+        if final or len(self._outstanding) > self.max_retry:
+            self._give_up()
+        self._pending_count = len(self._outstanding)
+        self._last_flush = now
+
+    def _give_up(self):
+        if self._outstanding:
+            print(f"[ERROR] Event writer: gave up on {len(self._outstanding)} unwritten event(s)")
+        self.failed += len(self._outstanding)
+        self._outstanding.clear()
+        self._pending = defaultdict(list)
+        self._pending_events = []
+        self._retrying = False
+
+    def stats(self):
+        return {"queue": self._queue.qsize(), "max_queue": self.max_queue, "written": self.written,
+                "dropped": self.dropped, "failed": self.failed, "retrying": self._pending_count if self._retrying else 0,
+                "batches": self.batches, "fsyncs": self.fsyncs,
+                "snapshot_ms": round(self.snapshot_ms, 1),
+                "latency_ms": round(self.write_stats.latency_ms, 1)}
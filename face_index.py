@@ -0,0 +1,298 @@
+# face_index.py
+# Pluggable nearest-neighbour indexes for the face gallery + recall/latency report.
+#
+#   brute    - exact GEMM over every row (default; fine up to ~10^5 rows)
+#   ivf      - pure-NumPy inverted file: k-means partitions, only `nprobe` lists scanned
+#   balltree - sklearn BallTree (optional dependency), exact, `leaf_size` trades build/query
+#
+# Every index returns Euclidean distances, so FaceMatcher applies the same threshold to
+# them as test_face_accuracy.py applies to face_recognition.face_distance.
+
+import time
+import argparse
+
+import numpy as np
+
+# ===================================================
+# Configuration
+# ===================================================
+ENCODING_DIM = 128
+
+# Same operating point as THRESHOLD in test_face_accuracy.py
+DEFAULT_THRESHOLD = 0.55
+
+def euclidean_distances(q, g, g_sq=None):
+    """(F, N) Euclidean distances via ||q||^2 + ||g||^2 - 2 q.g (one GEMM)."""
+    if g_sq is None:
+        g_sq = np.einsum("ij,ij->i", g, g)
+    d2 = g @ q.T
+    d2 *= -2.0
+    d2 += g_sq[:, None]
+    d2 += np.einsum("ij,ij->i", q, q)[None, :]
+    np.maximum(d2, 0.0, out=d2)
+    return np.sqrt(d2, out=d2).T
+
+def top_k(d, k):
+    """(distances, column indices) of the k smallest entries per row, sorted ascending."""
+    n = d.shape[1]
+    if k < n:
+        idx = np.argpartition(d, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(n), d.shape)
+    dist = np.take_along_axis(d, idx, axis=1)
+    order = np.argsort(dist, axis=1)
+    return np.take_along_axis(dist, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+def _pad(dist, rows, k):
+    """Pad results with (inf, -1) when fewer than k rows exist."""
+    if dist.shape[1] >= k:
+        return dist, rows
+    f, m = dist.shape
+    pd = np.full((f, k), np.inf, dtype=np.float32)
+    pr = np.full((f, k), -1, dtype=np.int64)
+    pd[:, :m], pr[:, :m] = dist, rows
+    return pd, pr
+
+# ===================================================
+# Indexes
+# ===================================================
+class BruteForceIndex:
+    kind = "brute"
+
+    def __init__(self):
+        self._x = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+        self._sq = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self._x)
+
+    def params(self):
+        return {}
+
+    def build(self, encodings):
+        self._x = np.asarray(encodings, dtype=np.float32)
+        self._sq = np.einsum("ij,ij->i", self._x, self._x)
+        return self
+
+    def search(self, queries, k=1):
+        """Return (distances (F, k), rows (F, k)); missing neighbours are (inf, -1)."""
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if not len(self._x) or not len(q):
+            return _pad(np.zeros((len(q), 0), np.float32), np.zeros((len(q), 0), np.int64), k)
+        dist, rows = top_k(euclidean_distances(q, self._x, self._sq), k)
+        return _pad(dist, rows, k)
+
+class IVFIndex:
+    """
+    Inverted-file index. Rows are clustered with k-means into `nlist` partitions and stored
+    contiguously per partition; a query scans only the `nprobe` nearest partitions.
+
+    Knobs: nlist (default sqrt(N)), nprobe (recall up / speed down), n_iter and
+    train_size (k-means training rows per list).
+    """
+    kind = "ivf"
+
+    def __init__(self, nlist=None, nprobe=8, n_iter=10, train_size=256, seed=42):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.train_size = train_size
+        self.seed = seed
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def params(self):
+        return {"nlist": self._nlist if self._n else self.nlist, "nprobe": self.nprobe}
+
+    def _kmeans(self, x, nlist, rng):
+        sample = x
+        if len(x) > nlist * self.train_size:
+            sample = x[rng.choice(len(x), nlist * self.train_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assign = np.argmin(euclidean_distances(sample, centroids), axis=1)
+            counts = np.bincount(assign, minlength=nlist).astype(np.float32)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = counts == 0
+            centroids[~empty] = sums[~empty] / counts[~empty, None]
+            if empty.any():
+                # Re-seed dead lists on random training rows
+                centroids[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        return centroids
+
+    def build(self, encodings):
+        x = np.asarray(encodings, dtype=np.float32)
+        self._n = n = len(x)
+        if not n:
+            return self
+        nlist = self.nlist or int(np.sqrt(n))
+        self._nlist = nlist = max(1, min(nlist, n))
+        rng = np.random.default_rng(self.seed)
+        self._centroids = self._kmeans(x, nlist, rng)
+        self._centroid_sq = np.einsum("ij,ij->i", self._centroids, self._centroids)
+
+        # Assign in blocks to bound the temporary (block, nlist) matrix
+        assign = np.empty(n, dtype=np.int64)
+        for s in range(0, n, 65536):
+            assign[s:s + 65536] = np.argmin(
+                euclidean_distances(x[s:s + 65536], self._centroids, self._centroid_sq), axis=1)
+        order = np.argsort(assign, kind="stable")
+        self._rows = order
+        self._x = np.ascontiguousarray(x[order])
+        self._sq = np.einsum("ij,ij->i", self._x, self._x)
+        self._offsets = np.r_[0, np.cumsum(np.bincount(assign, minlength=nlist))]
+        return self
+
+    def search(self, queries, k=1):
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        out_d = np.full((len(q), k), np.inf, dtype=np.float32)
+        out_r = np.full((len(q), k), -1, dtype=np.int64)
+        if not self._n or not len(q):
+            return out_d, out_r
+        nprobe = min(self.nprobe, self._nlist)
+        cd = euclidean_distances(q, self._centroids, self._centroid_sq)
+        probes = top_k(cd, nprobe)[1]
+        offsets = self._offsets
+        for i, lists in enumerate(probes):
+            cand = np.concatenate([np.arange(offsets[c], offsets[c + 1]) for c in lists])
+            if not len(cand):
+                continue
+            d = euclidean_distances(q[i:i + 1], self._x[cand], self._sq[cand])
+            dist, idx = top_k(d, min(k, len(cand)))
+            out_d[i, :dist.shape[1]] = dist[0]
+            out_r[i, :dist.shape[1]] = self._rows[cand[idx[0]]]
+        return out_d, out_r
+
+class BallTreeIndex:
+    """Exact ball tree (requires scikit-learn). Knob: leaf_size."""
+    kind = "balltree"
+
+    def __init__(self, leaf_size=40):
+        try:
+            from sklearn.neighbors import BallTree
+        except ImportError as e:
+            raise ImportError("balltree index requires scikit-learn (pip install scikit-learn)") from e
+        self._BallTree = BallTree
+        self.leaf_size = leaf_size
+        self._tree = None
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def params(self):
+        return {"leaf_size": self.leaf_size}
+
+    def build(self, encodings):
+        x = np.asarray(encodings, dtype=np.float32)
+        self._n = len(x)
+        self._tree = self._BallTree(x, leaf_size=self.leaf_size) if self._n else None
+        return self
+
+    def search(self, queries, k=1):
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if self._tree is None or not len(q):
+            return _pad(np.zeros((len(q), 0), np.float32), np.zeros((len(q), 0), np.int64), k)
+        dist, rows = self._tree.query(q, k=min(k, self._n))
+        return _pad(dist.astype(np.float32), rows.astype(np.int64), k)
+
+INDEX_TYPES = {
+    "brute": BruteForceIndex,
+    "ivf": IVFIndex,
+    "balltree": BallTreeIndex,
+}
+
+def make_index(kind="brute", **params):
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index kind {kind!r}; choose from {sorted(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](**params)
+
+# ===================================================
+# Recall vs latency report
+# ===================================================
+def benchmark(gallery, queries, configs, k=1, threshold=DEFAULT_THRESHOLD, repeats=3):
+    """
+    Compare each (kind, params) config against brute force on the same queries.
+
+    recall@k  : fraction of the exact top-k rows returned by the index
+    agreement : fraction of queries with the same known/unknown + identity decision at
+                `threshold`, i.e. what test_face_accuracy.py would score differently
+    """
+    from face_matcher import FaceMatcher
+
+    exact = FaceMatcher(gallery, tolerance=threshold, aggregate="none")
+    exact_d, exact_rows = BruteForceIndex().build(exact._enc[:len(exact)]).search(queries, k)
+    exact_ids = exact.identify(queries)
+
+    rows = []
+    for kind, params in configs:
+        t0 = time.perf_counter()
+        try:
+            matcher = FaceMatcher(gallery, tolerance=threshold, aggregate="none",
+                                  index=make_index(kind, **params))
+        except ImportError as e:
+            print(f"[WARN] {kind}: {e}")
+            continue
+        build_s = time.perf_counter() - t0
+
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            _, found = matcher.index.search(queries, k)
+            best = min(best, time.perf_counter() - t0)
+
+        hits = sum(len(set(a) & set(b)) for a, b in zip(exact_rows.tolist(), found.tolist()))
+        recall = hits / max(1, int((exact_rows >= 0).sum()))
+        agree = np.mean([a[0] == b[0] for a, b in zip(exact_ids, matcher.identify(queries))])
+        rows.append((kind, matcher.index.params(), build_s, 1000.0 * best / len(queries), recall, agree))
+
+    print(f"\n=== Index report: {len(exact)} rows, {len(queries)} queries, k={k}, threshold={threshold} ===")
+    print(f"{'index':<10} {'params':<28} {'build s':>8} {'ms/query':>9} {'recall@k':>9} {'agree':>7}")
+    for kind, params, build_s, ms, recall, agree in rows:
+        p = ", ".join(f"{a}={b}" for a, b in params.items())
+        print(f"{kind:<10} {p:<28} {build_s:>8.3f} {ms:>9.4f} {recall:>9.4f} {agree:>7.4f}")
+    return rows
+
+def synthetic_gallery(n_people, per_person, rng):
+    """Clustered random encodings (~0.3 intra-person spread, like real dlib encodings)."""
+    from gallery_store import Gallery
+    centers = rng.normal(scale=0.09, size=(n_people, ENCODING_DIM)).astype(np.float32)
+    enc = np.repeat(centers, per_person, axis=0)
+    enc += rng.normal(scale=0.02, size=enc.shape).astype(np.float32)
+    names = [f"person_{i}" for i in range(n_people) for _ in range(per_person)]
+    return Gallery.from_lists(enc, names)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Recall vs latency of gallery indexes against brute force.")
+    ap.add_argument("--gallery", default="gallery", help="gallery store directory")
+    ap.add_argument("--synthetic", type=int, metavar="PEOPLE", help="use a synthetic gallery instead")
+    ap.add_argument("--per-person", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=1)
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        gallery = synthetic_gallery(args.synthetic, args.per_person, rng)
+    else:
+        from gallery_store import load_gallery
+        gallery = load_gallery(args.gallery)
+
+    # Half the queries are perturbed gallery rows (should match), half are perturbed
+    # mixtures of two rows (mostly unknowns).
+    enc = np.asarray(gallery.encodings, dtype=np.float32)
+    n_q = args.queries
+    base = enc[rng.integers(0, len(enc), n_q)]
+    other = enc[rng.integers(0, len(enc), n_q)]
+    base[n_q // 2:] = 0.5 * (base[n_q // 2:] + other[n_q // 2:])
+    queries = base + rng.normal(scale=0.015, size=base.shape).astype(np.float32)
+
+    configs = [("brute", {})]
+    configs += [("ivf", {"nprobe": p}) for p in args.nprobe]
+    configs += [("balltree", {"leaf_size": s}) for s in (20, 40)]
+    benchmark(gallery, queries, configs, k=args.k, threshold=args.threshold)
@@ -0,0 +1,193 @@
+# face_matcher.py
+# Batched face matcher: one matrix operation per frame instead of two gallery scans per face.
+
+import numpy as np
+
+from face_index import euclidean_distances, make_index, top_k
+
+# ===================================================
+# Configuration
+# ===================================================
+ENCODING_DIM = 128
+
+# Same default as face_recognition.compare_faces(tolerance=0.6)
+TOLERANCE = 0.6
+
+# How row distances are combined per identity:
+#   "none"     - rank individual gallery rows (an identity may appear several times in top-k)
+#   "min"      - best row per identity (same decision as argmin over face_distance)
+#   "mean"     - mean distance over all rows of the identity
+#   "centroid" - distance to the identity's mean encoding (one row per identity)
+AGGREGATES = ("none", "min", "mean", "centroid")
+
+# With an approximate index and aggregate="min", fetch k * ROW_OVERFETCH rows so that
+# several photos of the same person don't crowd other identities out of the top-k.
+ROW_OVERFETCH = 4
+
+UNKNOWN = "Unknown"
+
+class FaceMatcher:
+    """
+    Keeps the gallery as a float32 matrix (rows grouped by identity) with cached squared
+    norms, and matches all faces of a frame in a single GEMM:
+
+        ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g
+
+    For very large galleries pass `index` (a face_index object or kind name such as
+    "ivf") and candidates come from that index instead of the full GEMM.
+
+    A matcher serving live frames is never modified: a new gallery version gets a new
+    FaceMatcher (see gallery_watcher.py).
+    """
+
+    def __init__(self, gallery=None, tolerance=TOLERANCE, aggregate="min", index=None):
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"aggregate must be one of {AGGREGATES}, got {aggregate!r}")
+        if isinstance(index, str):
+            index = None if index == "brute" else make_index(index)
+        if index is not None and aggregate == "mean":
+            raise ValueError("aggregate='mean' needs every row; use it without an index")
+        self.tolerance = tolerance
+        self.aggregate = aggregate
+        self.index = index
+        self.names = []                   # unique identity names, in group order
+        self._names_all = []              # identity index -> name, as given to set_gallery
+        self._n = 0
+        self._enc = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+        self._sq = np.zeros(0, dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int32)
+        if gallery is not None:
+            self.set_gallery(gallery.encodings, gallery.identities, gallery.names)
+
+    def __len__(self):
+        return self._n
+
+    # ------------------------------------------------
+    # Gallery management
+    # ------------------------------------------------
+    def set_gallery(self, encodings, identities, names):
+        """
+        Load rows from a gallery (see gallery_store.Gallery). Rows already grouped by
+        identity (as generate_encodings writes them) are used in place, so a memory-mapped
+        gallery stays shared between processes; otherwise they are copied once, sorted so
+        that each identity's rows are contiguous.
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        identities = np.asarray(identities, dtype=np.int32)
+        if np.any(identities[1:] < identities[:-1]):
+            order = np.argsort(identities, kind="stable")
+            encodings, identities = encodings[order], identities[order]
+        self._enc, self._ids = encodings, identities
+        self._sq = np.einsum("ij,ij->i", encodings, encodings)
+        self._n = len(identities)
+        self._names_all = list(names)
+        self._rebuild_groups()
+
+    def _rebuild_groups(self):
+        ids = self._ids[:self._n]
+        if self._n:
+            self._starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        else:
+            self._starts = np.zeros(0, dtype=np.int64)
+        self._counts = np.diff(np.r_[self._starts, self._n]).astype(np.float32)
+        self._group_ids = ids[self._starts]
+        self.names = [self._names_all[i] for i in self._group_ids.tolist()]
+        if self.aggregate == "centroid" and self._n:
+            centroids = np.add.reduceat(self._enc[:self._n], self._starts, axis=0)
+            centroids /= self._counts[:, None]
+            self._centroids = centroids
+            self._centroid_sq = np.einsum("ij,ij->i", centroids, centroids)
+        if self.index is not None:
+            self.index.build(self._centroids if self.aggregate == "centroid" and self._n
+                             else self._enc[:self._n])
+
+    # ------------------------------------------------
+    # Distances
+    # ------------------------------------------------
+    @staticmethod
+    def _as_queries(face_encodings):
+        return np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+    def row_distances(self, face_encodings):
+        """(F, N) Euclidean distances from every query face to every gallery row."""
+        q = self._as_queries(face_encodings)
+        return euclidean_distances(q, self._enc[:self._n], self._sq[:self._n])
+
+    def identity_distances(self, face_encodings):
+        """(F, I) distances aggregated per identity (I = len(self.names))."""
+        if self.aggregate == "centroid":
+            return euclidean_distances(self._as_queries(face_encodings), self._centroids, self._centroid_sq)
+        d = self.row_distances(face_encodings)
+        if self.aggregate == "mean":
+            return np.add.reduceat(d, self._starts, axis=1) / self._counts
+        return np.minimum.reduceat(d, self._starts, axis=1)
+
+    # ------------------------------------------------
+    # Matching
+    # ------------------------------------------------
+    def match(self, face_encodings, k=1):
+        """
+        Top-k candidates for every face: a list (one per face) of [(name, distance), ...]
+        sorted by distance. Returns empty candidate lists when the gallery is empty.
+        """
+        q = self._as_queries(face_encodings)
+        if not len(q) or not self._n:
+            return [[] for _ in range(len(q))]
+        if self.index is not None:
+            return self._match_indexed(q, k)
+        if self.aggregate == "none":
+            d = self.row_distances(q)
+            labels = self._ids[:self._n]
+            names = self._names_all
+        else:
+            d = self.identity_distances(q)
+            labels = None
+            names = self.names
+        top_d, top = top_k(d, min(k, d.shape[1]))
+
+        results = []
+        for cols, dists in zip(top.tolist(), top_d.tolist()):
+            if labels is not None:
+                results.append([(names[labels[c]], d_) for c, d_ in zip(cols, dists)])
+            else:
+                results.append([(names[c], d_) for c, d_ in zip(cols, dists)])
+        return results
+
+    def _match_indexed(self, q, k):
+        if self.aggregate == "centroid":
+            dist, cols = self.index.search(q, k)
+            return [[(self.names[c], d) for c, d in zip(cs, ds) if c >= 0]
+                    for cs, ds in zip(cols.tolist(), dist.tolist())]
+
+        fetch = k if self.aggregate == "none" else k * ROW_OVERFETCH
+        dist, rows = self.index.search(q, fetch)
+        ids, names = self._ids, self._names_all
+        results = []
+        for rs, ds in zip(rows.tolist(), dist.tolist()):
+            candidates, seen = [], set()
+            for r, d in zip(rs, ds):
+                if r < 0:
+                    break
+                label = ids[r]
+                if self.aggregate == "min":
+                    if label in seen:
+                        continue
+                    seen.add(label)
+                candidates.append((names[label], d))
+                if len(candidates) == k:
+                    break
+            results.append(candidates)
+        return results
+
+    def identify(self, face_encodings):
+        """
+        Best identity per face as [(name, distance), ...]; name is UNKNOWN when the best
+        distance is above the tolerance (same rule as face_recognition.compare_faces).
+        """
+        results = []
+        for candidates in self.match(face_encodings, k=1):
+            if candidates and candidates[0][1] <= self.tolerance:
+                results.append(candidates[0])
+            else:
+                results.append((UNKNOWN, candidates[0][1] if candidates else float("inf")))
+        return results
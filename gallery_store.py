@@ -0,0 +1,269 @@
+# gallery_store.py
+# Memory-mapped, versioned on-disk format for the known-face gallery.
+#
+# Layout of gallery/:
+#   gallery.json                 header: format, version, count, dim, names, checksum,
+#                                and the data files of the current generation
+#   encodings-<version>.npy      float32 (count, dim) matrix, C-contiguous
+#   identities-<version>.npy     int32 (count,) index into header["names"]
+#
+# Each save writes a new generation of data files and then atomically replaces the
+# header, so readers either see the old gallery or the new one, never a mix. Loading
+# maps the .npy files read-only (np.load(mmap_mode="r")): no unpickling, no copy, and
+# every process on the box shares the same page-cache pages.
+
+import os
+import sys
+import json
+import pickle
+import hashlib
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+# ===================================================
+# Configuration
+# ===================================================
+GALLERY_DIR = "gallery"
+HEADER_FILE = "gallery.json"
+LEGACY_PICKLE = "encodings.pkl"
+MANIFEST_FILE = "manifest.json"     # generate_encodings.py's build manifest, next to the header
+
+# Photo variants `generate_encodings.py --augment` makes in memory; augment_known_faces.py
+# wrote them as files named <photo>_<variant>.jpg
+AUGMENTATIONS = ("rot10", "rot-10", "flip", "bright")
+
+FORMAT_VERSION = 1
+ENCODING_DIM = 128
+DTYPE = np.float32
+
+# Older generations kept on disk so a reader that mapped them just before a save
+# can finish its frame (also keeps Windows happy, where mapped files can't be unlinked).
+KEEP_GENERATIONS = 2
+
+class GalleryError(Exception):
+    """Raised when a gallery is missing, malformed or fails its checksum."""
+
+# ===================================================
+# Gallery
+# ===================================================
+class Gallery:
+    """
+    Read-only view of one gallery generation.
+
+    encodings  : (N, 128) float32 array (memory-mapped when loaded from disk)
+    identities : (N,) int32 array, row -> index into `names`
+    names      : list of unique (interned) identity names
+    """
+
+    def __init__(self, encodings, identities, names, version=0, created=None, path=None):
+        self.encodings = encodings
+        self.identities = identities
+        self.names = names
+        self.version = version
+        self.created = created
+        self.path = path
+
+    def __len__(self):
+        return len(self.identities)
+
+    def name_of(self, row):
+        return self.names[self.identities[row]]
+
+    @property
+    def row_names(self):
+        """Per-row name list, for code that still expects the old (encodings, names) pair."""
+        names = self.names
+        return [names[i] for i in self.identities.tolist()]
+
+    @classmethod
+    def from_lists(cls, encodings, names):
+        """Build an in-memory gallery from the legacy (encodings, names) lists."""
+        enc, ids, uniq = _pack(encodings, names)
+        return cls(enc, ids, uniq)
+
+def _pack(encodings, names):
+    if len(encodings) != len(names):
+        raise GalleryError(f"{len(encodings)} encodings but {len(names)} names")
+    enc = np.ascontiguousarray(np.asarray(encodings, dtype=DTYPE).reshape(-1, ENCODING_DIM))
+    index, uniq = {}, []
+    ids = np.empty(len(names), dtype=np.int32)
+    for i, name in enumerate(names):
+        name = sys.intern(str(name).strip())
+        if name not in index:
+            index[name] = len(uniq)
+            uniq.append(name)
+        ids[i] = index[name]
+    return enc, ids, uniq
+
+# ===================================================
+# Read / write
+# ===================================================
+def _hash_files(h, paths, block_size=1 << 20):
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                h.update(block)
+    return h.hexdigest()
+
+def _checksum(*paths):
+    return _hash_files(hashlib.sha256(), paths)
+
+def file_sha1(path, block_size=1 << 20):
+    """Content hash of one file (cache key for encodings / OCR results of an image)."""
+    return _hash_files(hashlib.sha1(), [path], block_size)
+
+def is_augmented_file(fname):
+    """A variant file written by augment_known_faces.py (photo_rot10.jpg, photo_flip.jpg, ...)."""
+    return os.path.splitext(fname)[0].endswith(tuple("_" + a for a in AUGMENTATIONS))
+
+def gallery_augment(gallery_dir=GALLERY_DIR):
+    """Augmentation mode the gallery was built with ("off" for galleries without a manifest)."""
+    try:
+        with open(os.path.join(gallery_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    return (manifest or {}).get("augment", "off")
+
+def read_header(gallery_dir=GALLERY_DIR):
+    path = os.path.join(gallery_dir, HEADER_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Gallery header not found: {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("format") != FORMAT_VERSION:
+        raise GalleryError(f"Unsupported gallery format {header.get('format')} in {path}")
+    return header
+
+def load_gallery(gallery_dir=GALLERY_DIR, verify=False):
+    """
+    Map the current gallery generation. verify=True re-hashes the data files against the
+    header checksum (touches every page, so use it for hot reloads, not every start-up).
+    """
+    header = read_header(gallery_dir)
+    enc_path = os.path.join(gallery_dir, header["encodings_file"])
+    ids_path = os.path.join(gallery_dir, header["identities_file"])
+    if verify and _checksum(enc_path, ids_path) != header["sha256"]:
+        raise GalleryError(f"Checksum mismatch for gallery version {header['version']}")
+
+    count, dim = header["count"], header["dim"]
+    if count:
+        encodings = np.load(enc_path, mmap_mode="r")
+        identities = np.load(ids_path, mmap_mode="r")
+    else:
+        # Zero-length arrays can't be memory-mapped
+        encodings = np.load(enc_path)
+        identities = np.load(ids_path)
+    if encodings.shape != (count, dim) or encodings.dtype != DTYPE or identities.shape != (count,):
+        raise GalleryError(f"Gallery data does not match header (version {header['version']})")
+    return Gallery(encodings, identities, header["names"], header["version"],
+                   header.get("created"), gallery_dir)
+
+def _atomic_save_npy(path, array):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def save_gallery(encodings, names, gallery_dir=GALLERY_DIR):
+    """
+    Write a new gallery generation from parallel encodings/names sequences and return
+    its version number. The header replace is the commit point.
+    """
+    os.makedirs(gallery_dir, exist_ok=True)
+    enc, ids, uniq = _pack(encodings, names)
+    try:
+        version = read_header(gallery_dir)["version"] + 1
+    except (FileNotFoundError, GalleryError, KeyError, ValueError):
+        version = 1
+
+    enc_file = f"encodings-{version:06d}.npy"
+    ids_file = f"identities-{version:06d}.npy"
+    enc_path = os.path.join(gallery_dir, enc_file)
+    ids_path = os.path.join(gallery_dir, ids_file)
+    _atomic_save_npy(enc_path, enc)
+    _atomic_save_npy(ids_path, ids)
+
+    header = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "count": int(len(ids)),
+        "dim": ENCODING_DIM,
+        "dtype": np.dtype(DTYPE).name,
+        "encodings_file": enc_file,
+        "identities_file": ids_file,
+        "sha256": _checksum(enc_path, ids_path),
+        "names": uniq,
+    }
+    header_path = os.path.join(gallery_dir, HEADER_FILE)
+    tmp = f"{header_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, header_path)
+
+    _prune_generations(gallery_dir, version)
+    return version
+
+def _prune_generations(gallery_dir, version):
+    for fn in os.listdir(gallery_dir):
+        stem, ext = os.path.splitext(fn)
+        if ext != ".npy" or "-" not in stem:
+            continue
+        try:
+            gen = int(stem.rsplit("-", 1)[1])
+        except ValueError:
+            continue
+        if gen <= version - KEEP_GENERATIONS:
+            try:
+                os.remove(os.path.join(gallery_dir, fn))
+            except OSError:
+                pass  # still mapped by another process (Windows); next save retries
+
+# ===================================================
+# Legacy encodings.pkl
+# ===================================================
+def convert_pickle(pickle_path=LEGACY_PICKLE, gallery_dir=GALLERY_DIR):
+    with open(pickle_path, "rb") as f:
+        encodings, names = pickle.load(f)
+    version = save_gallery(encodings, names, gallery_dir)
+    print(f"[INFO] Converted {len(names)} encodings from {pickle_path} -> {gallery_dir}/ (v{version})")
+    return version
+
+def open_gallery(gallery_dir=GALLERY_DIR, legacy_pickle=LEGACY_PICKLE):
+    """
+    Load the gallery store, converting a legacy encodings.pkl on first use.
+    Raises FileNotFoundError when neither exists.
+    """
+    if not os.path.exists(os.path.join(gallery_dir, HEADER_FILE)):
+        if not (legacy_pickle and os.path.exists(legacy_pickle)):
+            raise FileNotFoundError(
+                f"No face gallery in {gallery_dir}/ - run generate_encodings.py first.")
+        convert_pickle(legacy_pickle, gallery_dir)
+    return load_gallery(gallery_dir)
+
+# ===================================================
+# CLI
+# ===================================================
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect or convert the face gallery store.")
+    ap.add_argument("--gallery", default=GALLERY_DIR)
+    ap.add_argument("--from-pickle", metavar="PKL", help="convert a legacy encodings.pkl")
+    ap.add_argument("--verify", action="store_true", help="check the data checksum")
+    args = ap.parse_args()
+
+    if args.from_pickle:
+        convert_pickle(args.from_pickle, args.gallery)
+    try:
+        g = load_gallery(args.gallery, verify=args.verify)
+    except (FileNotFoundError, GalleryError) as e:
+        sys.exit(f"[ERROR] {e}")
+    print(f"Gallery v{g.version} ({g.created}): {len(g)} encodings, {len(g.names)} identities")
+    if args.verify:
+        print("Checksum OK")
@@ -0,0 +1,171 @@
+# gallery_watcher.py
+# Hot-swaps the face gallery (and plate registry) under a running surveillance session.
+#
+# A background thread polls the gallery header (gallery/gallery.json) - a stat() per poll,
+# the header is only parsed when its mtime changes. A new version is mapped and its
+# checksum verified on this thread, then wrapped in a brand-new FaceMatcher (with its
+# index) before anyone sees it. The matcher the cameras are using is never mutated: the
+# new one is handed over whole and each camera switches between two frames (see
+# CameraProcessor.set_matcher), so inference never waits on a load and no frame is
+# dropped. A gallery that fails to load or verify is reported and the old one kept.
+#
+# The plate registry (registry.db or the plate CSV) is watched the same way and swapped
+# into the PlateReader.
+#
+# Usage:
+#   watcher = GalleryWatcher(on_swap=engine.set_matcher, version=gallery.version,
+#                            plate_map="registry.db", on_plates=plate_reader.set_registry)
+#   watcher.start()
+#   ...
+#   watcher.stop()
+
+import os
+import time
+import threading
+
+from gallery_store import read_header, load_gallery, GalleryError, GALLERY_DIR, HEADER_FILE
+from face_matcher import FaceMatcher, TOLERANCE
+
+# ===================================================
+# Configuration
+# ===================================================
+POLL_SECONDS = 2.0           # how often the gallery header / registry mtimes are checked
+
+def _mtime(path):
+    """Latest mtime of a file and its SQLite WAL (writes land there until a checkpoint)."""
+    stamps = []
+    for p in (path, path + "-wal"):
+        try:
+            stamps.append(os.stat(p).st_mtime_ns)
+        except OSError:
+            pass
+    return max(stamps) if stamps else None
+
+# ===================================================
+# Watcher
+# ===================================================
+class GalleryWatcher:
+    """
+    Polls the gallery store for a new version and calls on_swap(matcher, gallery) with a
+    freshly built, verified FaceMatcher. `version` is the version already being served (so
+    it isn't loaded twice); `loaded_at` is when it was (epoch seconds). tolerance / index
+    (a kind name, see face_index.py) are those of the matcher being replaced.
+
+    With plate_map and on_plates, the plate registry is reloaded whenever the file changes
+    and handed to on_plates(registry).
+    """
+
+    def __init__(self, gallery_dir=GALLERY_DIR, on_swap=None, version=None, tolerance=TOLERANCE,
+                 index="brute", plate_map=None, on_plates=None, interval=POLL_SECONDS):
+        self.gallery_dir = gallery_dir
+        self.header_path = os.path.join(gallery_dir, HEADER_FILE)
+        self.on_swap = on_swap
+        self.tolerance = tolerance
+        self.index = index
+        self.plate_map = str(plate_map) if plate_map else None
+        self.on_plates = on_plates
+        self.interval = interval
+        self.version = version
+        self.loaded_at = time.time()
+        self.plates_loaded_at = self.loaded_at if self.plate_map else None
+        self.swaps = 0
+        self.plate_swaps = 0
+        self.failures = 0
+        self.load_ms = 0.0
+        self.last_error = None
+        self._header_mtime = _mtime(self.header_path)
+        self._plates_mtime = _mtime(self.plate_map) if self.plate_map else None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="gallery-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    # ---------------- Polling (watcher thread) ---------------- #
+    def poll(self):
+        """Check both stores once; returns True if anything was swapped."""
+        swapped = self._poll_gallery()
+        if self.plate_map and self.on_plates is not None:
+            swapped = self._poll_plates() or swapped
+        return swapped
+
+    def _poll_gallery(self):
+        mtime = _mtime(self.header_path)
+        if mtime is None or mtime == self._header_mtime:
+            return False
+        try:
+            version = read_header(self.gallery_dir)["version"]
+        except (OSError, ValueError, KeyError, GalleryError) as e:
+            # Caught mid-replace or corrupt: keep the old mtime so it is retried
+            return self._failed(f"gallery header: {e}")
+        if version == self.version:
+            self._header_mtime = mtime
+            return False
+
+        started = time.perf_counter()
+        try:
+            gallery = load_gallery(self.gallery_dir, verify=True)
+            matcher = FaceMatcher(gallery, tolerance=self.tolerance, aggregate="min", index=self.index)
+        except (OSError, ValueError, KeyError, GalleryError) as e:
+            self._header_mtime = mtime      # a bad generation: wait for the next save
+            return self._failed(f"gallery v{version}: {e}")
+        self._header_mtime = mtime
+        self.load_ms = 1000 * (time.perf_counter() - started)
+        if self.on_swap is not None:
+            self.on_swap(matcher, gallery)
+        print(f"[INFO] Gallery v{self.version} -> v{gallery.version}: {len(gallery)} encodings, "
+              f"{len(gallery.names)} identities (loaded in {self.load_ms:.0f} ms)")
+        self.version = gallery.version
+        self.loaded_at = time.time()
+        self.swaps += 1
+        self.last_error = None
+        return True
+
+    def _poll_plates(self):
+        mtime = _mtime(self.plate_map)
+        if mtime is None or mtime == self._plates_mtime:
+            return False
+        from plate_ocr import load_plate_registry   # pulls in EasyOCR; only when plates are watched
+        try:
+            registry = load_plate_registry(self.plate_map)
+        except Exception as e:
+            return self._failed(f"plate registry: {e.__class__.__name__}: {e}")
+        # Re-stat after reading: opening/closing the database may checkpoint its WAL
+        self._plates_mtime = _mtime(self.plate_map)
+        self.on_plates(registry)
+        print(f"[INFO] Plate registry reloaded: {len(registry)} registered plates.")
+        self.plates_loaded_at = time.time()
+        self.plate_swaps += 1
+        return True
+
+    def _failed(self, message):
+        if message != self.last_error:
+            print(f"[WARN] Not swapping {message} (keeping the current one)")
+        self.last_error = message
+        self.failures += 1
+        return False
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "swaps": self.swaps,
+            "plate_swaps": self.plate_swaps,
+            "failures": self.failures,
+            "load_ms": round(self.load_ms, 1),
+            "last_error": self.last_error,
+        }
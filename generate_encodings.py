@@ -1,163 +1,439 @@
-import cv2
-import face_recognition
-import numpy as np
+# generate_encodings.py
+# Parallel, incremental builder for the known-face gallery (see gallery_store.py).
+#
+# Walks known_faces/<person>/*.jpg, encodes every image across a process pool and
+# keeps a per-image manifest (content hash, mtime, size, encoding row) next to the
+# gallery. A re-run only re-encodes images that were added or changed; deleted
+# images simply drop out of the rebuilt gallery.
+#
+# Enrollment (admin_gui.py) skips the walk altogether: encode_enrollment_image encodes the
+# new photos and update_gallery appends / removes their rows against the manifest.
+#
+# --augment encodes rotated / flipped / brightened variants of every photo as well. They
+# are made in memory on the worker that encodes the photo (no files in known_faces/) and
+# only their encodings are kept: every variant, near-duplicates dropped, or averaged into
+# one row per photo. The mode is recorded in the manifest; enrollment and later runs
+# without --augment keep using it.
+#
+#   python generate_encodings.py --augment          # dedupe (default mode)
+#   python generate_encodings.py --augment mean
+#   python generate_encodings.py --augment off      # back to one row per photo
+
 import os
-from datetime import datetime
-import csv
-import tkinter as tk
-from PIL import Image, ImageTk
-import threading
-import pickle
-
-# Directories
-KNOWN_FACES_DIR = "known_faces"
-UNKNOWN_DIR = "Unknown_faces"
-LOG_FILE = "unknown_faces_log.csv"
-ENCODING_FILE = "encodings.pkl"
-
-# Load known encodings from pickle file
-if not os.path.exists(ENCODING_FILE):
-    raise FileNotFoundError("encodings.pkl not found! Please generate it first.")
-
-with open(ENCODING_FILE, "rb") as f:
-    known_encodings, known_names = pickle.load(f)
-
-# Debug: Show names loaded from pickle
-print(f"[INFO] Loaded {len(known_encodings)} known encodings from file.")
-print("[DEBUG] Known Names in encodings.pkl:", known_names)
-
-# Save unknown face only once per session using face encoding fingerprint
-saved_faces = []
-
-# Ensure unknown_faces folder exists
-os.makedirs(UNKNOWN_DIR, exist_ok=True)
-
-# Create CSV log file with header if not exists
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Date", "Time", "Saved Image Name"])
-
-# Initialize webcam
-video_capture = None
-running = False
-
-# GUI setup
-window = tk.Tk()
-window.title("Smart Surveillance System")
-window.geometry("800x600")
-window.configure(bg="#1e1e1e")
-
-video_label = tk.Label(window, bg="#1e1e1e")
-video_label.pack(pady=10)
-
-status_label = tk.Label(window, text="Status: Idle", font=("Helvetica", 12), fg="white", bg="#1e1e1e")
-status_label.pack(pady=5)
-
-def start_surveillance():
-    global video_capture, running
-    if not running:
-        video_capture = cv2.VideoCapture(0)
-        running = True
-        status_label.config(text="Status: Monitoring", fg="lightgreen")
-        update_frame()
-
-def stop_surveillance():
-    global video_capture, running
-    if running:
-        running = False
-        if video_capture:
-            video_capture.release()
-        video_label.config(image='')
-        status_label.config(text="Status: Stopped", fg="orange")
-
-def update_frame():
-    global video_capture, running
-    if not running:
-        return
-
-    ret, frame = video_capture.read()
-    if not ret:
-        return
-
-    # Resize frame for faster processing
-    small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-    rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-    face_locations = face_recognition.face_locations(rgb_small_frame)
-    face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-    for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-        matches = face_recognition.compare_faces(known_encodings, face_encoding)
-        name = "Unknown"
-
-        face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-        best_match_index = np.argmin(face_distances)
-
-        if matches[best_match_index]:
-            matched_name = known_names[best_match_index].strip()
-            name = matched_name
-
-        # Debug print of recognition
-        print(f"[INFO] Detected and recognized: {name}")
-
-        if name.lower() == "unknown":
-            # Use cosine similarity to reduce duplicate saves
-            is_new = True
-            for saved in saved_faces:
-                similarity = np.dot(face_encoding, saved) / (np.linalg.norm(face_encoding) * np.linalg.norm(saved))
-                if similarity > 0.97:
-                    is_new = False
-                    break
-
-            if is_new:
-                saved_faces.append(face_encoding)
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"unknown_{timestamp}.jpg"
-                path = os.path.join(UNKNOWN_DIR, filename)
-                cv2.imwrite(path, frame)
-
-                with open(LOG_FILE, mode='a', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([
-                        datetime.now().strftime("%Y-%m-%d"),
-                        datetime.now().strftime("%H:%M:%S"),
-                        filename
-                    ])
-                print(f"[INFO] Unknown face saved: {filename}")
-
-        # Draw rectangle and name
-        top *= 4
-        right *= 4
-        bottom *= 4
-        left *= 4
-        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-        cv2.putText(frame, name, (left, top - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.75, (0, 255, 0), 2)
-
-    img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    img = Image.fromarray(img)
-    imgtk = ImageTk.PhotoImage(image=img)
-    video_label.imgtk = imgtk
-    video_label.configure(image=imgtk)
-    window.after(10, update_frame)
-
-# Buttons
-button_frame = tk.Frame(window, bg="#1e1e1e")
-button_frame.pack(pady=15)
-
-start_button = tk.Button(button_frame, text="▶ Start Surveillance", command=start_surveillance, bg="green", fg="white", font=("Helvetica", 12), width=20)
-start_button.pack(side="left", padx=10)
-
-stop_button = tk.Button(button_frame, text="⛔ Stop Surveillance", command=stop_surveillance, bg="red", fg="white", font=("Helvetica", 12), width=20)
-stop_button.pack(side="right", padx=10)
-
-# Start GUI
-window.mainloop()
-
-# Cleanup
-if video_capture:
-    video_capture.release()
-cv2.destroyAllWindows()
+import sys
+import json
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
+import face_recognition
+from PIL import Image, ImageEnhance
 
+import gallery_store
+from gallery_store import file_sha1, is_augmented_file, gallery_augment, MANIFEST_FILE
+
+# ===================================================
+# Configuration
+# ===================================================
+KNOWN_FACES_DIR = "known_faces"
+GALLERY_DIR = gallery_store.GALLERY_DIR
+MANIFEST_VERSION = 1
+
+VALID_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".jfif"}
+
+# Images handed to each worker per round-trip (amortizes IPC for small photos)
+CHUNK_SIZE = 8
+
+# In-memory augmentation (gallery_store.AUGMENTATIONS). Variant files augment_known_faces.py
+# wrote are skipped while augmenting, their variants are made anyway.
+AUGMENT_MODES = ("off", "all", "dedupe", "mean")
+#   "all"    - one row per variant that still shows a face
+#   "dedupe" - drop variants within AUGMENT_DEDUPE_DISTANCE of a row already kept for the photo
+#   "mean"   - average the photo and its variants into a single row
+AUGMENT_DEDUPE_DISTANCE = 0.15
+BRIGHTNESS = 1.15
+
+# ===================================================
+# Helpers
+# ===================================================
+def scan_known_faces(root, skip_augmented=False):
+    """
+    Return {relpath: (person_name, abspath, stat)} for every image under root/<person>/.
+    relpath always uses '/' so the manifest is portable between macOS and Windows.
+    """
+    images = {}
+    if not os.path.isdir(root):
+        return images
+    for person in sorted(os.listdir(root)):
+        person_dir = os.path.join(root, person)
+        if not os.path.isdir(person_dir):
+            continue
+        for dp, _, fns in os.walk(person_dir):
+            for fn in fns:
+                if os.path.splitext(fn)[1].lower() not in VALID_EXTS:
+                    continue
+                if skip_augmented and is_augmented_file(fn):
+                    continue
+                path = os.path.join(dp, fn)
+                rel = os.path.relpath(path, root).replace(os.sep, "/")
+                images[rel] = (person, path, os.stat(path))
+    return images
+
+def load_manifest(gallery_dir):
+    path = os.path.join(gallery_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def entry_rows(entry):
+    """Gallery rows of a manifest entry as a slice (several with augmentation), or None."""
+    row = entry.get("row")
+    return None if row is None else slice(row, row + entry.get("rows", 1))
+
+def load_previous_build(gallery_dir, augment=None):
+    """
+    Load the last gallery + manifest. Returns ({}, None) when either is missing or they
+    disagree (or the gallery was built with another augmentation mode than `augment`),
+    which forces a full rebuild instead of trusting stale rows.
+    """
+    try:
+        manifest = load_manifest(gallery_dir)
+        if manifest is None:
+            return {}, None
+        gallery = gallery_store.load_gallery(gallery_dir)
+    except FileNotFoundError:
+        return {}, None
+    except Exception as e:
+        print(f"[WARN] Could not read previous build ({e}); rebuilding from scratch.")
+        return {}, None
+
+    if (manifest.get("version") != MANIFEST_VERSION
+            or manifest.get("gallery_version") != gallery.version
+            or manifest.get("count") != len(gallery)):
+        print("[WARN] Manifest does not match the gallery; rebuilding from scratch.")
+        return {}, None
+    if augment is not None and manifest.get("augment", "off") != augment:
+        print(f"[INFO] Augmentation changed ({manifest.get('augment', 'off')} -> {augment}); "
+              f"re-encoding everything.")
+        return {}, None
+    return manifest.get("images", {}), gallery.encodings
+
+def save_manifest(gallery_dir, entries, count, gallery_version, augment="off"):
+    manifest = {"version": MANIFEST_VERSION, "gallery_version": gallery_version,
+                "count": count, "augment": augment, "images": entries}
+    # Compact JSON: without indent, json uses its C encoder (~5x faster for large galleries)
+    atomic_write_bytes(os.path.join(gallery_dir, MANIFEST_FILE),
+                       json.dumps(manifest, separators=(",", ":")).encode("utf-8"))
+
+def atomic_write_bytes(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# ===================================================
+# Worker
+# ===================================================
+_known_hashes = frozenset()
+_augment = "off"
+
+def _init_worker(known_hashes, augment="off"):
+    global _known_hashes, _augment
+    _known_hashes = known_hashes
+    _augment = augment
+
+def augment_variants(image, box):
+    """
+    Yield (name, rgb_image, box_or_None) for the variants of an RGB photo whose face is at
+    `box` (top, right, bottom, left). Flip and brightness leave the face where it was, so
+    its box is reused; rotated variants are re-detected (None).
+    """
+    pil = Image.fromarray(image)
+    width = image.shape[1]
+    top, right, bottom, left = box
+    for angle in (10, -10):
+        yield f"rot{angle}", np.asarray(pil.rotate(angle, expand=True)), None
+    yield "flip", np.ascontiguousarray(image[:, ::-1]), (top, width - left, bottom, width - right)
+    yield "bright", np.asarray(ImageEnhance.Brightness(pil).enhance(BRIGHTNESS)), box
+
+def combine_encodings(encodings, augment):
+    """Rows kept for one photo: (n, 128) array, the photo's own encoding first."""
+    encodings = np.asarray(encodings)
+    if augment == "mean":
+        return encodings.mean(axis=0, keepdims=True)
+    if augment == "dedupe":
+        kept = [encodings[0]]
+        for enc in encodings[1:]:
+            if np.linalg.norm(np.asarray(kept) - enc, axis=1).min() >= AUGMENT_DEDUPE_DISTANCE:
+                kept.append(enc)
+        return np.asarray(kept)
+    return encodings
+
+def largest_box(boxes):
+    """The photo's subject: the largest face, not someone in the background."""
+    return max(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+
+def encode_augmented(image, box, augment):
+    """Encode the face at `box` and the same face in every in-memory variant of the photo."""
+    encodings = face_recognition.face_encodings(image, [box])[:1]
+    for _, variant, variant_box in augment_variants(image, box):
+        if variant_box is None:
+            boxes = face_recognition.face_locations(variant)
+            if not boxes:
+                continue
+            variant_box = largest_box(boxes)
+        encodings.extend(face_recognition.face_encodings(variant, [variant_box])[:1])
+    return combine_encodings(encodings, augment)
+
+def encode_image(path):
+    """
+    Hash the file and, unless that content is already in the gallery, encode it (with
+    its in-memory variants when the pool augments). Returns (sha1, encoding_or_None,
+    status) where status is one of 'reused' | 'encoded' | 'no_face' | 'error:<Type>';
+    augmented encodings are (n, 128) arrays.
+    """
+    try:
+        sha1 = file_sha1(path)
+    except OSError as e:
+        return None, None, f"error:{e.__class__.__name__}"
+    if sha1 in _known_hashes:
+        return sha1, None, "reused"
+    try:
+        image = face_recognition.load_image_file(path)
+        if _augment != "off":
+            boxes = face_recognition.face_locations(image)
+            if not boxes:
+                return sha1, None, "no_face"
+            return sha1, encode_augmented(image, largest_box(boxes), _augment), "encoded"
+        encodings = face_recognition.face_encodings(image)
+    except Exception as e:
+        return sha1, None, f"error:{e.__class__.__name__}"
+    if not encodings:
+        return sha1, None, "no_face"
+    return sha1, encodings[0], "encoded"
+
+def encode_enrollment_image(path, augment="off"):
+    """
+    Enrollment photos must show exactly one face. Returns (sha1, encoding_or_None, status)
+    with status 'encoded' | 'no_face' | 'multiple_faces' | 'error:<Type>'.
+    """
+    try:
+        sha1 = file_sha1(path)
+        image = face_recognition.load_image_file(path)
+        boxes = face_recognition.face_locations(image)
+        if len(boxes) != 1:
+            return sha1, None, "no_face" if not boxes else "multiple_faces"
+        if augment != "off":
+            return sha1, encode_augmented(image, largest_box(boxes), augment), "encoded"
+        return sha1, face_recognition.face_encodings(image, boxes)[0], "encoded"
+    except Exception as e:
+        return None, None, f"error:{e.__class__.__name__}"
+
+# ===================================================
+# Build
+# ===================================================
+def build_gallery(known_dir=KNOWN_FACES_DIR, gallery_dir=GALLERY_DIR, workers=None, full=False, augment=None):
+    """augment: one of AUGMENT_MODES, or None to keep the mode the gallery was built with."""
+    start = time.perf_counter()
+    augment = augment or gallery_augment(gallery_dir)
+    if augment not in AUGMENT_MODES:
+        raise ValueError(f"augment must be one of {AUGMENT_MODES}, got {augment!r}")
+    images = scan_known_faces(known_dir, skip_augmented=augment != "off")
+    if full:
+        old_entries, old_encodings = {}, None
+    else:
+        old_entries, old_encodings = load_previous_build(gallery_dir, augment)
+
+    # Content hash -> previous encoding rows (None = previously had no face), so renamed or
+    # re-copied photos are picked up without touching dlib.
+    by_hash = {}
+    for entry in old_entries.values():
+        rows = entry_rows(entry)
+        by_hash[entry["sha1"]] = old_encodings[rows] if rows is not None else None
+
+    entries = {}
+    pending = []
+    for rel, (person, path, st) in images.items():
+        old = old_entries.get(rel)
+        if old and old.get("mtime") == st.st_mtime and old.get("size") == st.st_size:
+            entries[rel] = dict(old, name=person)
+        else:
+            pending.append(rel)
+
+    unchanged = len(entries)
+    removed = len(set(old_entries) - set(images))
+    encoded = reused = no_face = failed = 0
+
+    if pending:
+        print(f"[INFO] Hashing/encoding {len(pending)} new or modified images "
+              f"({unchanged} unchanged, {removed} removed"
+              + (f", augment {augment})..." if augment != "off" else ")..."))
+        paths = [images[rel][1] for rel in pending]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(frozenset(by_hash), augment)) as pool:
+            for i, (rel, (sha1, enc, status)) in enumerate(
+                    zip(pending, pool.map(encode_image, paths, chunksize=CHUNK_SIZE)), 1):
+                person, _, st = images[rel]
+                if status.startswith("error:"):
+                    failed += 1
+                    print(f"[WARN] Skipped {rel}: {status[6:]}")
+                    continue
+                if status == "reused":
+                    reused += 1
+                    enc = by_hash[sha1]
+                elif status == "no_face":
+                    no_face += 1
+                else:
+                    encoded += 1
+                    by_hash[sha1] = enc
+                entries[rel] = {"name": person, "sha1": sha1, "mtime": st.st_mtime,
+                                "size": st.st_size, "_enc": enc}
+                if i % 100 == 0:
+                    print(f"[INFO] {i}/{len(pending)} processed")
+    else:
+        print(f"[INFO] No new or modified images ({unchanged} unchanged, {removed} removed).")
+
+    # Rebuild the gallery in a stable (sorted) order and renumber rows.
+    known_encodings, known_names = [], []
+    for rel in sorted(entries):
+        entry = entries[rel]
+        if "_enc" in entry:
+            enc = entry.pop("_enc")
+        else:
+            rows = entry_rows(entry)
+            enc = old_encodings[rows] if rows is not None else None
+        entry.pop("rows", None)
+        if enc is None:
+            entry["row"] = None
+            continue
+        enc = np.atleast_2d(enc)
+        entry["row"] = len(known_encodings)
+        if len(enc) > 1:
+            entry["rows"] = len(enc)
+        known_encodings.extend(enc)
+        known_names.extend([entry["name"]] * len(enc))
+
+    if old_encodings is not None and not pending and not removed:
+        # Nothing changed since the last build (same augmentation mode, or
+        # load_previous_build would have returned None): keep the gallery as it is.
+        print(f"[INFO] Gallery {gallery_dir}/ is up to date ({len(known_encodings)} encodings).")
+        return known_encodings, known_names
+    version = gallery_store.save_gallery(known_encodings, known_names, gallery_dir)
+    save_manifest(gallery_dir, entries, len(known_encodings), version, augment)
+
+    elapsed = time.perf_counter() - start
+    photos = sum(1 for entry in entries.values() if entry["row"] is not None)
+    print(f"[INFO] Encoded {encoded}, reused {reused}, no face {no_face}, errors {failed}, "
+          f"removed {removed}."
+          + (f" Augmented: {len(known_encodings)} rows from {photos} photos ({augment})." if augment != "off" else ""))
+    print(f"[INFO] Saved {len(known_encodings)} encodings for {len(set(known_names))} people "
+          f"to {gallery_dir}/ (v{version}) in {elapsed:.1f}s")
+    return known_encodings, known_names
+
+# ===================================================
+# Incremental update (enrollment)
+# ===================================================
+def enroll_images(person, paths, known_dir=KNOWN_FACES_DIR, gallery_dir=GALLERY_DIR, progress=None):
+    """
+    Encode `paths` for `person` (augmented like the rest of the gallery), copy the accepted
+    photos into known_dir/<person>/ and append their rows to the gallery. Photos without
+    exactly one face are not copied. progress(done, total, path) is called after each
+    photo. Returns (accepted, rejected) lists of (path, status) and the new gallery
+    version (None if nothing was added).
+    """
+    accepted, rejected, rows = [], [], []
+    folder = os.path.join(known_dir, person)
+    augment = gallery_augment(gallery_dir)
+    for i, path in enumerate(paths, 1):
+        sha1, enc, status = encode_enrollment_image(path, augment)
+        if status == "encoded":
+            os.makedirs(folder, exist_ok=True)
+            dest = shutil.copy(path, folder)
+            rel = os.path.relpath(dest, known_dir).replace(os.sep, "/")
+            rows.append((rel, person, sha1, enc))
+            accepted.append((path, status))
+        else:
+            rejected.append((path, status))
+        if progress is not None:
+            progress(i, len(paths), path)
+    version = update_gallery(add=rows, known_dir=known_dir, gallery_dir=gallery_dir) if rows else None
+    return accepted, rejected, version
+
+def update_gallery(add=(), remove_names=(), known_dir=KNOWN_FACES_DIR, gallery_dir=GALLERY_DIR):
+    """
+    Append `add` rows [(relpath, name, sha1, encoding)] and drop every row of the people in
+    `remove_names`, using the manifest instead of walking known_dir (a re-added relpath
+    replaces its old rows). An encoding may be an (n, 128) array of augmented rows. Falls
+    back to build_gallery when there is no usable previous build. Returns the new gallery
+    version.
+    """
+    start = time.perf_counter()
+    augment = gallery_augment(gallery_dir)
+    entries, old_encodings = load_previous_build(gallery_dir)
+    if old_encodings is None:
+        build_gallery(known_dir, gallery_dir, augment=augment)
+        return gallery_store.read_header(gallery_dir)["version"]
+
+    remove_names = set(remove_names)
+    replaced = {rel for rel, _, _, _ in add}
+    keep = np.ones(len(old_encodings), dtype=bool)
+    names = [None] * len(old_encodings)
+    for rel in list(entries):
+        entry = entries[rel]
+        rows = entry_rows(entry)
+        if entry["name"] in remove_names or rel in replaced:
+            if rows is not None:
+                keep[rows] = False
+            del entries[rel]
+        elif rows is not None:
+            names[rows] = [entry["name"]] * (rows.stop - rows.start)
+    if not keep.all():
+        shift = np.cumsum(~keep)           # rows removed at or before each row
+        for entry in entries.values():
+            if entry.get("row") is not None:
+                entry["row"] -= int(shift[entry["row"]])
+        names = [n for n, k in zip(names, keep) if k]
+
+    if not add and keep.all():
+        return gallery_store.read_header(gallery_dir)["version"]
+    encodings = old_encodings[keep] if not keep.all() else old_encodings
+    new = []
+    for rel, person, sha1, enc in add:
+        enc = np.atleast_2d(enc)
+        st = os.stat(os.path.join(known_dir, rel))
+        entries[rel] = {"name": person, "sha1": sha1, "mtime": st.st_mtime, "size": st.st_size,
+                        "row": len(names)}
+        if len(enc) > 1:
+            entries[rel]["rows"] = len(enc)
+        names.extend([person] * len(enc))
+        new.extend(enc)
+    if new:
+        encodings = np.concatenate([encodings, np.asarray(new, dtype=gallery_store.DTYPE)])
+
+    version = gallery_store.save_gallery(encodings, names, gallery_dir)
+    save_manifest(gallery_dir, entries, len(names), version, augment)
+    print(f"[INFO] Gallery v{version}: +{len(new)} rows, -{int((~keep).sum())} rows "
+          f"({len(names)} total) in {1000 * (time.perf_counter() - start):.0f} ms")
+    return version
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Build the face gallery from known_faces/ (incremental).")
+    ap.add_argument("--known-dir", default=KNOWN_FACES_DIR)
+    ap.add_argument("--gallery", default=GALLERY_DIR)
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--full", action="store_true", help="ignore the manifest and re-encode everything")
+    ap.add_argument("--augment", nargs="?", const="dedupe", default=None, choices=AUGMENT_MODES,
+                    help="also encode in-memory rotated/flipped/brightened variants of each photo "
+                         "(default mode: dedupe; default: keep the gallery's current mode)")
+    return ap.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not os.path.isdir(args.known_dir):
+        sys.exit(f"[ERROR] Known faces folder not found: {args.known_dir}")
+    build_gallery(args.known_dir, args.gallery, workers=args.workers, full=args.full, augment=args.augment)
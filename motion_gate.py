@@ -0,0 +1,113 @@
+# motion_gate.py
+# Cheap motion gate in front of face detection. An empty corridor costs one resize and
+# one absdiff on a ~160 px wide grayscale frame instead of a HOG pass.
+#
+# Detection is allowed when something moved, when faces are already being tracked (a
+# person standing still must stay tracked), or as a periodic keep-alive, so a face that
+# appeared without visible motion is still found within KEEPALIVE_SECONDS.
+
+import cv2
+import numpy as np
+
+# ===================================================
+# Configuration
+# ===================================================
+GATE_WIDTH = 160             # motion is measured on a frame resized to this width
+BLUR_KSIZE = 5               # suppresses sensor noise before differencing
+PIXEL_THRESHOLD = 25         # grey-level change for a pixel to count as moving
+MIN_MOTION_FRACTION = 0.002  # fraction of (ROI) pixels that must move to open the gate
+BACKGROUND_ALPHA = 0.05      # running-average background update rate ("diff" method)
+KEEPALIVE_SECONDS = 2.0      # detect at least this often even in a static scene
+METHODS = ("diff", "mog2")
+
+class MotionGate:
+    """
+    method "diff": difference against a running-average background (cheapest, adapts to
+                   slow light changes).
+    method "mog2": OpenCV MOG2 background subtraction (more robust to flicker, ~3x cost).
+
+    Call `observe` on every frame to keep the background current, then `allow` whenever a
+    detection is due. All times are the caller's timestamps (video time offline).
+    """
+
+    def __init__(self, method="diff", width=GATE_WIDTH, pixel_threshold=PIXEL_THRESHOLD,
+                 min_fraction=MIN_MOTION_FRACTION, keepalive_seconds=KEEPALIVE_SECONDS,
+                 alpha=BACKGROUND_ALPHA, roi=None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown motion gate method {method!r}; choose from {', '.join(METHODS)}")
+        self.method = method
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_fraction = min_fraction
+        self.keepalive_seconds = keepalive_seconds
+        self.alpha = alpha
+        self.roi = roi                # RoiMask: motion outside it is ignored
+        self._subtractor = (cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+                            if method == "mog2" else None)
+        self._background = None
+        self._last_allowed = None
+        self.motion = 0.0             # moving fraction of the last observed frame
+        self.frames = 0
+        self.checks = 0
+        self.allowed_motion = 0
+        self.allowed_active = 0
+        self.allowed_keepalive = 0
+        self.skipped = 0
+
+    def reset(self):
+        self._background = None
+        self._last_allowed = None
+        self.motion = 0.0
+        if self._subtractor is not None:
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+
+    def observe(self, frame):
+        """Update the background model with one BGR frame. Returns the moving-pixel fraction."""
+        self.frames += 1
+        h, w = frame.shape[:2]
+        tiny = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(tiny, cv2.COLOR_BGR2GRAY), (BLUR_KSIZE, BLUR_KSIZE), 0)
+
+        if self._subtractor is not None:
+            moving = self._subtractor.apply(gray)
+        else:
+            if self._background is None:
+                self._background = gray.astype(np.float32)
+                self.motion = 1.0     # no reference yet: treat the first frame as motion
+                return self.motion
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+            cv2.accumulateWeighted(gray, self._background, self.alpha)
+            _, moving = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+
+        if self.roi is not None:
+            mask, _ = self.roi.mask(moving.shape)
+            area = cv2.countNonZero(mask)
+            moving = cv2.bitwise_and(moving, mask)
+        else:
+            area = moving.size
+        self.motion = cv2.countNonZero(moving) / float(area) if area else 0.0
+        return self.motion
+
+    def allow(self, now, active=False):
+        """Whether a due detection should run. `active`: faces are currently tracked."""
+        self.checks += 1
+        if active:
+            self.allowed_active += 1
+        elif self.motion >= self.min_fraction:
+            self.allowed_motion += 1
+        elif self._last_allowed is None or now - self._last_allowed >= self.keepalive_seconds:
+            self.allowed_keepalive += 1
+        else:
+            self.skipped += 1
+            return False
+        self._last_allowed = now
+        return True
+
+    @property
+    def skip_rate(self):
+        return self.skipped / self.checks if self.checks else 0.0
+
+    def stats(self):
+        return {"method": self.method, "checks": self.checks, "skipped": self.skipped,
+                "skip_rate": round(self.skip_rate, 3), "motion": self.allowed_motion,
+                "active": self.allowed_active, "keepalive": self.allowed_keepalive}
@@ -0,0 +1,348 @@
+# multi_camera.py
+# Multi-camera surveillance engine: one decode thread per source, one shared pool of
+# inference workers, one gallery.
+#
+#   python multi_camera.py 0 1 lobby.mp4 rtsp://127.0.0.1:8554/gate3 --workers 3
+#   python multi_camera.py 0 rtsp://127.0.0.1:8554/gate3 --plates     # + plates, face + plate access decisions
+#
+# New gallery versions (enrollment, deletion) and plate registry edits are picked up
+# while running (gallery_watcher.py); --no-watch disables that.
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+import cv2
+
+from pipeline import DropOldestQueue, StageStats, CaptureThread
+from event_writer import EventWriter
+from event_store import EventStore, EVENT_DB
+from recognition_engine import (
+    CameraProcessor, EventSink, load_matcher, load_camera_config, MATCH_INDEX, CAMERA_CONFIG_FILE, MOTION_GATE,
+)
+from plate_ocr import load_plate_registry
+from plate_stage import PlateLocalizer, PlateReader, PLATE_MAP_CSV
+from employee_registry import REGISTRY_DB
+from dual_auth import DualAuth
+from gallery_watcher import GalleryWatcher
+
+# ===================================================
+# Configuration
+# ===================================================
+CAMERA_QUEUE_SIZE = 2        # frames buffered per camera before the oldest is dropped
+STATS_INTERVAL = 5.0
+
+def parse_source(source):
+    """'0' -> device 0; anything else (file path, rtsp://...) is passed to OpenCV as-is."""
+    source = str(source)
+    return int(source) if source.isdigit() else source
+
+class Camera:
+    """One source: its capture thread, frame queue, recognition state and stats."""
+
+    def __init__(self, camera_id, source, matcher, on_put=None, plates=None, lane=None, **processor_args):
+        self.id = camera_id
+        self.lane = lane or camera_id  # cameras of one gate share a lane (dual_auth.py)
+        self.source = parse_source(source)
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        self.queue = DropOldestQueue(CAMERA_QUEUE_SIZE, on_put=on_put)
+        self.processor = CameraProcessor(camera_id, matcher, **processor_args)
+        self.plates = plates          # PlateLocalizer when this camera also reads plates
+        self.capture_stats = StageStats(f"{camera_id} capture")
+        self.inference_stats = StageStats(f"{camera_id} inference")
+        self.capture = None
+        self.capture_thread = None
+        self.busy = False             # a worker is processing this camera right now
+        self.latest = None            # (frame_no, timestamp, frame, [(box, name), ...])
+        self.processed = 0
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Could not open camera source {self.source!r}")
+        # Play files back at their recorded rate so they behave like a live feed
+        pace = self.capture.get(cv2.CAP_PROP_FPS) if self.is_file else None
+        self.capture_thread = CaptureThread(self.capture, self.queue, self.capture_stats,
+                                            name=f"capture-{self.id}", pace_fps=pace or None,
+                                            stop_on_eof=self.is_file)
+        self.capture_thread.start()
+
+    def close(self):
+        if self.capture_thread:
+            self.capture_thread.stop()
+            self.capture_thread.join(timeout=1)
+        if self.capture:
+            self.capture.release()
+
+    @property
+    def finished(self):
+        """A file source that reached EOF and has nothing left queued."""
+        return (self.capture_thread is not None and self.capture_thread.stopped
+                and not len(self.queue) and not self.busy)
+
+    def stats(self):
+        return {
+            "capture_fps": round(self.capture_stats.fps, 1),
+            "inference_fps": round(self.inference_stats.fps, 1),
+            "latency_ms": round(self.inference_stats.latency_ms, 1),
+            "processed": self.processed,
+            "dropped": self.queue.dropped,
+            "queue": len(self.queue),
+            "known": self.processor.known_count,
+            "unknown": self.processor.unknown_count,
+            "gate_skip": round(100 * self.processor.motion_gate.skip_rate, 1) if self.processor.motion_gate else None,
+            "plate_candidates": self.plates.proposed if self.plates else None,
+        }
+
+class MultiCameraEngine:
+    """
+    Decodes every source on its own thread and feeds a shared pool of inference workers.
+
+    Scheduling is round-robin over cameras that have a frame waiting and are not already
+    being processed, so a busy lobby camera can't starve a quiet gate, and frames of one
+    camera are always processed in order (its tracker is not shared between workers).
+    `latency_ms` is capture timestamp -> inference done.
+
+    camera_config maps a camera id or source to CameraProcessor options (ROI mask,
+    target_fps, ...) that override `processor_args` for that camera only.
+
+    With a PlateReader, every camera (or those with "plates": true in camera_config, if any
+    say so) also localizes plates on the inference workers - inside its "plate_roi" - and
+    hands the crops to the reader's OCR thread. Cameras with the same "lane" in camera_config
+    watch one gate (see `lanes`, for DualAuth).
+    """
+
+    def __init__(self, sources, matcher, workers=None, on_event=None, on_result=None,
+                 camera_config=None, plate_reader=None, **processor_args):
+        self.matcher = matcher
+        self.on_event = on_event
+        self.on_result = on_result
+        self.plate_reader = plate_reader
+        self.workers = workers or min(len(sources), os.cpu_count() or 1)
+        self._cond = threading.Condition()
+        self.cameras = []
+        camera_config = camera_config or {}
+        plates_default = not any(options.get("plates") for options in camera_config.values())
+        for i, source in enumerate(sources):
+            camera_id = f"cam{i}"
+            options = dict(processor_args)
+            options.update(camera_config.get(camera_id) or camera_config.get(str(source)) or {})
+            plates = options.pop("plates", plates_default)
+            plate_roi = options.pop("plate_roi", None)
+            lane = options.pop("lane", None)
+            localizer = PlateLocalizer(roi=plate_roi) if plate_reader is not None and plates else None
+            self.cameras.append(Camera(camera_id, source, matcher, on_put=self._wake, plates=localizer, lane=lane,
+                                       **options))
+        self._next = 0
+        self._threads = []
+        self.running = False
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def start(self):
+        self.running = True
+        for cam in self.cameras:
+            cam.open()
+        if self.plate_reader is not None:
+            self.plate_reader.start()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        for cam in self.cameras:
+            cam.close()
+        for t in self._threads:
+            t.join(timeout=1)
+        self._threads = []
+        if self.plate_reader is not None:
+            self.plate_reader.stop()
+
+    def set_matcher(self, matcher, gallery=None):
+        """Hot-swap the gallery: every camera switches to `matcher` before its next frame."""
+        self.matcher = matcher
+        for cam in self.cameras:
+            cam.processor.set_matcher(matcher)
+
+    @property
+    def lanes(self):
+        """Camera id -> lane id."""
+        return {cam.id: cam.lane for cam in self.cameras}
+
+    @property
+    def finished(self):
+        return (all(cam.finished for cam in self.cameras)
+                and (self.plate_reader is None or self.plate_reader.idle))
+
+    def _next_job(self):
+        """Fair round-robin pick of (camera, item); waits while nothing is runnable."""
+        with self._cond:
+            while self.running:
+                n = len(self.cameras)
+                for i in range(n):
+                    cam = self.cameras[(self._next + i) % n]
+                    if cam.busy or not len(cam.queue):
+                        continue
+                    item = cam.queue.get(timeout=0)
+                    if item is None:
+                        continue
+                    cam.busy = True
+                    self._next = (self._next + i + 1) % n
+                    return cam, item
+                self._cond.wait(0.1)
+        return None, None
+
+    def _worker(self):
+        while self.running:
+            cam, item = self._next_job()
+            if cam is None:
+                break
+            frame_no, timestamp, frame = item
+            try:
+                t0 = time.perf_counter()
+                if cam.plates is not None and self.plate_reader.running:
+                    # Before face processing, which may draw on the frame
+                    boxes = cam.plates.propose(frame, frame_no, timestamp)
+                    if boxes:
+                        self.plate_reader.submit(cam.id, timestamp, frame, boxes)
+                frame, events = cam.processor.process(frame, frame_no, timestamp)
+                cam.inference_stats.tick(time.time() - timestamp)
+                cam.processed += 1
+                cam.latest = (frame_no, timestamp, frame, cam.processor.faces)
+                if self.on_event:
+                    for event in events:
+                        self.on_event(event)
+                if self.on_result:
+                    self.on_result(cam, frame, events, time.perf_counter() - t0)
+            except Exception as e:
+                print(f"[ERROR] {cam.id}: {e.__class__.__name__}: {e}")
+            finally:
+                with self._cond:
+                    cam.busy = False
+                    self._cond.notify()
+
+    def stats(self):
+        return {cam.id: cam.stats() for cam in self.cameras}
+
+    def print_stats(self):
+        for cam_id, st in self.stats().items():
+            print(f"[STATS] {cam_id}: capture {st['capture_fps']} fps | inference {st['inference_fps']} fps "
+                  f"| latency {st['latency_ms']} ms | processed {st['processed']} | dropped {st['dropped']} "
+                  f"| known {st['known']} unknown {st['unknown']}"
+                  + (f" | gate skip {st['gate_skip']}%" if st['gate_skip'] is not None else "")
+                  + (f" | plate candidates {st['plate_candidates']}" if st['plate_candidates'] is not None else ""))
+        if self.plate_reader is not None:
+            print(f"[STATS] plate OCR: {self.plate_reader.stats()}")
+
+# ===================================================
+# CLI
+# ===================================================
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Headless multi-camera face (and plate) recognition.")
+    ap.add_argument("sources", nargs="+", help="device index, video file or rtsp:// URL")
+    ap.add_argument("--workers", type=int, default=None, help="inference threads (default: one per camera)")
+    ap.add_argument("--index", default=MATCH_INDEX, help="brute | ivf | balltree")
+    ap.add_argument("--stats-every", type=float, default=STATS_INTERVAL)
+    ap.add_argument("--target-fps", type=float, default=None,
+                    help="adapt the detection scale to keep inference at this rate")
+    ap.add_argument("--refine-scale", type=float, default=None,
+                    help="re-detect around tracks/motion at this scale (e.g. 1.0) for distant faces")
+    ap.add_argument("--config", default=CAMERA_CONFIG_FILE, help="per-camera options (ROI masks, ...)")
+    ap.add_argument("--db", default=EVENT_DB, help="event store (SQLite)")
+    ap.add_argument("--csv", action="store_true", help="also append the legacy CSV logs")
+    ap.add_argument("--motion-gate", default=MOTION_GATE or "off", choices=("diff", "mog2", "off"),
+                    help="skip detection on static scenes")
+    ap.add_argument("--plates", action="store_true",
+                    help="also read number plates (cameras with \"plates\": true in --config, else all)")
+    ap.add_argument("--plate-map", default=REGISTRY_DB if os.path.exists(REGISTRY_DB) else PLATE_MAP_CSV,
+                    help="plate registry CSV or registry.db (default: the admin panel's registry if present)")
+    ap.add_argument("--no-watch", action="store_true",
+                    help="don't hot-swap new gallery versions / plate registry edits while running")
+    args = ap.parse_args()
+
+    gallery, matcher = load_matcher(index=args.index)
+    print(f"[INFO] Loaded {len(gallery)} known encodings (gallery v{gallery.version}), "
+          f"{len(args.sources)} cameras.")
+    store = EventStore(args.db)
+    writer = EventWriter(EventSink() if args.csv else EventSink(unknown_log=None, known_log=None, plate_log=None, access_log=None), store)
+
+    fusion = None
+
+    def on_event(event):
+        writer.submit(event)
+        if fusion is not None and event.kind != "access":
+            fusion.submit(event)
+        if event.kind == "access":
+            d = event.detail
+            print(f"[EVENT] {event.datetime:%H:%M:%S} {event.camera} ACCESS {event.name.upper()} "
+                  f"plate {d['plate']} owner {d['owner']} driver {d['driver']} (decided in {d['latency_s']:.2f}s)")
+            return
+        if event.kind == "plate":
+            d = event.detail
+            print(f"[EVENT] {event.datetime:%H:%M:%S} {event.camera} plate {event.name} "
+                  f"(owner {d['owner']}, read {d['read']}, score {d['score']}, "
+                  f"{d['ocr_calls']} OCR calls / {d['sightings']} sightings, track {event.track_id})")
+            return
+        print(f"[EVENT] {event.datetime:%H:%M:%S} {event.camera} {event.kind} {event.name} "
+              f"(track {event.track_id})")
+
+    plate_reader = None
+    if args.plates:
+        registry = load_plate_registry(args.plate_map)
+        print(f"[INFO] Loaded {len(registry)} registered plates.")
+        plate_reader = PlateReader(registry, on_event=on_event)
+
+    engine = MultiCameraEngine(args.sources, matcher, workers=args.workers, on_event=on_event,
+                               camera_config=load_camera_config(args.config), plate_reader=plate_reader,
+                               annotate=False, target_fps=args.target_fps, refine_scale=args.refine_scale,
+                               motion_gate=None if args.motion_gate == "off" else args.motion_gate)
+    if plate_reader is not None:
+        fusion = DualAuth(engine.lanes, on_decision=on_event)
+        fusion.start()
+    watcher = None
+    if not args.no_watch:
+        watcher = GalleryWatcher(on_swap=engine.set_matcher, version=gallery.version, index=args.index,
+                                 plate_map=args.plate_map if plate_reader is not None else None,
+                                 on_plates=plate_reader.set_registry if plate_reader is not None else None)
+    try:
+        engine.start()
+    except RuntimeError as e:
+        engine.stop()
+        sys.exit(f"[ERROR] {e}")
+    if watcher is not None:
+        watcher.start()
+    try:
+        while not engine.finished:
+            time.sleep(args.stats_every)
+            engine.print_stats()
+            if fusion is not None:
+                print(f"[STATS] dual auth: {fusion.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        engine.stop()
+        if fusion is not None:
+            fusion.stop()
+        writer.close()
+        store.close()
+        engine.print_stats()
+        if fusion is not None:
+            print(f"[STATS] dual auth: {fusion.stats()}")
+        print(f"[STATS] event writer: {writer.stats()}")
+        if watcher is not None:
+            print(f"[STATS] gallery watcher: {watcher.stats()}")
+        for cam in engine.cameras:
+            if cam.processor.motion_gate is not None:
+                print(f"[STATS] {cam.id} motion gate: {cam.processor.stats()['motion_gate']}")
+            if cam.plates is not None:
+                print(f"[STATS] {cam.id} plate localizer: {cam.plates.stats()}")
@@ -0,0 +1,140 @@
+# pipeline.py
+# Building blocks for the live capture -> inference -> render pipeline.
+
+import time
+import threading
+from collections import deque
+
+class DropOldestQueue:
+    """
+    Bounded FIFO that never blocks the producer: when full, the oldest item is discarded
+    so consumers always work on the freshest frames instead of a growing backlog.
+    """
+
+    def __init__(self, maxsize=2, on_put=None):
+        self.maxsize = maxsize
+        self.on_put = on_put          # optional callback, e.g. to wake a shared scheduler
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+        if self.on_put is not None:
+            self.on_put()
+
+    def get(self, timeout=None):
+        """Oldest item, or None if nothing arrived within `timeout` seconds."""
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def get_latest(self):
+        """Newest item without waiting (older ones are counted as dropped), or None."""
+        with self._cond:
+            if not self._items:
+                return None
+            self.dropped += len(self._items) - 1
+            item = self._items.pop()
+            self._items.clear()
+            return item
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+
+class StageStats:
+    """Per-stage throughput (EMA FPS over item intervals) and last processing latency."""
+
+    def __init__(self, name, smoothing=0.9):
+        self.name = name
+        self.smoothing = smoothing
+        self.count = 0
+        self.fps = 0.0
+        self.latency_ms = 0.0
+        self._last = None
+        self._lock = threading.Lock()
+
+    def tick(self, latency_s=None, now=None):
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if self._last is not None and now > self._last:
+                inst = 1.0 / (now - self._last)
+                self.fps = inst if self.count <= 1 else self.smoothing * self.fps + (1 - self.smoothing) * inst
+            self._last = now
+            self.count += 1
+            if latency_s is not None:
+                self.latency_ms = 1000.0 * latency_s
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.fps = self.latency_ms = 0.0
+            self._last = None
+
+    def summary(self, queue=None):
+        text = f"{self.name} {self.fps:4.1f} fps"
+        if self.latency_ms:
+            text += f" ({self.latency_ms:.0f} ms)"
+        if queue is not None:
+            text += f" q={len(queue)}/{queue.maxsize} drop={queue.dropped}"
+        return text
+
+class CaptureThread(threading.Thread):
+    """
+    Reads frames from an opened cv2.VideoCapture as fast as the source delivers them and
+    pushes (frame_no, timestamp, frame) into a DropOldestQueue.
+
+    pace_fps  : throttle to this rate (video files played back as if they were live)
+    stop_on_eof: stop after the first failed read instead of retrying (video files)
+    """
+
+    def __init__(self, capture, out_queue, stats=None, name="capture", pace_fps=None, stop_on_eof=False):
+        super().__init__(name=name, daemon=True)
+        self.capture = capture
+        self.out_queue = out_queue
+        self.stats = stats or StageStats("Capture")
+        self.pace_fps = pace_fps
+        self.stop_on_eof = stop_on_eof
+        self.frame_no = 0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def run(self):
+        interval = 1.0 / self.pace_fps if self.pace_fps else 0.0
+        next_due = time.perf_counter()
+        while not self._stop_event.is_set():
+            ret, frame = self.capture.read()
+            if not ret:
+                if self.stop_on_eof:
+                    self._stop_event.set()
+                    break
+                # Camera hiccup / not ready yet; don't spin
+                self._stop_event.wait(0.01)
+                continue
+            self.frame_no += 1
+            self.out_queue.put((self.frame_no, time.time(), frame))
+            self.stats.tick()
+            if interval:
+                next_due += interval
+                delay = next_due - time.perf_counter()
+                if delay > 0:
+                    self._stop_event.wait(delay)
+                else:
+                    next_due = time.perf_counter()
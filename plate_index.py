@@ -0,0 +1,254 @@
+# plate_index.py
+# Plate registry index: exact hash lookup, then a fuzzy tier for OCR misreads.
+#
+#   exact  - dict lookup of the normalized plate
+#   fuzzy  - bigram inverted index proposes the `candidates` registry plates sharing the most
+#            bigrams with the read (length-filtered), verified with an OCR-aware edit distance
+#
+# Plates are compared after normalize_plate_text (plate_ocr.py), which already folds the
+# CHAR_SUBS confusions (0/O, 1/I, 8/B, ...) to one character, so those cost nothing. The
+# distance charges the remaining look-alike pairs (O/D, M/N, ...) CONFUSION_COST instead of 1.
+#
+#   python plate_index.py --synthetic 50000 --queries 500    # latency + agreement vs difflib
+#   python plate_index.py --csv plate_owner_mapping.csv
+
+import time
+import random
+import argparse
+from difflib import get_close_matches
+
+import numpy as np
+
+# ===================================================
+# Configuration
+# ===================================================
+CONFUSION_COST = 0.5      # substitution cost between look-alike characters (others cost 1)
+MAX_DISTANCE = 2.0        # never accept a fuzzy match further than this (weighted edits)
+CANDIDATES = 32           # registry plates verified per fuzzy lookup
+
+# Look-alikes left after normalize_plate_text (digits 0,1,2,4,5,6,7,8 are folded already)
+OCR_CONFUSIONS = ("OD", "OQ", "OU", "UV", "VY", "CG", "EF", "MN", "HN", "KX", "PR", "B3", "G9", "SB")
+
+_COST = np.ones((128, 128), dtype=np.float32)     # substitution cost by ASCII code
+np.fill_diagonal(_COST, 0.0)
+for _a, _b in OCR_CONFUSIONS:
+    _COST[ord(_a), ord(_b)] = _COST[ord(_b), ord(_a)] = CONFUSION_COST
+
+def encode_plates(plates):
+    """(N, max_len) uint8 ASCII codes, zero-padded, and the (N,) lengths."""
+    width = max((len(p) for p in plates), default=0)
+    codes = np.zeros((len(plates), max(width, 1)), dtype=np.uint8)
+    for i, p in enumerate(plates):
+        codes[i, :len(p)] = np.frombuffer(p.encode("ascii"), dtype=np.uint8)
+    return codes, np.array([len(p) for p in plates], dtype=np.int64)
+
+def plate_distances(text, codes, lengths):
+    """
+    Weighted Levenshtein distances from one normalized plate to many (rows of `codes`):
+    insertions, deletions and substitutions cost 1, look-alike substitutions CONFUSION_COST.
+    One DP row per character of `text`, vectorized over the plates; the insertion chain
+    within a row is a running minimum.
+    """
+    n, width = codes.shape
+    steps = np.arange(width + 1, dtype=np.float32)
+    prev = np.broadcast_to(steps, (n, width + 1))
+    for i, c in enumerate(text.encode("ascii"), 1):
+        cur = np.empty((n, width + 1), dtype=np.float32)
+        cur[:, 0] = i
+        np.minimum(prev[:, :-1] + _COST[c][codes], prev[:, 1:] + 1.0, out=cur[:, 1:])
+        cur -= steps
+        np.minimum.accumulate(cur, axis=1, out=cur)
+        cur += steps
+        prev = cur
+    return prev[np.arange(n), lengths]
+
+def plate_distance(a, b):
+    """Weighted distance between two normalized plates (see plate_distances)."""
+    if a == b:
+        return 0.0
+    return float(plate_distances(a, *encode_plates([b]))[0])
+
+def plate_similarity(distance, a, b):
+    """Score in 0..1 (1 = identical), comparable with the FUZZY_CUTOFF scale."""
+    return 1.0 - distance / max(len(a), len(b), 1)
+
+def _grams(s):
+    s = f"^{s}$"
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+class PlateIndex:
+    """
+    Index over normalized registry plates. `lookup` returns (plate, score, how) for the best
+    match with score >= cutoff, or (None, 0.0, "none").
+    """
+
+    def __init__(self, plates, candidates=CANDIDATES, max_distance=MAX_DISTANCE):
+        self.plates = sorted(set(p for p in plates if p))
+        self.candidates = candidates
+        self.max_distance = max_distance
+        self.rows = {p: i for i, p in enumerate(self.plates)}
+        self._codes, self.lengths = encode_plates(self.plates)
+        postings = {}
+        for i, p in enumerate(self.plates):
+            for g in _grams(p):
+                postings.setdefault(g, []).append(i)
+        self._postings = {g: np.array(rows, dtype=np.int32) for g, rows in postings.items()}
+
+    def __len__(self):
+        return len(self.plates)
+
+    def __contains__(self, plate):
+        return plate in self.rows
+
+    def _radius(self, text, cutoff):
+        # score >= cutoff  <=>  d <= (1 - cutoff) * max_len, and max_len <= len(text) / cutoff
+        radius = (1.0 - cutoff) * len(text) / max(cutoff, 1e-6)
+        return radius if self.max_distance is None else min(radius, self.max_distance)
+
+    def _candidate_rows(self, text, radius, exhaustive=False):
+        if exhaustive:
+            return np.flatnonzero(np.abs(self.lengths - len(text)) <= radius)
+        grams = _grams(text)
+        lists = [self._postings[g] for g in grams if g in self._postings]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.plates))
+        # Count filter: each edit breaks at most two bigrams, and a distance within the radius
+        # allows at most radius / CONFUSION_COST edits
+        min_shared = max(1, len(grams) - 2 * int(radius / min(CONFUSION_COST, 1.0)))
+        rows = np.flatnonzero(counts >= min_shared)
+        rows = rows[np.abs(self.lengths[rows] - len(text)) <= radius]
+        if len(rows) > self.candidates:
+            rows = rows[np.argpartition(-counts[rows], self.candidates - 1)[:self.candidates]]
+        return rows
+
+    def lookup(self, text, cutoff, exhaustive=False):
+        """
+        Best registry match for one normalized read. `exhaustive` verifies every plate of a
+        compatible length instead of the bigram candidates (ground truth for the benchmark).
+        """
+        if not text or not self.plates:
+            return None, 0.0, "none"
+        if text in self.rows:
+            return text, 1.0, "exact"
+        radius = self._radius(text, cutoff)
+        rows = self._candidate_rows(text, radius, exhaustive)
+        if not len(rows):
+            return None, 0.0, "none"
+        d = plate_distances(text, self._codes[rows], self.lengths[rows])
+        best = np.lexsort((rows, d))[0]          # nearest, then alphabetical
+        if d[best] > radius:
+            return None, 0.0, "none"
+        plate = self.plates[rows[best]]
+        score = plate_similarity(float(d[best]), text, plate)
+        if score < cutoff:
+            return None, 0.0, "none"
+        return plate, score, "fuzzy"
+
+# ===================================================
+# Benchmark
+# ===================================================
+STATES = ["MH", "KA", "DL", "TN", "GJ", "UP", "RJ", "WB", "AP", "HR"]
+LETTERS = "ABCDEFGHJKLMNPQRSTUVWXYZ"
+
+def synthetic_plates(n, rng):
+    """Indian-style plates (MH20EE7598), raw (un-normalized)."""
+    plates = set()
+    while len(plates) < n:
+        plates.add(f"{rng.choice(STATES)}{rng.randint(1, 99):02d}"
+                   f"{''.join(rng.choice(LETTERS) for _ in range(rng.choice((1, 2))))}"
+                   f"{rng.randint(1, 9999):04d}")
+    return sorted(plates)
+
+def misread(plate, rng):
+    """A plausible OCR read: look-alike swaps, digit/letter swaps and at most one real edit."""
+    swaps = {"0": "O", "O": "0", "1": "I", "I": "1", "8": "B", "B": "8", "5": "S", "S": "5",
+             "D": "O", "M": "N", "N": "M", "E": "F", "C": "G", "U": "V"}
+    chars = [swaps[c] if c in swaps and rng.random() < 0.3 else c for c in plate]
+    op = rng.random()
+    if op < 0.2 and len(chars) > 5:
+        del chars[rng.randrange(len(chars))]
+    elif op < 0.4:
+        chars[rng.randrange(len(chars))] = rng.choice(LETTERS + "0123456789")
+    return "".join(chars)
+
+def benchmark(raw_plates, queries, labels, cutoff, difflib_queries=50, candidates=(8, 16, 32, 64)):
+    from plate_ocr import normalize_plate_text
+
+    t0 = time.perf_counter()
+    index = PlateIndex((normalize_plate_text(p) for p in raw_plates))
+    build_s = time.perf_counter() - t0
+    queries = [normalize_plate_text(q) for q in queries]
+
+    def run(fn, qs, repeats=1):
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            out = [fn(q) for q in qs]
+            best = min(best, time.perf_counter() - t0)
+        return out, 1000.0 * best / max(1, len(qs))
+
+    truth, truth_ms = run(lambda q: index.lookup(q, cutoff, exhaustive=True)[0], queries)
+    rows = [("exhaustive", "-", truth_ms, truth)]
+    for c in candidates:
+        index.candidates = c
+        found, ms = run(lambda q: index.lookup(q, cutoff)[0], queries, repeats=3)
+        rows.append(("bigram", f"candidates={c}", ms, found))
+    index.candidates = CANDIDATES
+
+    # The old classify_plate path, on a subset (it scans the whole registry per read)
+    registry = list(index.plates)
+    n_d = min(difflib_queries, len(queries))
+    found, ms = run(lambda q: q if q in index else (get_close_matches(q, list(registry), n=1, cutoff=cutoff) or [None])[0],
+                    queries[:n_d])
+    rows.append(("difflib", f"{n_d} queries", ms, found))
+
+    print(f"\n=== Plate index report: {len(index)} plates, {len(queries)} reads, cutoff={cutoff}, "
+          f"max_distance={MAX_DISTANCE}, build {build_s:.2f}s ===")
+    print(f"{'method':<11} {'params':<16} {'ms/read':>9} {'agree':>7} {'known acc':>10} {'unknown acc':>12}")
+    for method, params, ms, found in rows:
+        n = len(found)
+        agree = np.mean([a == b for a, b in zip(found, truth[:n])])
+        known = [f is not None for f, l in zip(found, labels[:n]) if l == "known"]
+        unknown = [f is None for f, l in zip(found, labels[:n]) if l == "unknown"]
+        print(f"{method:<11} {params:<16} {ms:>9.4f} {agree:>7.4f} "
+              f"{np.mean(known) if known else 0.0:>10.4f} {np.mean(unknown) if unknown else 0.0:>12.4f}")
+    return rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Latency/agreement of the plate index against exhaustive search and difflib.")
+    ap.add_argument("--csv", help="plate registry CSV (default: synthetic registry)")
+    ap.add_argument("--synthetic", type=int, default=50000, metavar="PLATES")
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--difflib-queries", type=int, default=50)
+    ap.add_argument("--cutoff", type=float, default=None, help="default: FUZZY_CUTOFF from plate_ocr.py")
+    args = ap.parse_args()
+
+    from plate_ocr import FUZZY_CUTOFF, PLATE_COLUMNS
+    rng = random.Random(0)
+    if args.csv:
+        import csv
+        with open(args.csv, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            col = next((k for k in PLATE_COLUMNS if k in (reader.fieldnames or [])), None)
+            raw = [row[col] for row in reader if row.get(col)] if col else []
+        if not raw:
+            raise SystemExit(f"[ERROR] No plates found in {args.csv}")
+    else:
+        raw = synthetic_plates(args.synthetic, rng)
+
+    # Half misreads of registered plates, half plates that aren't registered
+    registered = set(raw)
+    queries, labels = [], []
+    for i in range(args.queries):
+        if i % 2 == 0:
+            queries.append(misread(rng.choice(raw), rng))
+            labels.append("known")
+        else:
+            p = synthetic_plates(1, rng)[0]
+            while p in registered:
+                p = synthetic_plates(1, rng)[0]
+            queries.append(misread(p, rng))
+            labels.append("unknown")
+    benchmark(raw, queries, labels, FUZZY_CUTOFF if args.cutoff is None else args.cutoff,
+              difflib_queries=args.difflib_queries)
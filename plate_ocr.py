@@ -0,0 +1,180 @@
+# plate_ocr.py
+# Number plate OCR helpers shared by the plate evaluator and the live ANPR stage:
+# text normalization (OCR confusions), the plate registry CSV, candidate extraction from
+# raw EasyOCR results and a process-pool OCR worker.
+
+# --- macOS OpenMP fix (put BEFORE torch/easyocr import) ---
+import os
+os.environ.setdefault("KMP_DUPLICATE_LIB_OK", "TRUE")   # workaround for duplicate libomp on macOS
+
+import re
+import csv
+from pathlib import Path
+
+from plate_index import PlateIndex
+
+# =========================
+# Config
+# =========================
+OCR_LANGS = ["en"]
+RECOGNITION_CONF_MIN = 0.30   # drop low-confidence OCR tokens (0..1)
+FUZZY_CUTOFF          = 0.62  # lower = more tolerant to OCR typos (0..1)
+
+# Regex for plate-like tokens (adjust for your locale if needed)
+PLATE_TOKEN = re.compile(r"[A-Z0-9]{5,}", re.IGNORECASE)
+
+PLATE_COLUMNS = ("plate", "Plate", "plate_number", "PlateNumber")
+OWNER_COLUMNS = ("owner", "Owner", "owner_name", "OwnerName", "name", "Name")
+PLATE_ALLOWLIST = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"   # restricts EasyOCR's decoder on plate crops
+
+# Common OCR confusions mapping
+CHAR_SUBS = {
+    "0": "O", "O": "O",
+    "1": "I", "I": "I", "l": "I",
+    "8": "B", "B": "B",
+    "5": "S", "S": "S",
+    "2": "Z", "Z": "Z",
+    "4": "A", "A": "A",
+    "6": "G", "G": "G",
+    "7": "T", "T": "T",
+}
+
+def normalize_plate_text(s: str) -> str:
+    """
+    Uppercase, remove non-alphanumerics, and map commonly-confused chars to a canonical set.
+    This reduces false 'unknown' due to O/0, I/1, B/8, etc.
+    """
+    s = re.sub(r"[^A-Z0-9]", "", s.upper())
+    out = []
+    for ch in s:
+        if ch in CHAR_SUBS:
+            out.append(CHAR_SUBS[ch])
+        else:
+            out.append(ch)
+    return "".join(out)
+
+def load_plate_registry(csv_path: Path):
+    """
+    Normalized plate -> (plate as registered, owner name or None). Accepts common column
+    names; plates are normalized like OCR reads. A registry database (*.db, see
+    employee_registry.py) is read directly.
+    """
+    registry = {}
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        print(f"[WARN] Mapping file not found: {csv_path}")
+        return registry
+    if csv_path.suffix == ".db":
+        from employee_registry import EmployeeRegistry
+        db = EmployeeRegistry(str(csv_path))
+        try:
+            return db.plate_registry()
+        finally:
+            db.close()
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        keys = reader.fieldnames or []
+        col = next((k for k in PLATE_COLUMNS if k in keys), None)
+        owner_col = next((k for k in OWNER_COLUMNS if k in keys), None)
+        if col is None:
+            print(f"[WARN] No plate column found. Columns in CSV: {keys}")
+            return registry
+
+        for row in reader:
+            plate = (row.get(col) or "").strip()
+            owner = (row.get(owner_col) or "").strip() if owner_col else ""
+            norm = normalize_plate_text(plate)
+            if norm:
+                registry[norm] = (plate.upper(), owner or None)
+    return registry
+
+def load_plate_map(csv_path: Path):
+    """
+    Load known plates from CSV. Accepts common column names.
+    Normalizes: uppercase, strips non-alphanumerics, applies substitution map.
+    """
+    return set(load_plate_registry(csv_path))
+
+def plate_candidates(results, conf_min=RECOGNITION_CONF_MIN):
+    """
+    Normalized candidate strings from raw OCR results [(bbox, text, conf), ...].
+    - Filters by min confidence
+    - Prefers tokens that look like plates
+    - Falls back to longest high-confidence token
+    """
+    cands, high_conf = [], []
+    for _, text, conf in results:
+        if conf is None or conf < conf_min:
+            continue
+        norm = normalize_plate_text(text)
+        if not norm:
+            continue
+        high_conf.append(norm)
+        if PLATE_TOKEN.fullmatch(norm):
+            cands.append(norm)
+    if not cands and high_conf:
+        cands.append(sorted(high_conf, key=len, reverse=True)[0])
+    return cands
+
+def plate_reads(results, conf_min=RECOGNITION_CONF_MIN):
+    """
+    Plate-shaped normalized tokens with their OCR confidence, [(text, conf), ...], most
+    confident first. Unlike plate_candidates there is no fallback to other tokens.
+    """
+    reads = []
+    for _, text, conf in results:
+        if conf is None or conf < conf_min:
+            continue
+        norm = normalize_plate_text(text)
+        if PLATE_TOKEN.fullmatch(norm):
+            reads.append((norm, float(conf)))
+    return sorted(reads, key=lambda r: r[1], reverse=True)
+
+def classify_plate(preds, known_plates, cutoff=FUZZY_CUTOFF):
+    """
+    Binary decision: 'known' if any candidate is an exact or fuzzy match; else 'unknown'.
+    `known_plates` should be a PlateIndex (a plain set is indexed on every call).
+    """
+    index = known_plates if isinstance(known_plates, PlateIndex) else PlateIndex(known_plates)
+    for p in preds:
+        plate, score, how = index.lookup(p, cutoff)
+        if how == "exact":
+            return "known", p, "exact"
+        if plate:
+            return "known", p, f"fuzzy→{plate} ({score:.2f})"
+    return "unknown", preds[0] if preds else "", "none"
+
+# =========================
+# OCR
+# =========================
+def make_reader(langs=OCR_LANGS, gpu=False):
+    import easyocr
+    return easyocr.Reader(list(langs), gpu=gpu, verbose=False)
+
+def read_text(reader, image, allowlist=None):
+    """
+    Raw OCR for one image (path or array) as JSON-friendly [(bbox, text, conf), ...] with
+    bbox = four [x, y] corners.
+    """
+    return [([[float(x), float(y)] for x, y in bbox], str(text), float(conf))
+            for bbox, text, conf in reader.readtext(image, detail=1, allowlist=allowlist)]
+
+# Process-pool worker: one reader per process, loaded once
+_reader = None
+
+def init_ocr_worker(langs=OCR_LANGS, torch_threads=1):
+    global _reader
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _reader = make_reader(langs)
+
+def ocr_file(path):
+    """Returns (results, status) with status 'ok' or 'error:<Type>'."""
+    try:
+        return read_text(_reader, path), "ok"
+    except Exception as e:
+        return None, f"error:{e.__class__.__name__}"
@@ -0,0 +1,211 @@
+# process_video.py
+# Offline batch processing of recorded footage with the headless recognition engine.
+# Emits the same known/unknown events (snapshots + event store, optionally CSV logs) as
+# the live GUI, as fast as the CPU allows.
+#
+#   python process_video.py gate3_2026-10-15.mp4                  # one process
+#   python process_video.py day/*.mp4 --workers 8 --skip 2        # chunked, 8 processes
+#
+# In parallel mode each file is cut into --chunk-seconds pieces and the pieces are spread
+# over a process pool. Every worker maps the same gallery store (shared pages, as long as
+# its rows are grouped by person - see FaceMatcher.set_gallery). Tracks restart at chunk
+# boundaries, so a person standing across a cut can produce one extra event.
+
+import os
+import sys
+import time
+import math
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from gallery_store import GALLERY_DIR
+from event_store import EventStore, EVENT_DB
+from recognition_engine import (
+    CameraProcessor, EventSink, RecognitionEvent, load_matcher, load_camera_config,
+    UNKNOWN_DIR, UNKNOWN_LOG_FILE, KNOWN_LOG_FILE, MATCH_INDEX, DETECT_EVERY_N, CAMERA_CONFIG_FILE,
+    MOTION_GATE, PLATE_OPTIONS,
+)
+
+# ===================================================
+# Configuration
+# ===================================================
+CHUNK_SECONDS = 300          # video seconds per parallel job
+DEFAULT_FPS = 25.0           # when the container doesn't report one
+
+# ===================================================
+# Helpers
+# ===================================================
+def video_info(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video {path}")
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    cap.release()
+    return frames, fps
+
+def recording_start(path, frames, fps, start=None):
+    """
+    Wall-clock time of frame 0: --start if given, else the file's mtime minus its
+    duration (recorders usually close the file when the recording ends).
+    """
+    if start:
+        return datetime.fromisoformat(start).timestamp()
+    return os.path.getmtime(path) - frames / fps
+
+def plan_jobs(paths, args):
+    camera_config = load_camera_config(args.config)
+    jobs = []
+    for path in paths:
+        frames, fps = video_info(path)
+        t0 = recording_start(path, frames, fps, args.start)
+        camera = os.path.splitext(os.path.basename(path))[0]
+        options = {"detect_every": args.detect_every, "refine_scale": args.refine_scale,
+                   "motion_gate": None if args.motion_gate == "off" else args.motion_gate}
+        options.update(camera_config.get(camera) or camera_config.get(path) or {})
+        options.pop("target_fps", None)   # offline runs go as fast as they can
+        for key in PLATE_OPTIONS:         # the live plate / dual-auth stages aren't part of offline re-scans
+            options.pop(key, None)
+        if args.workers > 1 and frames > 0:
+            chunk = max(1, int(args.chunk_seconds * fps))
+            bounds = [(s, min(frames, s + chunk)) for s in range(0, frames, chunk)]
+        else:
+            bounds = [(0, frames if frames > 0 else math.inf)]
+        for start, end in bounds:
+            jobs.append({"path": path, "camera": camera, "start": start, "end": end, "fps": fps,
+                         "t0": t0, "skip": args.skip, "gallery": args.gallery, "index": args.index,
+                         "unknown_dir": args.unknown_dir, "options": options})
+    return jobs
+
+# ===================================================
+# Worker
+# ===================================================
+_matcher = None
+
+def process_chunk(job):
+    """
+    Process frames [start, end) of one file. Unknown snapshots are written here; events
+    come back as plain tuples so the parent can store them in time order.
+    """
+    global _matcher
+    if _matcher is None:
+        _, _matcher = load_matcher(job["gallery"], index=job["index"])
+    sink = EventSink(job["unknown_dir"], unknown_log=None, known_log=None, plate_log=None, access_log=None)
+    processor = CameraProcessor(job["camera"], _matcher, annotate=False, **job["options"])
+
+    cap = cv2.VideoCapture(job["path"])
+    if job["start"]:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, job["start"])
+
+    t_start = time.perf_counter()
+    events, processed = [], 0
+    idx, skip, fps = job["start"], job["skip"], job["fps"]
+    while idx < job["end"]:
+        if (idx - job["start"]) % skip:
+            # grab() demuxes without decoding - skipped frames cost almost nothing
+            if not cap.grab():
+                break
+            idx += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        processed += 1
+        timestamp = job["t0"] + idx / fps
+        _, frame_events = processor.process(frame, processed, timestamp)
+        for e in frame_events:
+            filename = sink.save_snapshot(e) if e.kind == "unknown" else None
+            events.append((e.timestamp, e.camera, e.kind, e.name, e.distance, e.track_id, filename))
+        idx += 1
+    cap.release()
+    gate = processor.motion_gate
+    return {"path": job["path"], "frames": idx - job["start"], "processed": processed,
+            "seconds": time.perf_counter() - t_start, "events": events,
+            "gate_checks": gate.checks if gate else 0, "gate_skipped": gate.skipped if gate else 0}
+
+# ===================================================
+# Main
+# ===================================================
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Re-scan recorded video for known/unknown faces.")
+    ap.add_argument("videos", nargs="+")
+    ap.add_argument("--workers", type=int, default=1, help="processes; >1 enables chunked parallel mode")
+    ap.add_argument("--skip", type=int, default=1, help="process every Nth frame")
+    ap.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS)
+    ap.add_argument("--detect-every", type=int, default=DETECT_EVERY_N,
+                    help="full detection every N processed frames (tracking in between)")
+    ap.add_argument("--refine-scale", type=float, default=None,
+                    help="re-detect around tracks/motion at this scale (e.g. 1.0) for distant faces")
+    ap.add_argument("--config", default=CAMERA_CONFIG_FILE,
+                    help="per-camera options keyed by file name without extension (ROI masks, ...)")
+    ap.add_argument("--motion-gate", default=MOTION_GATE or "off", choices=("diff", "mog2", "off"),
+                    help="skip detection on static scenes")
+    ap.add_argument("--start", help="recording start time, ISO format (default: mtime - duration)")
+    ap.add_argument("--gallery", default=GALLERY_DIR)
+    ap.add_argument("--index", default=MATCH_INDEX)
+    ap.add_argument("--unknown-dir", default=UNKNOWN_DIR)
+    ap.add_argument("--db", default=EVENT_DB, help="event store (SQLite)")
+    ap.add_argument("--csv", action="store_true", help="also append the legacy CSV logs")
+    ap.add_argument("--unknown-log", default=UNKNOWN_LOG_FILE)
+    ap.add_argument("--known-log", default=KNOWN_LOG_FILE)
+    args = ap.parse_args(argv)
+    args.skip = max(1, args.skip)
+    args.workers = max(1, args.workers)
+
+    missing = [p for p in args.videos if not os.path.isfile(p)]
+    if missing:
+        sys.exit(f"[ERROR] Video not found: {', '.join(missing)}")
+
+    jobs = plan_jobs(args.videos, args)
+    video_seconds = sum((j["end"] - j["start"]) / j["fps"] for j in jobs if j["end"] != math.inf)
+    print(f"[INFO] {len(args.videos)} video(s), {len(jobs)} job(s), {args.workers} worker(s), "
+          f"skip={args.skip}")
+
+    wall = time.perf_counter()
+    results = []
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for i, res in enumerate(pool.map(process_chunk, jobs), 1):
+                results.append(res)
+                print(f"[INFO] {i}/{len(jobs)} {os.path.basename(res['path'])}: "
+                      f"{res['processed']} frames in {res['seconds']:.1f}s, {len(res['events'])} events")
+    else:
+        for job in jobs:
+            res = process_chunk(job)
+            results.append(res)
+            print(f"[INFO] {os.path.basename(res['path'])}: {res['processed']} frames in "
+                  f"{res['seconds']:.1f}s, {len(res['events'])} events")
+    wall = time.perf_counter() - wall
+
+    # Same records as the live GUI, written once, in time order
+    events = sorted(e for res in results for e in res["events"])
+    records = [(RecognitionEvent(camera, kind, name, distance, track_id, timestamp), filename)
+               for timestamp, camera, kind, name, distance, track_id, filename in events]
+    store = EventStore(args.db)
+    store.insert_many(records)
+    store.close()
+    sink = (EventSink(args.unknown_dir, args.unknown_log, args.known_log, plate_log=None, access_log=None)
+            if args.csv else None)
+    for event, filename in records:
+        if sink is not None:
+            sink.log(event, filename)
+        print(f"[EVENT] {event.datetime:%Y-%m-%d %H:%M:%S} {event.camera} {event.kind} {event.name}"
+              + (f" -> {filename}" if filename else ""))
+
+    frames = sum(r["frames"] for r in results)
+    processed = sum(r["processed"] for r in results)
+    known = sum(1 for e in events if e[2] == "known")
+    print(f"\n[INFO] {frames} frames ({processed} processed) in {wall:.1f}s "
+          f"= {frames / wall if wall else 0:.1f} fps"
+          + (f", {video_seconds / wall:.1f}x real time" if wall and video_seconds else ""))
+    print(f"[INFO] Events: {known} known, {len(events) - known} unknown")
+    checks = sum(r["gate_checks"] for r in results)
+    if checks:
+        skipped = sum(r["gate_skipped"] for r in results)
+        print(f"[INFO] Motion gate skipped {skipped}/{checks} due detections ({100.0 * skipped / checks:.1f}%)")
+
+if __name__ == "__main__":
+    main()
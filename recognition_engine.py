@@ -0,0 +1,415 @@
+# recognition_engine.py
+# Headless recognition engine: detector, encoder, matcher and event sink, plus the
+# per-camera state that ties them together. Driven by enhanced_gui.py (live),
+# multi_camera.py (headless live) and process_video.py (offline footage).
+
+import os
+import csv
+import json
+import time
+import threading
+from datetime import datetime
+
+import cv2
+import face_recognition
+
+from gallery_store import open_gallery, GALLERY_DIR
+from event_store import UNKNOWN_LOG_FILE, KNOWN_LOG_FILE
+from face_matcher import FaceMatcher, UNKNOWN
+from face_tracker import FaceTracker, IdentityCache, iou
+from unknown_cache import UnknownFaceCache
+from motion_gate import MotionGate
+from adaptive_detection import (
+    AdaptiveScale, RoiMask, motion_regions, refine_regions, crop_scale, scale_box, offset_box,
+)
+
+# ===================================================
+# Configuration
+# ===================================================
+DETECTION_SCALE = 0.25       # detection runs on a frame shrunk by this factor
+DETECT_EVERY_N = 5           # full detection + encoding every N frames, tracking in between
+TRACK_MIN_CONFIDENCE = 0.6
+REVERIFY_SECONDS = 10.0
+UNKNOWN_COOLDOWN_SECONDS = 5
+MATCH_TOLERANCE = 0.6
+MATCH_INDEX = "brute"        # "ivf" for galleries of 10^5+ encodings (see face_index.py)
+MOTION_GATE = "diff"         # "diff" | "mog2" | None: skip detection on static, empty scenes
+
+UNKNOWN_DIR = "Unknown_faces"
+PLATE_LOG_FILE = "plate_log.csv"
+ACCESS_LOG_FILE = "access_log.csv"
+CAMERA_CONFIG_FILE = "cameras.json"
+CAMERA_OPTIONS = ("roi", "target_fps", "refine_scale", "detect_every", "motion_gate", "plates", "plate_roi", "lane")
+PLATE_OPTIONS = ("plates", "plate_roi", "lane")   # read by the plate / dual-auth stages, not CameraProcessor
+
+def load_matcher(gallery_dir=GALLERY_DIR, tolerance=MATCH_TOLERANCE, index=MATCH_INDEX):
+    """Open the gallery store and wrap it in a FaceMatcher. Returns (gallery, matcher)."""
+    gallery = open_gallery(gallery_dir)
+    return gallery, FaceMatcher(gallery, tolerance=tolerance, aggregate="min", index=index)
+
+def load_camera_config(path=CAMERA_CONFIG_FILE):
+    """
+    Per-camera CameraProcessor options, keyed by camera id ("cam0") or source, e.g.
+
+        {"cam0": {"roi": [[[0, 0.35], [1, 0.35], [1, 1], [0, 1]]], "target_fps": 15},
+         "rtsp://127.0.0.1:8554/gate3": {"refine_scale": 1.0, "plates": true, "lane": "gate3",
+                                          "plate_roi": [[[0.2, 0.5], [0.8, 0.5], [0.8, 1], [0.2, 1]]]}}
+
+    ROI polygons ("roi" for faces, "plate_roi" for the vehicle lane) are (x, y) points
+    normalized to the frame size. Cameras with the same "lane" (e.g. a plate camera and a
+    driver camera at one gate) are fused by dual_auth.py. A missing file means no
+    per-camera options.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        raw = json.load(f)
+    config = {}
+    for camera, options in raw.items():
+        unsupported = set(options) - set(CAMERA_OPTIONS)
+        if unsupported:
+            raise ValueError(f"{path}: unsupported option(s) for {camera}: {', '.join(sorted(unsupported))}")
+        options = dict(options)
+        for key in ("roi", "plate_roi"):
+            if options.get(key):
+                options[key] = RoiMask(options[key])
+        config[str(camera)] = options
+    return config
+
+# ===================================================
+# Detector / Encoder
+# ===================================================
+class FaceDetector:
+    """HOG (or CNN) face detection on a downscaled RGB frame."""
+
+    def __init__(self, scale=DETECTION_SCALE, model="hog", upsample=1):
+        self.scale = scale
+        self.model = model
+        self.upsample = upsample
+
+    def detect(self, rgb_small_frame):
+        return face_recognition.face_locations(rgb_small_frame, self.upsample, self.model)
+
+class FaceEncoder:
+    """128-d dlib encodings for given (top, right, bottom, left) boxes."""
+
+    def __init__(self, num_jitters=1):
+        self.num_jitters = num_jitters
+
+    def encode(self, rgb_small_frame, boxes):
+        if not boxes:
+            return []
+        return face_recognition.face_encodings(rgb_small_frame, boxes, self.num_jitters)
+
+# ===================================================
+# Events
+# ===================================================
+class RecognitionEvent:
+    """One recognition decision for one track (not one frame)."""
+
+    def __init__(self, camera, kind, name, distance, track_id, timestamp, frame=None, detail=None):
+        self.camera = camera
+        self.kind = kind              # "known" | "unknown" | "plate"
+        self.name = name              # identity, or the plate for "plate" events
+        self.distance = distance
+        self.track_id = track_id
+        self.timestamp = timestamp
+        self.frame = frame            # full-resolution BGR frame (unknown events only)
+        self.detail = detail          # kind-specific dict, stored as JSON in the event store
+
+    @property
+    def datetime(self):
+        return datetime.fromtimestamp(self.timestamp)
+
+    def __repr__(self):
+        return (f"RecognitionEvent({self.camera!r}, {self.kind}, {self.name!r}, "
+                f"track={self.track_id}, d={self.distance:.3f})")
+
+class EventSink:
+    """
+    Persists events exactly like the original GUI: unknown faces get a full-frame JPEG in
+    UNKNOWN_DIR and a row in unknown_faces_log.csv; known faces get a row in
+    known_faces_log.csv; plate reads a row in plate_log.csv and dual-auth decisions a row in
+    access_log.csv. Thread-safe, so several
+    inference workers can share one sink.
+    """
+
+    def __init__(self, unknown_dir=UNKNOWN_DIR, unknown_log=UNKNOWN_LOG_FILE, known_log=KNOWN_LOG_FILE,
+                 plate_log=PLATE_LOG_FILE, access_log=ACCESS_LOG_FILE):
+        self.unknown_dir = unknown_dir
+        self.unknown_log = unknown_log
+        self.known_log = known_log
+        self.plate_log = plate_log
+        self.access_log = access_log
+        self._lock = threading.Lock()
+        os.makedirs(unknown_dir, exist_ok=True)
+        self._ensure_header(unknown_log, ["Date", "Time", "Saved Image Name"])
+        self._ensure_header(known_log, ["Date", "Time", "Name", "Camera"])
+        self._ensure_header(plate_log, ["Date", "Time", "Plate", "Owner", "Camera", "Read", "Score"])
+        self._ensure_header(access_log, ["Date", "Time", "Decision", "Plate", "Owner", "Driver", "Lane", "Latency"])
+
+    @staticmethod
+    def _ensure_header(path, header):
+        if path and not os.path.exists(path):
+            with open(path, mode='w', newline='') as file:
+                csv.writer(file).writerow(header)
+
+    def snapshot_name(self, event):
+        return f"unknown_{event.datetime:%Y%m%d_%H%M%S}_{event.camera}_{event.track_id}.jpg"
+
+    def save_snapshot(self, event):
+        filename = self.snapshot_name(event)
+        cv2.imwrite(os.path.join(self.unknown_dir, filename), event.frame)
+        return filename
+
+    def row(self, event, filename=None):
+        """(log path, CSV row) for one event; path is None when that log is disabled."""
+        dt = event.datetime
+        if event.kind == "unknown":
+            return self.unknown_log, [dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S"), filename]
+        if event.kind == "plate":
+            detail = event.detail or {}
+            return self.plate_log, [dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S"), event.name,
+                                    detail.get("owner"), event.camera, detail.get("read"), detail.get("score")]
+        if event.kind == "access":
+            detail = event.detail or {}
+            return self.access_log, [dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S"), event.name,
+                                     detail.get("plate"), detail.get("owner"), detail.get("driver"), event.camera,
+                                     detail.get("latency_s")]
+        return self.known_log, [dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S"), event.name, event.camera]
+
+    def append_rows(self, path, rows, fsync=False):
+        with self._lock, open(path, mode='a', newline='') as file:
+            csv.writer(file).writerows(rows)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+
+    def log(self, event, filename=None):
+        path, row = self.row(event, filename)
+        if path:
+            self.append_rows(path, [row])
+
+    def __call__(self, event):
+        """Save + log one event. Returns the snapshot filename for unknowns, else None."""
+        filename = self.save_snapshot(event) if event.kind == "unknown" else None
+        self.log(event, filename)
+        return filename
+
+# ===================================================
+# Per-camera processing
+# ===================================================
+class CameraProcessor:
+    """
+    Everything that is per camera: tracker, identity votes, unknown-face dedup and
+    counters. The FaceMatcher is shared, so the gallery is held once however many
+    cameras run. Not thread-safe: one frame of a given camera at a time.
+
+    Tracking and drawing always use the detector's scale. Detection itself can run at
+    a different resolution:
+      target_fps   - AdaptiveScale picks the detection scale from measured latency
+      refine_scale - re-detect at this (higher) scale inside prior-track / motion regions
+                     no detection covered, so distant faces aren't lost
+      roi          - RoiMask; only the area inside its polygons is analysed
+
+    With a motion gate, a detection that is due while nothing is tracked only runs if the
+    scene moved (or the gate's keep-alive is due).
+    """
+
+    def __init__(self, camera, matcher, detector=None, encoder=None, detect_every=DETECT_EVERY_N,
+                 track_min_confidence=TRACK_MIN_CONFIDENCE, reverify_seconds=REVERIFY_SECONDS,
+                 cooldown_seconds=UNKNOWN_COOLDOWN_SECONDS, unknown_cache=None, annotate=True,
+                 target_fps=None, refine_scale=None, roi=None, motion_gate=MOTION_GATE):
+        self.camera = camera
+        self.annotate = annotate          # draw boxes/names onto the frame itself (live preview draws its own)
+        self.matcher = matcher
+        self.next_matcher = matcher       # see set_matcher
+        self.matcher_swaps = 0
+        self.detector = detector or FaceDetector()
+        self.encoder = encoder or FaceEncoder()
+        self.scale = self.detector.scale  # tracking / drawing scale
+        self.scaler = AdaptiveScale(target_fps, initial=self.scale) if target_fps else None
+        self.refine_scale = refine_scale
+        self.roi = roi
+        self.motion_gate = MotionGate(motion_gate, roi=roi) if motion_gate else None
+        self._prev_gray = None
+        self.faces = []                   # [(full-frame box, name)] after the last process()
+        self.refined = 0
+        self.detect_ms = 0.0              # EMA cost of a detection frame (for gate savings)
+        self.cooldown_seconds = cooldown_seconds
+        self.tracker = FaceTracker(detect_every=detect_every, min_confidence=track_min_confidence)
+        self.identity_cache = IdentityCache(reverify_seconds=reverify_seconds, unknown_name=UNKNOWN)
+        self.unknown_cache = unknown_cache or UnknownFaceCache()
+        self.last_unknown_time = 0
+        self.known_count = 0
+        self.unknown_count = 0
+
+    def set_matcher(self, matcher):
+        """
+        Serve `matcher` from the next frame on. Safe to call from any thread: the swap
+        itself happens on the inference thread between two frames, so a frame is always
+        matched against one gallery, and the matcher being replaced is never mutated.
+        """
+        self.next_matcher = matcher
+
+    def reset(self):
+        self.tracker.reset()
+        self.identity_cache.reset()
+        self.unknown_cache.clear()
+        self.last_unknown_time = 0
+        self.known_count = self.unknown_count = 0
+        self._prev_gray = None
+        self.refined = 0
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+
+    def stats(self):
+        stats = {"tracker": self.tracker.stats(), "identity": self.identity_cache.stats(),
+                 "unknown_cache": self.unknown_cache.stats()}
+        if self.scaler is not None:
+            stats["adaptive"] = self.scaler.stats()
+        if self.refine_scale:
+            stats["refined"] = self.refined
+        if self.motion_gate is not None:
+            gate = stats["motion_gate"] = self.motion_gate.stats()
+            # Without the gate those frames would have cost a detection every detect_every frames
+            gate["est_saved_s"] = round(gate["skipped"] / self.tracker.detect_every * self.detect_ms / 1000.0, 1)
+        return stats
+
+    @staticmethod
+    def _rgb_at(frame, scale):
+        if scale != 1.0:
+            frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def _detect(self, rgb_frame, detect_scale):
+        """Detect inside the ROI; boxes are returned in tracking coordinates."""
+        dy = dx = 0
+        if self.roi is not None:
+            rgb_frame, (dy, dx) = self.roi.apply(rgb_frame)
+            if not rgb_frame.size:
+                return []
+        f = self.scale / detect_scale
+        return [scale_box(offset_box(box, dy, dx), f) for box in self.detector.detect(rgb_frame)]
+
+    def _refine(self, frame, prev_gray, gray, detected, detect_scale):
+        """
+        Re-detect at refine_scale inside full-resolution crops around prior tracks and
+        moving areas that the detection pass left uncovered. Returns extra tracking boxes.
+        """
+        candidates = [t.box for t in self.tracker.tracks] + motion_regions(prev_gray, gray)
+        if self.roi is not None:
+            candidates = [b for b in candidates if self.roi.contains(b, gray.shape)]
+        found = []
+        for region in refine_regions(candidates, detected, gray.shape):
+            top, right, bottom, left = region_full = scale_box(region, 1.0 / self.scale)
+            s = crop_scale(region_full, self.refine_scale)
+            if s <= detect_scale:
+                continue
+            for box in self.detector.detect(self._rgb_at(frame[top:bottom, left:right], s)):
+                box = scale_box(offset_box(scale_box(box, 1.0 / s), top, left), self.scale)
+                if all(iou(box, d) < self.tracker.iou_match for d in detected + found):
+                    found.append(box)
+        self.refined += len(found)
+        return found
+
+    def process(self, frame, frame_no, timestamp=None):
+        """
+        Run detection/tracking/recognition on one BGR frame. Returns (frame,
+        [RecognitionEvent, ...]); the frame's faces are left in `self.faces` (and drawn onto
+        `frame` when annotate is set).
+        """
+        started = time.perf_counter()
+        timestamp = time.time() if timestamp is None else timestamp
+        matcher = self.next_matcher
+        if matcher is not self.matcher:
+            # New gallery: re-check everyone currently tracked against it
+            self.matcher = matcher
+            self.identity_cache.expire()
+            self.matcher_swaps += 1
+        small_frame = cv2.resize(frame, (0, 0), fx=self.scale, fy=self.scale)
+        gray_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+        prev_gray, self._prev_gray = self._prev_gray, gray_small_frame
+        if self.motion_gate is not None:
+            self.motion_gate.observe(frame)
+
+        if not self.tracker.needs_detection(frame_no):
+            # In-between frame: carry tracked faces forward, no HOG / dlib work
+            self._set_faces(frame, self.tracker.propagate(gray_small_frame))
+            if self.scaler is not None:
+                self.scaler.observe(time.perf_counter() - started, decide=False)
+            return frame, []
+
+        if self.motion_gate is not None and not self.motion_gate.allow(timestamp, active=bool(self.tracker.tracks)):
+            # Nobody tracked and nothing moving: skip HOG / dlib entirely
+            self.faces = []
+            return frame, []
+
+        detect_scale = self.scaler.scale if self.scaler is not None else self.scale
+        rgb_detect = (cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB) if detect_scale == self.scale
+                      else self._rgb_at(frame, detect_scale))
+        face_locations = self._detect(rgb_detect, detect_scale)
+        refined = (self._refine(frame, prev_gray, gray_small_frame, face_locations, detect_scale)
+                   if self.refine_scale else [])
+        tracks = self.tracker.update(gray_small_frame, face_locations + refined, frame_no)
+        self.identity_cache.prune(tracks)
+
+        # Only encode tracks whose identity isn't settled (or is due for re-verification);
+        # tracks the detector just missed keep their identity but aren't re-encoded.
+        # Encode at the highest resolution detection used this frame.
+        to_encode = [t for t in tracks if not t.missed and self.identity_cache.needs_encoding(t, timestamp)]
+        encode_scale = max(detect_scale, self.refine_scale) if refined else detect_scale
+        rgb_encode = rgb_detect if encode_scale == detect_scale else self._rgb_at(frame, encode_scale)
+        f = encode_scale / self.scale
+        face_encodings = self.encoder.encode(rgb_encode, [scale_box(t.box, f) for t in to_encode])
+
+        # One batched distance computation for every face in the frame
+        identities = self.matcher.identify(face_encodings) if face_encodings else []
+
+        events = []
+        for track, face_encoding, (name, distance) in zip(to_encode, face_encodings, identities):
+            confirmed = self.identity_cache.observe(track, name, distance, face_encoding, timestamp)
+            if confirmed is None:
+                continue
+
+            # Events fire once per track (and again only if its identity changes)
+            if confirmed != UNKNOWN:
+                self.known_count += 1
+                events.append(RecognitionEvent(self.camera, "known", confirmed, distance,
+                                               track.id, timestamp))
+                continue
+
+            is_new = not self.unknown_cache.seen(face_encoding, timestamp)
+            if is_new and timestamp - self.last_unknown_time <= self.cooldown_seconds:
+                self.identity_cache.retry(track)   # rate-limited; try again on a later detection
+            elif is_new:
+                self.unknown_cache.add(face_encoding, timestamp)
+                self.last_unknown_time = timestamp
+                self.unknown_count += 1
+                events.append(RecognitionEvent(self.camera, "unknown", UNKNOWN, distance,
+                                               track.id, timestamp, frame.copy()))
+
+        for track in tracks:
+            identity = self.identity_cache.get(track)
+            track.name = identity.name if identity else None
+        self._set_faces(frame, tracks)
+
+        elapsed = time.perf_counter() - started
+        self.detect_ms = 1000.0 * elapsed if not self.detect_ms else 0.9 * self.detect_ms + 100.0 * elapsed
+        if self.scaler is not None:
+            self.scaler.observe(elapsed)
+        return frame, events
+
+    def _set_faces(self, frame, tracks):
+        self.faces = [(scale_box(t.box, 1.0 / self.scale), t.name) for t in tracks]
+        if self.annotate:
+            draw_faces(frame, self.faces)
+
+def draw_faces(image, faces, scale=1.0):
+    """Box + name for each (full-frame box, name), drawn on an image resized by `scale`."""
+    thickness = 2 if scale > 0.5 else 1
+    for box, name in faces:
+        top, right, bottom, left = (int(v * scale) for v in box)
+        cv2.rectangle(image, (left, top), (right, bottom), (0, 255, 0), thickness)
+        cv2.putText(image, name or "", (left, top - max(4, int(10 * scale))), cv2.FONT_HERSHEY_SIMPLEX,
+                    max(0.4, 0.75 * scale), (0, 255, 0), thickness)
@@ -1,19 +1,30 @@
 # test_face_accuracy.py
+#
+# Encodes the test set once (process pool, cached by file hash), computes every test
+# face's nearest gallery match in one vectorized pass, then sweeps the threshold:
+#
+#   python test_face_accuracy.py                     # report at THRESHOLD + sweep, ROC/DET plots
+#   python test_face_accuracy.py --threshold 0.5 --no-plots
+#
+# Re-runs only encode new or changed test images, so tuning the threshold takes seconds.
 import os
-import pickle
+import time
+import argparse
 import numpy as np
-import face_recognition
 from pathlib import Path
-from sklearn.metrics import confusion_matrix, classification_report
-import matplotlib.pyplot as plt
-import seaborn as sns
+from concurrent.futures import ProcessPoolExecutor
+
+from gallery_store import open_gallery
+from generate_encodings import encode_image, _init_worker, atomic_write_bytes, CHUNK_SIZE
+from face_index import euclidean_distances
 
 # ----------------------------
 # Config
 # ----------------------------
-ENCODINGS_FILE = "encodings.pkl"
+GALLERY_DIR = "gallery"
 TEST_KNOWN_DIR = Path("test_faces/known")
 TEST_UNKNOWN_DIR = Path("test_faces/unknown")
+CACHE_FILE = "test_faces/.encodings_cache.npz"   # sha1 -> encoding of every test image seen
 
 # Lower threshold = stricter match (typical range ~0.4–0.6)
 THRESHOLD = 0.55
@@ -22,6 +33,11 @@ THRESHOLD = 0.55
 # If False, treat "No Face Detected" as a misclassification for its class
 SKIP_NO_FACE = True
 
+# Threshold sweep
+SWEEP_STEP = 0.001
+TARGET_FAR = 0.01            # recommended threshold: best identification with FAR <= this
+QUERY_CHUNK = 2048           # test faces per distance block (bounds memory on big galleries)
+
 VALID_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".jfif"}
 
 # ----------------------------
@@ -37,104 +53,158 @@ def list_images_recursive(root: Path):
                 files.append(str(Path(dp) / f))
     return sorted(files)
 
-def load_encodings(enc_path: str):
-    with open(enc_path, "rb") as f:
-        encs, names = pickle.load(f)
-    return np.array(encs), np.array(names)
+def person_of(path: str, root: Path):
+    """test_faces/known/<person>/... -> person."""
+    return Path(path).relative_to(root).parts[0]
 
-def recognize_face(image_path: str, known_encodings: np.ndarray, known_names: np.ndarray):
-    try:
-        image = face_recognition.load_image_file(image_path)
-        encodings = face_recognition.face_encodings(image)
-        if len(encodings) == 0:
-            return "No Face Detected"
-        encoding = encodings[0]
-        distances = face_recognition.face_distance(known_encodings, encoding)
-        min_idx = int(np.argmin(distances))
-        min_distance = float(distances[min_idx])
-        if min_distance < THRESHOLD:
-            return str(known_names[min_idx])
-        else:
-            return "Unknown"
-    except Exception as e:
-        return f"ERROR::{e.__class__.__name__}"
+def load_encodings(gallery_dir: str):
+    gallery = open_gallery(gallery_dir)
+    return gallery.encodings, np.array(gallery.names)[gallery.identities]
 
 # ----------------------------
-# Load encodings
+# Encoding cache
 # ----------------------------
-known_encodings, known_names = load_encodings(ENCODINGS_FILE)
+def load_cache(path: str):
+    """{sha1: encoding or None (no face)} from a previous run."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        data = np.load(path)
+        return {h: (e if ok else None) for h, e, ok in zip(data["sha1"], data["encodings"], data["has_face"])}
+    except Exception as e:
+        print(f"[WARN] Ignoring unreadable cache {path} ({e})")
+        return {}
 
-# ----------------------------
-# Collect test images
-# ----------------------------
-known_imgs = list_images_recursive(TEST_KNOWN_DIR)
-unknown_imgs = list_images_recursive(TEST_UNKNOWN_DIR)
-print(f"\nFound {len(known_imgs)} known test images and {len(unknown_imgs)} unknown test images.")
+def save_cache(path: str, cache: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    hashes = sorted(cache)
+    encodings = np.zeros((len(hashes), 128), np.float32)
+    has_face = np.zeros(len(hashes), bool)
+    for i, h in enumerate(hashes):
+        if cache[h] is not None:
+            encodings[i] = cache[h]
+            has_face[i] = True
+    tmp = f"{path}.tmp.npz"
+    np.savez(tmp, sha1=np.array(hashes), encodings=encodings, has_face=has_face)
+    with open(tmp, "rb") as f:
+        atomic_write_bytes(path, f.read())
+    os.remove(tmp)
+
+def encode_test_set(paths, cache_file=CACHE_FILE, workers=None):
+    """
+    Returns (encodings, status) aligned with `paths`: encoding or None, and one of
+    'ok' | 'no_face' | 'error:<Type>'. Only images whose content hash isn't cached
+    are decoded and run through dlib.
+    """
+    cache = load_cache(cache_file) if cache_file else {}
+    encodings, status = [None] * len(paths), [None] * len(paths)
+    new = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(frozenset(cache),)) as pool:
+        for i, (sha1, enc, st) in enumerate(pool.map(encode_image, paths, chunksize=CHUNK_SIZE)):
+            if st.startswith("error:"):
+                status[i] = st
+                continue
+            if st == "reused":
+                enc = cache[sha1]
+            else:
+                cache[sha1] = enc
+                new += 1
+            encodings[i] = enc
+            status[i] = "ok" if enc is not None else "no_face"
+    if cache_file and new:
+        save_cache(cache_file, cache)
+    print(f"[INFO] {len(paths) - new} test images from cache, {new} encoded.")
+    return encodings, status
 
 # ----------------------------
-# Evaluation
+# Matching + sweep
 # ----------------------------
-y_true, y_pred = [], []
-known_correct = known_total = 0
-unknown_correct = unknown_total = 0
-skipped = errors = 0
-
-print("\n=== Testing Known Faces ===")
-for path in known_imgs:
-    res = recognize_face(path, known_encodings, known_names)
-    base = os.path.basename(path)
-    if res == "No Face Detected" and SKIP_NO_FACE:
-        skipped += 1
-        continue
-    if res.startswith("ERROR::") and SKIP_NO_FACE:
-        errors += 1
-        continue
-
-    print(f"[Known] {base} -> {res}")
-    known_total += 1
-    if res != "Unknown" and not res.startswith("ERROR::"):
-        known_correct += 1
-        y_pred.append("known")
-    else:
-        y_pred.append("unknown")
-    y_true.append("known")
-
-print("\n=== Testing Unknown Faces ===")
-for path in unknown_imgs:
-    res = recognize_face(path, known_encodings, known_names)
-    base = os.path.basename(path)
-    if res == "No Face Detected" and SKIP_NO_FACE:
-        skipped += 1
-        continue
-    if res.startswith("ERROR::") and SKIP_NO_FACE:
-        errors += 1
-        continue
-
-    print(f"[Unknown] {base} -> {res}")
-    unknown_total += 1
-    if res == "Unknown":
-        unknown_correct += 1
-        y_pred.append("unknown")
-    else:
-        y_pred.append("known")
-    y_true.append("unknown")
+def nearest_matches(queries: np.ndarray, gallery: np.ndarray, names: np.ndarray, chunk=QUERY_CHUNK):
+    """(min distance, name of the nearest gallery row) for every query row."""
+    g_sq = np.einsum("ij,ij->i", gallery, gallery)
+    best_d = np.empty(len(queries), np.float32)
+    best_i = np.empty(len(queries), np.int64)
+    for s in range(0, len(queries), chunk):
+        d = euclidean_distances(queries[s:s + chunk], gallery, g_sq)
+        best_i[s:s + chunk] = np.argmin(d, axis=1)
+        best_d[s:s + chunk] = d[np.arange(len(d)), best_i[s:s + chunk]]
+    return best_d, names[best_i]
+
+def sweep(known_d, known_ok, unknown_d, thresholds):
+    """
+    Vectorized rates for every threshold (match = distance <= t):
+      tar - known faces accepted (any identity)      frr = 1 - tar
+      dir - known faces accepted as the right person
+      far - unknown faces accepted
+    """
+    k_sorted = np.sort(known_d)
+    kc_sorted = np.sort(known_d[known_ok])
+    u_sorted = np.sort(unknown_d)
+    n_k, n_u = max(1, len(k_sorted)), max(1, len(u_sorted))
+    tar = np.searchsorted(k_sorted, thresholds, side="right") / n_k
+    dir_ = np.searchsorted(kc_sorted, thresholds, side="right") / n_k
+    far = np.searchsorted(u_sorted, thresholds, side="right") / n_u
+    return {"threshold": thresholds, "tar": tar, "frr": 1 - tar, "dir": dir_, "far": far}
+
+def middle(indices):
+    return int(indices[len(indices) // 2])
+
+def operating_points(curve, target_far=TARGET_FAR):
+    frr, far, t = curve["frr"], curve["far"], curve["threshold"]
+    # Ties (flat stretches of the curves) resolve to the middle of the stretch, not its edge
+    gap = np.abs(frr - far)
+    eer_i = middle(np.nonzero(gap == gap.min())[0])
+    ok = np.nonzero(far <= target_far)[0]
+    rec_i = middle(ok[curve["dir"][ok] == curve["dir"][ok].max()]) if len(ok) else 0
+    # ROC AUC (TAR vs FAR, trapezoids); thresholds ascending -> FAR ascending
+    auc = float(np.sum(np.diff(far) * (curve["tar"][1:] + curve["tar"][:-1]) / 2))
+    return {"eer": (frr[eer_i] + far[eer_i]) / 2, "eer_threshold": t[eer_i],
+            "recommended": t[rec_i], "rec_dir": curve["dir"][rec_i], "rec_far": far[rec_i], "auc": auc}
 
 def pct(n, d):
     return (100.0 * n / d) if d else 0.0
 
-known_acc = pct(known_correct, known_total)
-unknown_acc = pct(unknown_correct, unknown_total)
-overall_acc = pct(known_correct + unknown_correct, known_total + unknown_total)
+# ----------------------------
+# Report
+# ----------------------------
+def report_at(threshold, known_d, known_ok, unknown_d, skipped):
+    known_acc_n = int(np.sum(known_d <= threshold))
+    ident_n = int(np.sum((known_d <= threshold) & known_ok))
+    unknown_n = int(np.sum(unknown_d > threshold))
+    known_total, unknown_total = len(known_d), len(unknown_d)
+
+    print(f"\n=== Face Recognition Accuracy Results (threshold {threshold:.3f}) ===")
+    print(f"Known Faces Accuracy   : {pct(known_acc_n, known_total):.2f}% ({known_acc_n}/{known_total})")
+    print(f"  ...as the right person: {pct(ident_n, known_total):.2f}% ({ident_n}/{known_total})")
+    print(f"Unknown Faces Accuracy : {pct(unknown_n, unknown_total):.2f}% ({unknown_n}/{unknown_total})")
+    print(f"Overall Accuracy       : {pct(known_acc_n + unknown_n, known_total + unknown_total):.2f}%")
+    if SKIP_NO_FACE:
+        print(f"Skipped (no face / read error): {skipped} images")
 
-print("\n=== Face Recognition Accuracy Results ===")
-print(f"Known Faces Accuracy   : {known_acc:.2f}% ({known_correct}/{known_total})")
-print(f"Unknown Faces Accuracy : {unknown_acc:.2f}% ({unknown_correct}/{unknown_total})")
-print(f"Overall Accuracy       : {overall_acc:.2f}%")
-if SKIP_NO_FACE:
-    print(f"Skipped (no face / read error): {skipped + errors} images")
+    y_true = ["known"] * known_total + ["unknown"] * unknown_total
+    y_pred = (["known" if d <= threshold else "unknown" for d in known_d] +
+              ["known" if d <= threshold else "unknown" for d in unknown_d])
+    return y_true, y_pred
+
+def print_sweep(curve, points):
+    print("\n=== Threshold Sweep ===")
+    print(f"{'thresh':>7} {'TAR':>7} {'DIR':>7} {'FAR':>7} {'FRR':>7}")
+    for t in np.arange(0.40, 0.701, 0.025):
+        i = min(int(np.searchsorted(curve["threshold"], t - 1e-9)), len(curve["threshold"]) - 1)
+        print(f"{curve['threshold'][i]:7.3f} {100 * curve['tar'][i]:6.2f}% {100 * curve['dir'][i]:6.2f}% "
+              f"{100 * curve['far'][i]:6.2f}% {100 * curve['frr'][i]:6.2f}%")
+    print(f"\nROC AUC: {points['auc']:.4f}")
+    print(f"EER: {100 * points['eer']:.2f}% at threshold {points['eer_threshold']:.3f}")
+    print(f"Recommended threshold (FAR <= {100 * TARGET_FAR:g}%): {points['recommended']:.3f} "
+          f"-> identification {100 * points['rec_dir']:.2f}%, FAR {100 * points['rec_far']:.2f}%")
+    print("(TAR: known accepted, DIR: known accepted as the right person, FAR: unknown accepted)")
+
+def plot_results(y_true, y_pred, curve, points):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from sklearn.metrics import confusion_matrix
 
-# Confusion Matrix + Report
-if y_true and y_pred:
     cm = confusion_matrix(y_true, y_pred, labels=["known", "unknown"])
     plt.figure()
     sns.heatmap(cm, annot=True, fmt='d', cmap="Blues",
@@ -144,10 +214,93 @@ if y_true and y_pred:
     plt.xlabel("Prediction")
     plt.ylabel("Actual")
     plt.tight_layout()
+
+    fig, (roc, det) = plt.subplots(1, 2, figsize=(11, 4.5))
+    roc.plot(curve["far"], curve["tar"], label="TAR (any identity)")
+    roc.plot(curve["far"], curve["dir"], label="DIR (right person)")
+    roc.axvline(points["rec_far"], color="gray", ls="--", lw=0.8)
+    roc.set_xlabel("False accept rate (unknowns)")
+    roc.set_ylabel("Accept rate (knowns)")
+    roc.set_title(f"ROC (AUC {points['auc']:.3f})")
+    roc.legend(loc="lower right")
+    eps = 1e-4
+    det.loglog(np.maximum(curve["far"], eps), np.maximum(curve["frr"], eps))
+    det.plot([points["eer"]], [points["eer"]], "o", label=f"EER {100 * points['eer']:.2f}% @ {points['eer_threshold']:.3f}")
+    det.set_xlabel("False accept rate")
+    det.set_ylabel("False reject rate")
+    det.set_title("DET")
+    det.legend(loc="upper right")
+    plt.tight_layout()
     plt.show()
 
+# ----------------------------
+# Main
+# ----------------------------
+def main():
+    ap = argparse.ArgumentParser(description="Evaluate face recognition on test_faces/ with a threshold sweep.")
+    ap.add_argument("--gallery", default=GALLERY_DIR)
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--workers", type=int, default=None, help="encoding processes (default: CPU count)")
+    ap.add_argument("--no-cache", action="store_true", help="re-encode every test image")
+    ap.add_argument("--no-plots", action="store_true")
+    args = ap.parse_args()
+
+    known_encodings, known_names = load_encodings(args.gallery)
+    gallery = np.asarray(known_encodings, dtype=np.float32)
+    if not len(gallery):
+        print(f"[WARN] Gallery {args.gallery} is empty: every test face counts as unmatched.")
+
+    known_imgs = list_images_recursive(TEST_KNOWN_DIR)
+    unknown_imgs = list_images_recursive(TEST_UNKNOWN_DIR)
+    print(f"\nFound {len(known_imgs)} known test images and {len(unknown_imgs)} unknown test images.")
+
+    start = time.perf_counter()
+    encodings, status = encode_test_set(known_imgs + unknown_imgs, None if args.no_cache else CACHE_FILE,
+                                        args.workers)
+    print(f"[INFO] Test set ready in {time.perf_counter() - start:.1f}s")
+
+    is_known = np.array([True] * len(known_imgs) + [False] * len(unknown_imgs))
+    truth = np.array([person_of(p, TEST_KNOWN_DIR) for p in known_imgs] + [""] * len(unknown_imgs))
+    has_face = np.array([e is not None for e in encodings], bool)
+    for path, st in zip(known_imgs + unknown_imgs, status):
+        if st.startswith("error:"):
+            print(f"[WARN] {os.path.basename(path)}: {st[6:]}")
+
+    dist = np.full(len(encodings), np.inf, np.float32)
+    matched = np.full(len(encodings), "", dtype=object)
+    if has_face.any() and len(gallery):
+        queries = np.asarray([e for e in encodings if e is not None], dtype=np.float32)
+        dist[has_face], matched[has_face] = nearest_matches(queries, gallery, known_names)
+
+    if SKIP_NO_FACE:
+        use = has_face
+    else:
+        # No face / unreadable counts against its class: a known face is never accepted,
+        # an unknown one is always (wrongly) accepted.
+        use = np.ones(len(encodings), bool)
+        dist[~has_face & ~is_known] = 0.0
+    skipped = int(np.sum(~use))
+
+    known_d, unknown_d = dist[use & is_known], dist[use & ~is_known]
+    known_ok = (matched[use & is_known] == truth[use & is_known])
+
+    y_true, y_pred = report_at(args.threshold, known_d, known_ok, unknown_d, skipped)
+    if not (len(known_d) and len(unknown_d)):
+        print("\nNeed both known and unknown samples for a threshold sweep.")
+        return
+
+    finite = np.concatenate([known_d, unknown_d])
+    finite = finite[np.isfinite(finite)]
+    thresholds = np.arange(0.0, max(1.0, float(finite.max(initial=0.0))) + SWEEP_STEP, SWEEP_STEP)
+    curve = sweep(known_d, known_ok, unknown_d, thresholds)
+    points = operating_points(curve)
+    print_sweep(curve, points)
+
+    from sklearn.metrics import classification_report
     print("\nClassification Report:\n")
     print(classification_report(y_true, y_pred, target_names=["Known", "Unknown"]))
-else:
-    print("\nNot enough classified samples to build a confusion matrix.")
+    if not args.no_plots:
+        plot_results(y_true, y_pred, curve, points)
 
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,32 @@
 # test_plate_accuracy.py
 # Standalone, fast OCR evaluation for number plates with robust normalization + fuzzy match.
+#
+# Two stages:
+#   1. OCR  - raw EasyOCR (bbox, text, conf) per image, computed by a pool of reader
+#             processes and cached by image hash (only new/changed images are read).
+#   2. Match - normalization + exact/indexed-fuzzy matching from the cached results, re-run in
+#             milliseconds for the configured values and a grid of cutoff/confidence values.
+#
+#   python test_plate_accuracy.py                  # evaluate + grid, confusion matrix
+#   python test_plate_accuracy.py --workers 8 --no-plots
 
 # --- macOS OpenMP fix (put BEFORE torch/easyocr import) ---
 import os
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"   # workaround for duplicate libomp on macOS
-os.environ["OMP_NUM_THREADS"] = "1"           # keep CPU usage sane
+os.environ["OMP_NUM_THREADS"] = "1"           # one thread per reader process; the pool uses the cores
 
-import re
-import csv
+import json
+import time
+import argparse
 from pathlib import Path
-from difflib import get_close_matches
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-import easyocr
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.metrics import confusion_matrix, classification_report
+from plate_ocr import (
+    OCR_LANGS, RECOGNITION_CONF_MIN, FUZZY_CUTOFF,
+    load_plate_map, plate_candidates, classify_plate, init_ocr_worker, ocr_file,
+)
+from plate_index import PlateIndex
+from gallery_store import file_sha1
 
 # =========================
 # Config
@@ -22,18 +34,15 @@ from sklearn.metrics import confusion_matrix, classification_report
 TEST_KNOWN_DIR = Path("test_plates/known")
 TEST_UNKNOWN_DIR = Path("test_plates/unknown")
 PLATE_MAP_CSV  = Path("plate_owner_mapping.csv")  # must contain a plate column
-
-# OCR + matching
-RECOGNITION_CONF_MIN = 0.30   # drop low-confidence OCR tokens (0..1)
-FUZZY_CUTOFF          = 0.62  # lower = more tolerant to OCR typos (0..1)
+OCR_CACHE = Path("test_plates/.ocr_cache.json")   # image sha1 -> raw OCR results
 VALID_EXTS            = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".jfif"}
 
-# Regex for plate-like tokens (adjust for your locale if needed)
-PLATE_TOKEN = re.compile(r"[A-Z0-9]{5,}", re.IGNORECASE)
+# Offline grid searched from the cached OCR results
+CUTOFF_GRID = [0.50, 0.54, 0.58, 0.62, 0.66, 0.70, 0.75, 0.80, 0.85, 0.90]
+CONF_GRID   = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6]
 
 # Save plots
 SAVE_DIR = Path("reports")
-SAVE_DIR.mkdir(parents=True, exist_ok=True)
 SAVE_CONFUSION = True
 
 # =========================
@@ -49,175 +58,190 @@ def list_images_recursive(root: Path):
                 files.append(str(Path(dp) / f))
     return sorted(files)
 
-def load_plate_map(csv_path: Path):
-    """
-    Load known plates from CSV. Accepts common column names.
-    Normalizes: uppercase, strips non-alphanumerics, applies substitution map.
-    """
-    known_plates = set()
-    if not csv_path.exists():
-        print(f"[WARN] Mapping file not found: {csv_path}")
-        return known_plates
-
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        keys = reader.fieldnames or []
-        col = None
-        for k in ("plate", "Plate", "plate_number", "PlateNumber"):
-            if k in keys:
-                col = k
-                break
-        if col is None:
-            print(f"[WARN] No plate column found. Columns in CSV: {keys}")
-            return known_plates
-
-        for row in reader:
-            raw = (row.get(col) or "").upper()
-            norm = normalize_plate_text(raw)
-            if norm:
-                known_plates.add(norm)
-    return known_plates
-
-# Common OCR confusions mapping
-CHAR_SUBS = {
-    "0": "O", "O": "O",
-    "1": "I", "I": "I", "l": "I",
-    "8": "B", "B": "B",
-    "5": "S", "S": "S",
-    "2": "Z", "Z": "Z",
-    "4": "A", "A": "A",
-    "6": "G", "G": "G",
-    "7": "T", "T": "T",
-}
-
-def normalize_plate_text(s: str) -> str:
-    """
-    Uppercase, remove non-alphanumerics, and map commonly-confused chars to a canonical set.
-    This reduces false 'unknown' due to O/0, I/1, B/8, etc.
-    """
-    s = re.sub(r"[^A-Z0-9]", "", s.upper())
-    out = []
-    for ch in s:
-        if ch in CHAR_SUBS:
-            out.append(CHAR_SUBS[ch])
-        else:
-            out.append(ch)
-    return "".join(out)
-
-def ocr_candidates(reader, img_path: str):
-    """
-    Return list of normalized candidate strings from OCR for one image.
-    - Filters by min confidence
-    - Prefers tokens that look like plates
-    - Falls back to longest high-confidence token
-    """
-    try:
-        results = reader.readtext(img_path, detail=1)  # (bbox, text, conf)
-        cands, high_conf = [], []
-        for _, text, conf in results:
-            if conf is None or conf < RECOGNITION_CONF_MIN:
-                continue
-            norm = normalize_plate_text(text)
-            if not norm:
-                continue
-            high_conf.append(norm)
-            if PLATE_TOKEN.fullmatch(norm):
-                cands.append(norm)
-        if not cands and high_conf:
-            cands.append(sorted(high_conf, key=len, reverse=True)[0])
-        return cands
-    except Exception as e:
-        print(f"[OCR-ERR] {img_path}: {e}")
-        return []
-
-def classify_plate(preds, known_plates):
-    """
-    Binary decision: 'known' if any candidate is an exact or fuzzy match; else 'unknown'.
-    """
-    for p in preds:
-        if p in known_plates:
-            return "known", p, "exact"
-        # fuzzy against known plates
-        match = get_close_matches(p, list(known_plates), n=1, cutoff=FUZZY_CUTOFF)
-        if match:
-            return "known", p, f"fuzzy→{match[0]}"
-    return "unknown", preds[0] if preds else "", "none"
+def pct(n, d):
+    return (100.0 * n / d) if d else 0.0
 
-# =========================
-# Load data
-# =========================
-reader = easyocr.Reader(['en'], gpu=False)
-known_plate_set = load_plate_map(PLATE_MAP_CSV)
+class Timer:
+    """Wall time per named stage, printed at the end."""
 
-known_imgs   = list_images_recursive(TEST_KNOWN_DIR)
-unknown_imgs = list_images_recursive(TEST_UNKNOWN_DIR)
+    def __init__(self):
+        self.stages = []
 
-print(f"\nKnown plate images   : {len(known_imgs)}")
-print(f"Unknown plate images : {len(unknown_imgs)}")
-print(f"Known plates in CSV  : {len(known_plate_set)}")
+    def stage(self, name, start):
+        self.stages.append((name, time.perf_counter() - start))
+
+    def report(self):
+        print("\n=== Timing ===")
+        for name, seconds in self.stages:
+            print(f"{name:<28}: {seconds * 1000:10.1f} ms")
 
 # =========================
-# Evaluate
+# Stage 1: OCR (cached)
 # =========================
-y_true, y_pred = [], []
-known_total = unknown_total = 0
-known_correct = unknown_correct = 0
-
-print("\n=== Testing KNOWN plates ===")
-for img in known_imgs:
-    preds = ocr_candidates(reader, img)
-    cls, used, how = classify_plate(preds, known_plate_set)
-    print(f"[Known]   {os.path.basename(img)} -> {preds} => {cls} ({how})")
-    known_total += 1
-    if cls == "known":
-        known_correct += 1
-        y_pred.append("known")
-    else:
-        y_pred.append("unknown")
-    y_true.append("known")
-
-print("\n=== Testing UNKNOWN plates ===")
-for img in unknown_imgs:
-    preds = ocr_candidates(reader, img)
-    cls, used, how = classify_plate(preds, known_plate_set)
-    print(f"[Unknown] {os.path.basename(img)} -> {preds} => {cls} ({how})")
-    unknown_total += 1
-    if cls == "unknown":
-        unknown_correct += 1
-        y_pred.append("unknown")
+def load_ocr_cache(path: Path, langs):
+    if not path.exists():
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Ignoring unreadable OCR cache {path} ({e})")
+        return {}
+    if data.get("langs") != list(langs):
+        print("[INFO] OCR languages changed; OCR cache ignored.")
+        return {}
+    return data.get("results", {})
+
+def save_ocr_cache(path: Path, langs, results):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"langs": list(langs), "results": results}, f)
+    os.replace(tmp, path)
+
+def run_ocr(paths, workers, use_cache, timer):
+    """Raw OCR results per path (None on read errors); only uncached hashes hit EasyOCR."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor() as pool:
+        hashes = list(pool.map(file_sha1, paths))
+    timer.stage(f"hash {len(paths)} images", start)
+
+    cache = load_ocr_cache(OCR_CACHE, OCR_LANGS) if use_cache else {}
+    todo = sorted({h: p for p, h in zip(paths, hashes) if h not in cache}.items())
+    start = time.perf_counter()
+    if todo:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(todo)))
+        print(f"[INFO] OCR on {len(todo)} images with {workers} reader process(es) "
+              f"({len(paths) - len(todo)} cached)...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_ocr_worker,
+                                 initargs=(OCR_LANGS,)) as pool:
+            for i, ((sha1, path), (results, status)) in enumerate(
+                    zip(todo, pool.map(ocr_file, [p for _, p in todo])), 1):
+                if status != "ok":
+                    print(f"[OCR-ERR] {path}: {status[6:]}")
+                    continue
+                cache[sha1] = results
+                if i % 50 == 0:
+                    print(f"[INFO] {i}/{len(todo)} read")
+        if use_cache:
+            save_ocr_cache(OCR_CACHE, OCR_LANGS, cache)
     else:
-        y_pred.append("known")
-    y_true.append("unknown")
-
-def pct(n, d):
-    return (100.0 * n / d) if d else 0.0
+        print(f"[INFO] All {len(paths)} images cached; EasyOCR not loaded.")
+    timer.stage(f"OCR {len(todo)} images", start)
+    return [cache.get(h) for h in hashes]
 
-known_acc   = pct(known_correct, known_total)
-unknown_acc = pct(unknown_correct, unknown_total)
-overall_acc = pct(known_correct + unknown_correct, known_total + unknown_total)
-
-print("\n=== Number Plate OCR Accuracy Results ===")
-print(f"Known Plates Accuracy   : {known_acc:.2f}% ({known_correct}/{known_total})")
-print(f"Unknown Plates Accuracy : {unknown_acc:.2f}% ({unknown_correct}/{unknown_total})")
-print(f"Overall Accuracy        : {overall_acc:.2f}%")
+# =========================
+# Stage 2: matching (offline)
+# =========================
+def evaluate(ocr_results, labels, known_plates, conf_min, cutoff):
+    """(y_true, y_pred, rows) where rows = (label, candidates, decision, how) per image."""
+    y_true, y_pred, rows = [], [], []
+    for results, label in zip(ocr_results, labels):
+        preds = plate_candidates(results or [], conf_min)
+        cls, used, how = classify_plate(preds, known_plates, cutoff)
+        y_true.append(label)
+        y_pred.append(cls)
+        rows.append((label, preds, cls, how))
+    return y_true, y_pred, rows
+
+def accuracy(y_true, y_pred, label=None):
+    pairs = [(t, p) for t, p in zip(y_true, y_pred) if label is None or t == label]
+    return sum(t == p for t, p in pairs), len(pairs)
+
+def grid_search(ocr_results, labels, known_plates):
+    print("\n=== Cutoff x confidence grid (overall accuracy %, known/unknown) ===")
+    print("conf\\cutoff " + "".join(f"{c:>16.2f}" for c in CUTOFF_GRID))
+    best = None
+    for conf in CONF_GRID:
+        cells = []
+        for cutoff in CUTOFF_GRID:
+            y_true, y_pred, _ = evaluate(ocr_results, labels, known_plates, conf, cutoff)
+            overall = pct(*accuracy(y_true, y_pred))
+            k = pct(*accuracy(y_true, y_pred, "known"))
+            u = pct(*accuracy(y_true, y_pred, "unknown"))
+            cells.append(f"{overall:5.1f} ({k:3.0f}/{u:3.0f})")
+            if best is None or overall > best[0]:
+                best = (overall, conf, cutoff)
+        print(f"{conf:<11.2f} " + "".join(f"{c:>16}" for c in cells))
+    print(f"\nBest: {best[0]:.2f}% at RECOGNITION_CONF_MIN={best[1]:.2f}, FUZZY_CUTOFF={best[2]:.2f}")
+    return best
+
+def plot_confusion(y_true, y_pred):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from sklearn.metrics import confusion_matrix
+
+    cm = confusion_matrix(y_true, y_pred, labels=["known", "unknown"])
+    plt.figure()
+    sns.heatmap(cm, annot=True, fmt='d', cmap="Greens",
+                xticklabels=["Predicted: Known", "Predicted: Unknown"],
+                yticklabels=["Actual: Known", "Actual: Unknown"])
+    plt.title("Number Plate Recognition Confusion Matrix")
+    plt.xlabel("Prediction"); plt.ylabel("Actual")
+    plt.tight_layout()
+    if SAVE_CONFUSION:
+        SAVE_DIR.mkdir(parents=True, exist_ok=True)
+        out_path = SAVE_DIR / "plate_confusion_matrix.png"
+        plt.savefig(out_path, dpi=300)
+        print(f"[Saved] Confusion matrix -> {out_path}")
+    plt.show()
 
 # =========================
-# Confusion Matrix + Report
+# Main
 # =========================
-cm = confusion_matrix(y_true, y_pred, labels=["known", "unknown"])
-
-plt.figure()
-sns.heatmap(cm, annot=True, fmt='d', cmap="Greens",
-            xticklabels=["Predicted: Known", "Predicted: Unknown"],
-            yticklabels=["Actual: Known", "Actual: Unknown"])
-plt.title("Number Plate Recognition Confusion Matrix")
-plt.xlabel("Prediction"); plt.ylabel("Actual")
-plt.tight_layout()
-if SAVE_CONFUSION:
-    out_path = SAVE_DIR / "plate_confusion_matrix.png"
-    plt.savefig(out_path, dpi=300)
-    print(f"[Saved] Confusion matrix -> {out_path}")
-plt.show()
-
-print("\nClassification Report:\n")
-print(classification_report(y_true, y_pred, target_names=["Known", "Unknown"]))
+def main():
+    ap = argparse.ArgumentParser(description="Evaluate number plate OCR on test_plates/.")
+    ap.add_argument("--workers", type=int, default=None, help="EasyOCR reader processes (default: CPU count)")
+    ap.add_argument("--conf-min", type=float, default=RECOGNITION_CONF_MIN)
+    ap.add_argument("--cutoff", type=float, default=FUZZY_CUTOFF)
+    ap.add_argument("--no-cache", action="store_true", help="re-run OCR on every image")
+    ap.add_argument("--no-grid", action="store_true")
+    ap.add_argument("--no-plots", action="store_true")
+    args = ap.parse_args()
+    timer = Timer()
+
+    start = time.perf_counter()
+    known_plate_set = PlateIndex(load_plate_map(PLATE_MAP_CSV))
+    known_imgs   = list_images_recursive(TEST_KNOWN_DIR)
+    unknown_imgs = list_images_recursive(TEST_UNKNOWN_DIR)
+    timer.stage("load plates + list images", start)
+
+    print(f"\nKnown plate images   : {len(known_imgs)}")
+    print(f"Unknown plate images : {len(unknown_imgs)}")
+    print(f"Known plates in CSV  : {len(known_plate_set)}")
+
+    paths = known_imgs + unknown_imgs
+    labels = ["known"] * len(known_imgs) + ["unknown"] * len(unknown_imgs)
+    ocr_results = run_ocr(paths, args.workers, not args.no_cache, timer)
+
+    start = time.perf_counter()
+    y_true, y_pred, rows = evaluate(ocr_results, labels, known_plate_set, args.conf_min, args.cutoff)
+    timer.stage("match (configured values)", start)
+
+    for path, (label, preds, cls, how) in zip(paths, rows):
+        tag = "[Known]  " if label == "known" else "[Unknown]"
+        print(f"{tag} {os.path.basename(path)} -> {preds} => {cls} ({how})")
+
+    known_correct, known_total = accuracy(y_true, y_pred, "known")
+    unknown_correct, unknown_total = accuracy(y_true, y_pred, "unknown")
+    print(f"\n=== Number Plate OCR Accuracy Results (conf >= {args.conf_min:.2f}, cutoff {args.cutoff:.2f}) ===")
+    print(f"Known Plates Accuracy   : {pct(known_correct, known_total):.2f}% ({known_correct}/{known_total})")
+    print(f"Unknown Plates Accuracy : {pct(unknown_correct, unknown_total):.2f}% ({unknown_correct}/{unknown_total})")
+    print(f"Overall Accuracy        : {pct(known_correct + unknown_correct, known_total + unknown_total):.2f}%")
+
+    if not args.no_grid and paths:
+        start = time.perf_counter()
+        grid_search(ocr_results, labels, known_plate_set)
+        timer.stage(f"grid ({len(CONF_GRID) * len(CUTOFF_GRID)} combinations)", start)
+
+    timer.report()
+
+    if y_true:
+        from sklearn.metrics import classification_report
+        print("\nClassification Report:\n")
+        print(classification_report(y_true, y_pred, target_names=["Known", "Unknown"]))
+        if not args.no_plots:
+            plot_confusion(y_true, y_pred)
+
+if __name__ == "__main__":
+    main()
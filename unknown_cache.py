@@ -0,0 +1,92 @@
+# unknown_cache.py
+# Bounded dedup cache for unknown faces ("have we already saved this person?").
+
+import time
+
+import numpy as np
+
+# ===================================================
+# Configuration
+# ===================================================
+ENCODING_DIM = 128
+
+CAPACITY = 512               # max unknown faces remembered at once
+TTL_SECONDS = 30 * 60        # forget a face not seen for this long
+SIMILARITY = 0.97            # cosine similarity above which two encodings are "the same"
+
+class UnknownFaceCache:
+    """
+    Ring-buffer matrix of L2-normalized encodings. A lookup is a single dot product
+    against every live slot; slots expire after `ttl` seconds without a hit and, when
+    the buffer is full, the least-recently-seen slot ("lru") or the oldest insert
+    ("age") is evicted.
+    """
+
+    def __init__(self, capacity=CAPACITY, ttl=TTL_SECONDS, similarity=SIMILARITY, policy="lru"):
+        if policy not in ("lru", "age"):
+            raise ValueError(f"policy must be 'lru' or 'age', got {policy!r}")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.similarity = similarity
+        self.policy = policy
+        self._enc = np.zeros((capacity, ENCODING_DIM), dtype=np.float32)
+        self._inserted = np.full(capacity, -np.inf)
+        self._last_seen = np.full(capacity, -np.inf)
+        self._live = np.zeros(capacity, dtype=bool)
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+    def __len__(self):
+        return int(self._live.sum())
+
+    @staticmethod
+    def _normalize(encoding):
+        e = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM)
+        norm = np.linalg.norm(e)
+        return e / norm if norm else e
+
+    def _expire(self, now):
+        if self.ttl is None:
+            return
+        stale = self._live & (self._last_seen < now - self.ttl)
+        if stale.any():
+            self.expired += int(stale.sum())
+            self._live &= ~stale
+
+    def seen(self, encoding, now=None):
+        """True (hit) if a similar face is cached; the hit refreshes that slot's TTL."""
+        now = time.time() if now is None else now
+        self._expire(now)
+        if not self._live.any():
+            self.misses += 1
+            return False
+        sims = self._enc @ self._normalize(encoding)
+        sims[~self._live] = -np.inf
+        best = int(np.argmax(sims))
+        if sims[best] > self.similarity:
+            self._last_seen[best] = now
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, encoding, now=None):
+        """Insert a face, reusing a free slot or evicting per policy when full."""
+        now = time.time() if now is None else now
+        free = np.flatnonzero(~self._live)
+        if len(free):
+            slot = int(free[0])
+        else:
+            slot = int(np.argmin(self._last_seen if self.policy == "lru" else self._inserted))
+            self.evictions += 1
+        self._enc[slot] = self._normalize(encoding)
+        self._inserted[slot] = self._last_seen[slot] = now
+        self._live[slot] = True
+        return slot
+
+    def clear(self):
+        self._live[:] = False
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+    def stats(self):
+        return {"size": len(self), "capacity": self.capacity, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions, "expired": self.expired}